@@ -1,11 +1,16 @@
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import StreamingResponse
-from pydantic import BaseModel, Field
-from app.core.react_agent import LegislationReActAgent
-from llama_index.core.llms import ChatMessage, MessageRole
+from pydantic import BaseModel, Field, model_validator
+from app.core.react_agent import LegislationReActAgent, AgentEvent
+from app.api.deps import get_agent, get_sessions
+from app.core.admission import ANTHROPIC, ProviderOverloaded, get_limiter
+from app.core.memory import ChatSessionStore
+from app.core.metrics import request_stages
+from app.db.models import ChatTurn
 import logging
 import json
-from typing import List, Literal
+import uuid
+from typing import Any, List, Literal, Optional
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -18,42 +23,107 @@ class Message(BaseModel):
     content: str
 
 class ChatRequest(BaseModel):
-    messages: List[Message]
+    # Server-side session to continue; a new one is started when omitted
+    conversation_id: Optional[str] = Field(None, pattern=r"^[A-Za-z0-9_-]{1,64}$")
+    # The new user message
+    message: Optional[str] = None
+    # Full history, for clients that do not keep a conversation_id
+    messages: List[Message] = []
+
+    @model_validator(mode="after")
+    def check_message(self) -> "ChatRequest":
+        if self.message is None and not self.messages:
+            raise ValueError("Either message or messages is required")
+        return self
+
+# Vercel AI SDK data stream part codes for each agent event type
+STREAM_PART_CODES = {
+    "text": "0",
+    "fragments": "8",
+    "tool_call": "9",
+    "tool_result": "a",
+}
+
+def format_stream_part(code: str, value: Any) -> str:
+    """Format a single part of the Vercel AI SDK data stream protocol."""
+    return f"{code}:{json.dumps(value)}\n"
+
+def format_agent_event(event: AgentEvent) -> str:
+    """Convert an agent event into a data stream part."""
+    code = STREAM_PART_CODES[event.type]
+    if event.type == "text":
+        return format_stream_part(code, event.data["delta"])
+    if event.type == "fragments":
+        # Message annotations are sent as a list
+        return format_stream_part(code, [{"type": "fragments", **event.data}])
+    return format_stream_part(code, event.data)
 
 @router.post("")
-async def chat_with_agent(request: Request, chat_request: ChatRequest):
+async def chat_with_agent(
+    request: Request,
+    chat_request: ChatRequest,
+    agent: LegislationReActAgent = Depends(get_agent),
+    sessions: ChatSessionStore = Depends(get_sessions),
+):
     """Chat with the ReActAgent about legislation."""
     try:
+        # Shed load up front while the LLM queue is full, before the stream starts
+        get_limiter(ANTHROPIC).check()
+
         # Log the request body
         body = await request.json()
         logger.info(f"Received request body: {body}")
 
-        # Initialize the agent
-        agent = LegislationReActAgent()
-        logger.info("Agent initialized")
+        conversation_id = chat_request.conversation_id or uuid.uuid4().hex
+        session = await sessions.load(conversation_id)
+
+        if chat_request.message is not None:
+            last_message = chat_request.message
+        else:
+            # Get the last message from the conversation
+            last_message = chat_request.messages[-1].content
+            # Seed a new session from a client that sends the whole history
+            earlier = [
+                ChatTurn(role=msg.role, content=msg.content)
+                for msg in chat_request.messages[:-1]
+                if msg.role != "system"
+            ]
+            if earlier and not session.messages:
+                session = await sessions.append(conversation_id, earlier)
+
+        # The summary of older turns and the most recent messages that fit the token limit
+        chat_history = sessions.history(session)
+        logger.info(f"Chat history: {chat_history}")
 
         async def generate():
             try:
-                # Get the last message from the conversation
-                last_message = chat_request.messages[-1].content
                 logger.info(f"Processing message: {last_message}")
+                yield format_stream_part("2", [{"conversationId": conversation_id}])
 
-                # Convert previous messages to ChatMessage format
-                chat_history = []
-                for msg in chat_request.messages[:-1]:
-                    role = MessageRole.USER if msg.role == "user" else MessageRole.ASSISTANT
-                    chat_history.append(ChatMessage(role=role, content=msg.content))
-                logger.info(f"Chat history: {chat_history}")
-
-                # Get response with chat history
-                response = await agent.chat(last_message, chat_history)
+                # Stream tool progress and answer tokens in Vercel AI SDK format
+                answer = []
+                async for event in agent.stream_chat(last_message, chat_history):
+                    if event.type == "text":
+                        answer.append(event.data["delta"])
+                    yield format_agent_event(event)
                 logger.info("Generated response")
 
-                # Format response in Vercel AI SDK format
-                yield f"0: {json.dumps(response)}\n"
+                # Remember the turn; older turns are summarised in the background
+                await sessions.append(conversation_id, [
+                    ChatTurn(role="user", content=last_message),
+                    ChatTurn(role="assistant", content="".join(answer)),
+                ])
+
+                # The Server-Timing header was sent before the agent ran, so report the stages at the end
+                yield format_stream_part("2", [{"serverTiming": {
+                    stage: round(seconds * 1000, 1) for stage, seconds in request_stages().items()
+                }}])
+                yield format_stream_part("d", {"finishReason": "stop"})
             except Exception as e:
                 logger.error(f"Error generating response: {str(e)}")
-                yield f"0: {json.dumps(f"I apologize, but I encountered an error: {str(e)}")}\n"
+                # An error part, then the finish part, so the client can tell a failure from an answer
+                yield format_stream_part("3", f"I apologize, but I encountered an error: {str(e)}")
+                yield format_stream_part("d", {"finishReason": "error"})
 
         return StreamingResponse(
             generate(),
@@ -61,9 +131,14 @@ async def chat_with_agent(request: Request, chat_request: ChatRequest):
             headers={
                 "Cache-Control": "no-cache",
                 "Connection": "keep-alive",
+                # Stop proxies from buffering the stream
+                "X-Accel-Buffering": "no",
+                "X-Conversation-Id": conversation_id,
             }
         )
 
+    except ProviderOverloaded:
+        raise
     except Exception as e:
         logger.error(f"Error in chat_with_agent: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
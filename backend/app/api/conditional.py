@@ -0,0 +1,93 @@
+from typing import Any, Optional, Tuple
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from functools import lru_cache
+import hashlib
+import json
+from urllib.parse import urlencode
+from fastapi import Request, Response
+from app.core.cache import ResponseCache
+from app.core.config import get_settings
+from app.core.index_version import read_index_version
+
+# Clients must revalidate, but may keep and reuse the body after a 304
+CACHE_CONTROL = "no-cache"
+
+Validators = Tuple[str, Optional[str]]
+
+@lru_cache()
+def get_validator_cache() -> ResponseCache:
+    """Cache of the last ETag and Last-Modified served for each resource."""
+    settings = get_settings()
+    return ResponseCache(
+        max_entries=settings.VALIDATOR_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.VALIDATOR_CACHE_TTL_SECONDS,
+        version_fn=read_index_version,
+    )
+
+def resource_key(request: Request) -> str:
+    """Validator cache key for a request: its path and sorted query parameters."""
+    params = sorted(request.query_params.multi_items())
+    return f"{request.url.path}?{urlencode(params)}"
+
+def make_etag(*parts: Any) -> str:
+    """Strong ETag over the values that determine a response."""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return f'"{hashlib.sha256(payload.encode()).hexdigest()[:32]}"'
+
+def http_date(date_as_at: Optional[str]) -> Optional[str]:
+    """Format a legislation date_as_at (YYYY-MM-DD) as an HTTP date."""
+    if not date_as_at:
+        return None
+    try:
+        date = datetime.strptime(date_as_at[:10], "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+    return format_datetime(date, usegmt=True)
+
+def is_not_modified(request: Request, validators: Validators) -> bool:
+    """Check the request's conditional headers against a resource's validators."""
+    etag, last_modified = validators
+
+    # If-None-Match takes precedence over If-Modified-Since
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def set_validators(response: Response, validators: Validators) -> None:
+    """Add ETag, Last-Modified and Cache-Control headers to a response."""
+    etag, last_modified = validators
+    response.headers["ETag"] = etag
+    if last_modified:
+        response.headers["Last-Modified"] = last_modified
+    response.headers["Cache-Control"] = CACHE_CONTROL
+
+def not_modified(validators: Validators) -> Response:
+    """An empty 304 response carrying the resource's validators."""
+    response = Response(status_code=304)
+    set_validators(response, validators)
+    return response
+
+def cached_not_modified(request: Request, key: str) -> Optional[Response]:
+    """Answer with a 304 from the validator cache, without loading the resource.
+
+    Entries only expire with the index version, so the key must also carry
+    any version the resource has of its own, such as its document's date_as_at.
+    """
+    validators = get_validator_cache().get(key)
+    if validators is not None and is_not_modified(request, validators):
+        return not_modified(validators)
+    return None
+
+def remember_validators(key: str, validators: Validators) -> None:
+    """Record the validators just served for a resource."""
+    get_validator_cache().set(key, validators)
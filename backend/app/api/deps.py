@@ -0,0 +1,39 @@
+from typing import Optional, Set
+from fastapi import HTTPException, Query, Request
+from app.core.registry import EngineRegistry
+from app.core.query_engines import LegislationQueryEngine, DocumentQueryEngine
+from app.core.react_agent import LegislationReActAgent
+from app.core.memory import ChatSessionStore
+from app.db.projections import HEAVY_FRAGMENT_FIELDS, parse_fragment_fields
+
+def get_engines(request: Request) -> EngineRegistry:
+    """Return the engine registry built during application startup."""
+    return request.app.state.engines
+
+def get_legislation_engine(request: Request) -> LegislationQueryEngine:
+    """Return the shared fragment query engine."""
+    return get_engines(request).legislation_engine
+
+def get_document_engine(request: Request) -> DocumentQueryEngine:
+    """Return the shared document (Act) query engine."""
+    return get_engines(request).document_engine
+
+def get_agent(request: Request) -> LegislationReActAgent:
+    """Return the shared legislation agent."""
+    return get_engines(request).agent
+
+def get_sessions(request: Request) -> ChatSessionStore:
+    """Return the server-side chat session store."""
+    return get_engines(request).sessions
+
+def get_fragment_fields(
+    fields: Optional[str] = Query(
+        None,
+        description=f"Comma separated heavy fragment fields to include: {', '.join(HEAVY_FRAGMENT_FIELDS)}",
+    ),
+) -> Set[str]:
+    """Return the heavy fragment fields requested with fields=."""
+    try:
+        return parse_fragment_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
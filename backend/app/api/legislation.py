@@ -1,54 +1,292 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from typing import List, Optional, Set
+from functools import lru_cache
+from pydantic import BaseModel
 from ..db.models import LegislationDocument, LegislationFragment
+from ..db.projections import DocumentSummary, FragmentView, find_document_summaries, find_fragment_views
+from ..db.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_query, sort_spec, split_page
+from ..db.hierarchy import MAX_SUBTREE_DEPTH, FragmentNode, TocEntry, build_subtree, build_table_of_contents, find_fragment_version
+from ..core.cache import ResponseCache
+from ..core.config import get_settings
+from ..core.index_version import read_index_version
+from .conditional import (
+    cached_not_modified,
+    http_date,
+    is_not_modified,
+    make_etag,
+    not_modified,
+    remember_validators,
+    resource_key,
+    set_validators,
+)
+from .deps import get_fragment_fields
+from .responses import typed_response
 from beanie import PydanticObjectId
 
 router = APIRouter(prefix="/api/legislation", tags=["legislation"])
 
-@router.get("")
-async def get_legislation_list():
-    """Get a list of all legislation documents"""
-    documents = await LegislationDocument.find_all().to_list()
-    return documents
+# Keyset orderings; each ends with a unique field
+DOCUMENT_SORT = ("title", "_id")
+FRAGMENT_SORT = ("order", "_id")
 
-@router.get("/{document_id}")
-async def get_legislation_document(document_id: str):
+class DocumentPage(BaseModel):
+    documents: List[DocumentSummary]
+    next_cursor: Optional[str]
+
+class DocumentWithFragments(BaseModel):
+    document: LegislationDocument
+    root_fragments: List[FragmentView]
+    next_cursor: Optional[str]
+
+class FragmentWithChildren(BaseModel):
+    fragment: FragmentView
+    child_fragments: List[FragmentView]
+    next_cursor: Optional[str]
+
+class TableOfContents(BaseModel):
+    document_id: str
+    date_as_at: str
+    entries: List[TocEntry]
+
+@lru_cache()
+def get_tree_cache() -> ResponseCache:
+    """Cache of built tables of contents and subtrees."""
+    settings = get_settings()
+    return ResponseCache(
+        max_entries=settings.LEGISLATION_TREE_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.LEGISLATION_TREE_CACHE_TTL_SECONDS,
+        version_fn=read_index_version,
+    )
+
+async def find_fragment_page(query: dict, fields: Set[str], limit: Optional[int], cursor: Optional[str]):
+    """Load one page of fragments in document order."""
+    try:
+        query = keyset_query(query, FRAGMENT_SORT, cursor, object_id_fields=("_id",))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    fragments = await find_fragment_views(
+        query,
+        fields,
+        sort=sort_spec(FRAGMENT_SORT),
+        limit=limit + 1 if limit else None,
+    )
+    return split_page(fragments, limit, FRAGMENT_SORT, {"_id": "id"})
+
+@router.get("", response_model=DocumentPage)
+async def get_legislation_list(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """Get a page of legislation documents, ordered by title"""
+    # Answer revalidations of a recently served page without touching MongoDB
+    key = resource_key(request)
+    cached = cached_not_modified(request, key)
+    if cached is not None:
+        return cached
+
+    try:
+        query = keyset_query({}, DOCUMENT_SORT, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    documents = await find_document_summaries(query, sort=sort_spec(DOCUMENT_SORT), limit=limit + 1)
+    documents, next_cursor = split_page(documents, limit, DOCUMENT_SORT, {"_id": "id"})
+
+    validators = (
+        make_etag(key, [(d.id, d.date_as_at) for d in documents], next_cursor),
+        http_date(max((d.date_as_at for d in documents), default=None)),
+    )
+    remember_validators(key, validators)
+    if is_not_modified(request, validators):
+        return not_modified(validators)
+
+    result = typed_response(DocumentPage(documents=documents, next_cursor=next_cursor))
+    set_validators(result, validators)
+    return result
+
+@router.get("/{document_id}", response_model=DocumentWithFragments, response_model_exclude_unset=True)
+async def get_legislation_document(
+    document_id: str,
+    request: Request,
+    fields: Set[str] = Depends(get_fragment_fields),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
     """Get a specific legislation document and its root fragments"""
+    # Answer revalidations of a hot document without touching MongoDB
+    key = resource_key(request)
+    cached = cached_not_modified(request, key)
+    if cached is not None:
+        return cached
+
     try:
         # Find document by its id field instead of _id
         document = await LegislationDocument.find_one(LegislationDocument.id == document_id)
         if not document:
             raise HTTPException(status_code=404, detail="Document not found")
 
+        # Each consolidation of an Act has a new date_as_at
+        validators = (make_etag(key, document.date_as_at), http_date(document.date_as_at))
+        remember_validators(key, validators)
+        if is_not_modified(request, validators):
+            return not_modified(validators)
+
         # Get root fragments (fragments without parents)
-        root_fragments = await LegislationFragment.find(
-            LegislationFragment.document.id == document_id,
-            LegislationFragment.parent_fragment.id == None
-        ).to_list()
-
-        return {
-            "document": document,
-            "root_fragments": root_fragments
-        }
+        root_fragments, next_cursor = await find_fragment_page(
+            LegislationFragment.find(
+                LegislationFragment.document.id == document_id,
+                LegislationFragment.parent_fragment.id == None
+            ).get_filter_query(),
+            fields,
+            limit,
+            cursor,
+        )
+
+        result = typed_response(DocumentWithFragments(
+            document=document,
+            root_fragments=root_fragments,
+            next_cursor=next_cursor
+        ))
+        set_validators(result, validators)
+        return result
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/fragment/{fragment_id}")
-async def get_fragment(fragment_id: str):
+@router.get("/fragment/{fragment_id}", response_model=FragmentWithChildren, response_model_exclude_unset=True)
+async def get_fragment(
+    fragment_id: str,
+    request: Request,
+    fields: Set[str] = Depends(get_fragment_fields),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
     """Get a specific fragment and its children"""
+    key = resource_key(request)
     try:
-        fragment = await LegislationFragment.get(PydanticObjectId(fragment_id))
-        if not fragment:
+        version = await find_fragment_version(PydanticObjectId(fragment_id))
+        if version is None:
+            raise HTTPException(status_code=404, detail="Fragment not found")
+
+        # Answer revalidations of a recently served fragment without loading it,
+        # for as long as its document keeps the same date_as_at
+        validator_key = f"{key}:{version}"
+        cached = cached_not_modified(request, validator_key)
+        if cached is not None:
+            return cached
+
+        fragments = await find_fragment_views({"_id": PydanticObjectId(fragment_id)}, fields)
+        if not fragments:
             raise HTTPException(status_code=404, detail="Fragment not found")
 
         # Get child fragments
-        child_fragments = await LegislationFragment.find(
-            LegislationFragment.parent_fragment.id == PydanticObjectId(fragment_id)
-        ).to_list()
-
-        return {
-            "fragment": fragment,
-            "child_fragments": child_fragments
-        }
+        child_fragments, next_cursor = await find_fragment_page(
+            LegislationFragment.find(
+                LegislationFragment.parent_fragment.id == PydanticObjectId(fragment_id)
+            ).get_filter_query(),
+            fields,
+            limit,
+            cursor,
+        )
+
+        result = FragmentWithChildren(
+            fragment=fragments[0],
+            child_fragments=child_fragments,
+            next_cursor=next_cursor
+        )
+
+        # Fragments carry no version of their own, so the ETag covers their content
+        validators = (make_etag(key, result.model_dump(mode="json", exclude_unset=True)), None)
+        remember_validators(validator_key, validators)
+        if is_not_modified(request, validators):
+            return not_modified(validators)
+
+        result = typed_response(result)
+        set_validators(result, validators)
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{document_id}/toc", response_model=TableOfContents, response_model_exclude_unset=True)
+async def get_table_of_contents(document_id: str, request: Request):
+    """Get the heading hierarchy of a legislation document in one call"""
+    key = resource_key(request)
+    cached = cached_not_modified(request, key)
+    if cached is not None:
+        return cached
+
+    try:
+        document = await LegislationDocument.find_one(LegislationDocument.id == document_id)
+        if not document:
+            raise HTTPException(status_code=404, detail="Document not found")
+
+        validators = (make_etag(key, document.date_as_at), http_date(document.date_as_at))
+        remember_validators(key, validators)
+        if is_not_modified(request, validators):
+            return not_modified(validators)
+
+        # A table of contents only changes with a new version of the document
+        cache_key = f"toc:{document_id}:{document.date_as_at}"
+        toc = get_tree_cache().get(cache_key)
+        if toc is None:
+            entries = await build_table_of_contents(
+                LegislationFragment.find(LegislationFragment.document.id == document_id).get_filter_query()
+            )
+            toc = TableOfContents(document_id=document_id, date_as_at=document.date_as_at, entries=entries)
+            get_tree_cache().set(cache_key, toc)
+
+        result = typed_response(toc)
+        set_validators(result, validators)
+        return result
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/fragment/{fragment_id}/subtree", response_model=FragmentNode, response_model_exclude_unset=True)
+async def get_fragment_subtree(
+    fragment_id: str,
+    request: Request,
+    depth: int = Query(2, ge=1, le=MAX_SUBTREE_DEPTH),
+    fields: Set[str] = Depends(get_fragment_fields),
+):
+    """Get a fragment with several levels of descendants in one call"""
+    key = resource_key(request)
+    try:
+        version = await find_fragment_version(PydanticObjectId(fragment_id))
+        if version is None:
+            raise HTTPException(status_code=404, detail="Fragment not found")
+
+        # Answer revalidations without building the subtree, for as long as
+        # its document keeps the same date_as_at
+        validator_key = f"{key}:{version}"
+        cached = cached_not_modified(request, validator_key)
+        if cached is not None:
+            return cached
+
+        # A subtree only changes with a new version of its document
+        cache_key = f"subtree:{key}:{version}"
+        subtree = get_tree_cache().get(cache_key)
+        if subtree is None:
+            subtree = await build_subtree(PydanticObjectId(fragment_id), depth, fields)
+            if subtree is None:
+                raise HTTPException(status_code=404, detail="Fragment not found")
+            get_tree_cache().set(cache_key, subtree)
+
+        validators = (make_etag(key, subtree.model_dump(mode="json", exclude_unset=True)), None)
+        remember_validators(validator_key, validators)
+        if is_not_modified(request, validators):
+            return not_modified(validators)
+
+        result = typed_response(subtree)
+        set_validators(result, validators)
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,22 @@
+from typing import Any
+import orjson
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+class TypedJSONResponse(ORJSONResponse):
+    """JSON response that serialises already-validated models directly.
+
+    FastAPI skips response_model validation for endpoints that return a
+    Response, so models built by the endpoint are serialised once, straight
+    to bytes, instead of being validated again and passed through
+    jsonable_encoder. Anything else is encoded with orjson.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            return content.__pydantic_serializer__.to_json(content, exclude_unset=True, by_alias=True)
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+def typed_response(model: BaseModel, **kwargs: Any) -> TypedJSONResponse:
+    """Return a validated response model without re-validating it."""
+    return TypedJSONResponse(model, **kwargs)
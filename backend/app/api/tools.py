@@ -1,162 +1,307 @@
-from fastapi import APIRouter, HTTPException
-from typing import List, Optional, Dict, Any
-from pydantic import BaseModel
-from app.core.vector_store import get_vector_store
-from app.core.embeddings import configure_embeddings
-from app.core.llm import configure_llm
-from llama_index.core import VectorStoreIndex
-from llama_index.core.schema import TextNode, QueryBundle
+from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional, Dict, Any, Set, Tuple
+from pydantic import BaseModel, Field
 from llama_index.core.vector_stores import MetadataFilter, FilterOperator, MetadataFilters
-from llama_index.core.retrievers import VectorIndexAutoRetriever
-from llama_index.core.vector_stores.types import MetadataInfo, VectorStoreInfo, VectorStoreQuerySpec
-from llama_index.core.query_engine import RetrieverQueryEngine
-from app.db.models import LegislationFragment
-from llama_index.core.response_synthesizers import ResponseMode
-from llama_index.core.prompts import PromptTemplate
-from llama_index.postprocessor.voyageai_rerank import VoyageAIRerank
-from app.core.config import get_settings
-from app.core.query_engines import LegislationQueryEngine, DocumentQueryEngine, QueryEngineResponse
-import json
+from llama_index.core.vector_stores.types import VectorStoreQuery
+from app.db.projections import FragmentView, find_fragment_views_by_chunk_id
+from app.core.query_engines import LegislationQueryEngine, DocumentQueryEngine
+from app.core.registry import EngineRegistry
+from app.core.cache import make_cache_key
+from app.core.embeddings import aembed_queries
+from app.core.vector_store import aquery_batch
+from app.core.admission import ProviderOverloaded, admission_stats
+from app.core.metrics import CITATION_LOOKUP, track_stage
+from app.api.deps import get_engines, get_legislation_engine, get_document_engine, get_fragment_fields
+from app.api.responses import typed_response
 
 router = APIRouter(prefix="/api/tools", tags=["tools"])
 
+# Most queries a client may send to /retrieve-batch at once
+MAX_BATCH_QUERIES = 512
+
 class RetrievalQuery(BaseModel):
     query: str
-    top_k: Optional[int] = 5
+    top_k: int = Field(5, ge=1)
+    filters: Optional[MetadataFilters] = None
 
 class RetrievedFragment(BaseModel):
-    fragment: LegislationFragment
+    fragment: FragmentView
     score: float
 
 class RetrievalResponse(BaseModel):
     results: List[RetrievedFragment]
     metadata: Dict[str, Any]
 
+class BatchRetrievalRequest(BaseModel):
+    queries: List[RetrievalQuery] = Field(..., min_length=1, max_length=MAX_BATCH_QUERIES)
+
+class BatchRetrievalResponse(BaseModel):
+    results: List[RetrievalResponse]
+
 class QueryEngineResponseModel(BaseModel):
     answer: str
     results: List[RetrievedFragment]
     metadata: Dict[str, Any]
 
-@router.post("/retrieve", response_model=RetrievalResponse)
-async def retrieve_fragments(query: RetrievalQuery):
+def default_retrieval_filters() -> MetadataFilters:
+    """Filters applied to retrieval when the request does not give any."""
+    return MetadataFilters(
+        filters=[
+            MetadataFilter(
+                key="fragment_type",
+                value="Subsection",
+                operator=FilterOperator.NE
+            )
+        ]
+    )
+
+def retrieval_cache_key(query: RetrievalQuery, filters: MetadataFilters, fields: Set[str]) -> str:
+    """Response cache key shared by /retrieve and /retrieve-batch."""
+    return make_cache_key(
+        "retrieve",
+        query.query,
+        top_k=query.top_k,
+        filters=filters.model_dump(),
+        fields=sorted(fields),
+    )
+
+def build_retrieval_response(
+    query: RetrievalQuery,
+    scored_chunk_ids: List[Tuple[str, float]],
+    fragment_map: Dict[str, FragmentView],
+) -> RetrievalResponse:
+    """Pair retrieved chunk_ids with their fragments."""
+    results = []
+    for chunk_id, score in scored_chunk_ids:
+        fragment = fragment_map.get(chunk_id)
+        if fragment:
+            results.append(RetrievedFragment(fragment=fragment, score=score))
+
+    return RetrievalResponse(
+        results=results,
+        metadata={
+            "filters": query.filters.model_dump() if query.filters else {
+                "fragment_type": "not Subsection"
+            },
+            "query": query.query,
+            "top_k": query.top_k
+        }
+    )
+
+def resolve_citation(query: RetrievalQuery, filters: MetadataFilters, engines: EngineRegistry) -> List[str]:
+    """chunk_ids named by a query that is only a citation, or [] when it needs searching."""
+    if engines.citation_index is None:
+        return []
+    with track_stage(CITATION_LOOKUP):
+        return engines.citation_index.resolve(query.query, filters, query.top_k)
+
+@router.post("/retrieve", response_model=RetrievalResponse, response_model_exclude_unset=True)
+async def retrieve_fragments(
+    query: RetrievalQuery,
+    engines: EngineRegistry = Depends(get_engines),
+    fields: Set[str] = Depends(get_fragment_fields),
+):
     """Retrieve relevant fragments using the vector index."""
     try:
-        # Configure embeddings and LLM
-        configure_embeddings()
-        configure_llm()
-
-        # Get vector store
-        vector_store = get_vector_store()
-
-        # Create index from existing vector store
-        index = VectorStoreIndex.from_vector_store(vector_store)
-
-        # Perform retrieval
-        retriever = index.as_retriever(
-            similarity_top_k=query.top_k,
-            filters=MetadataFilters(
-                filters=[
-                    MetadataFilter(
-                        key="fragment_type",
-                        value="Subsection",
-                        operator=FilterOperator.NE
-                    )
-                ]
-            )
-        )
-        nodes = retriever.retrieve(
-            query.query,
-        )
+        filters = query.filters or default_retrieval_filters()
 
-        # Get all chunk_ids from the nodes
-        chunk_ids = [node.metadata["chunk_id"] for node in nodes]
-
-        # Fetch all fragments in one query
-        fragments = await LegislationFragment.find(
-            {"chunk_id": {"$in": chunk_ids}}
-        ).to_list()
-
-        # Create a map of chunk_id to fragment for quick lookup
-        fragment_map = {f.chunk_id: f for f in fragments}
-
-        # Format response
-        results = []
-        for node in nodes:
-            chunk_id = node.metadata["chunk_id"]
-            fragment = fragment_map.get(chunk_id)
-            if fragment:
-                results.append(RetrievedFragment(
-                    fragment=fragment,
-                    score=node.score if hasattr(node, 'score') else 0.0
-                ))
-
-        return RetrievalResponse(
-            results=results,
-            metadata={
-                "filters": {
-                    "fragment_type": "not Subsection"
-                },
-                "query": query.query,
-                "top_k": query.top_k
-            }
-        )
+        # Serve repeated identical requests from the response cache
+        cache_key = retrieval_cache_key(query, filters, fields)
+        cached = engines.response_cache.get(cache_key)
+        if cached is not None:
+            return typed_response(cached)
 
+        # Concurrent identical requests share a single retrieval
+        response = await engines.single_flight.do(cache_key, lambda: retrieve(query, filters, fields, engines))
+        engines.response_cache.set(cache_key, response)
+        return typed_response(response)
+
+    except ProviderOverloaded:
+        raise
     except Exception as e:
         print(e)
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/query", response_model=QueryEngineResponseModel)
-async def query_legislation(query: RetrievalQuery):
-    """Query the legislation using a query engine that provides both an answer and retrieved fragments."""
+async def retrieve(
+    query: RetrievalQuery,
+    filters: MetadataFilters,
+    fields: Set[str],
+    engines: EngineRegistry,
+) -> RetrievalResponse:
+    """Retrieve fragments from the vector index and load them from MongoDB."""
+    # A query that only cites provisions is looked up without embedding or search
+    chunk_ids = resolve_citation(query, filters, engines)
+    if chunk_ids:
+        fragment_map = await find_fragment_views_by_chunk_id(chunk_ids, fields)
+        return build_retrieval_response(query, [(chunk_id, 1.0) for chunk_id in chunk_ids], fragment_map)
+
+    # Perform retrieval against the shared index
+    retriever = engines.index.as_retriever(
+        similarity_top_k=query.top_k,
+        filters=filters
+    )
+    nodes = await retriever.aretrieve(
+        query.query,
+    )
+
+    scored_chunk_ids = [
+        (node.metadata["chunk_id"], node.score if hasattr(node, 'score') else 0.0)
+        for node in nodes
+    ]
+    fragment_map = await find_fragment_views_by_chunk_id([chunk_id for chunk_id, _ in scored_chunk_ids], fields)
+    return build_retrieval_response(query, scored_chunk_ids, fragment_map)
+
+@router.post("/retrieve-batch", response_model=BatchRetrievalResponse, response_model_exclude_unset=True)
+async def retrieve_fragments_batch(
+    request: BatchRetrievalRequest,
+    engines: EngineRegistry = Depends(get_engines),
+    fields: Set[str] = Depends(get_fragment_fields),
+):
+    """Retrieve fragments for many queries with one embedding call, one vector store request per filter and one MongoDB lookup.
+
+    Queries that only cite provisions are answered from the citation index instead.
+    """
     try:
-        # Initialize query engine
-        engine = LegislationQueryEngine()
+        queries = request.queries
+        filters = [query.filters or default_retrieval_filters() for query in queries]
+        cache_keys = [retrieval_cache_key(query, f, fields) for query, f in zip(queries, filters)]
+
+        # Serve queries already answered by /retrieve or an earlier batch from the cache
+        responses: List[Optional[RetrievalResponse]] = [engines.response_cache.get(key) for key in cache_keys]
+        pending = [i for i, response in enumerate(responses) if response is None]
+
+        if pending:
+            # Queries that only cite provisions are looked up; the rest are searched
+            scored: Dict[int, List[Tuple[str, float]]] = {}
+            for i in pending:
+                chunk_ids = resolve_citation(queries[i], filters[i], engines)
+                if chunk_ids:
+                    scored[i] = [(chunk_id, 1.0) for chunk_id in chunk_ids]
+            searched = [i for i in pending if i not in scored]
 
-        # Get response
-        response = await engine.query(query.query)
+            if searched:
+                # Embed all uncached queries in one batch
+                embeddings = await aembed_queries(engines.embed_model, [queries[i].query for i in searched])
 
-        # Convert results to RetrievedFragment format
-        results = [
-            RetrievedFragment(
-                fragment=result["fragment"],
-                score=result["score"]
+                # Run every similarity search against the vector store together
+                results = await aquery_batch(
+                    engines.index.vector_store,
+                    [
+                        VectorStoreQuery(
+                            query_embedding=embedding,
+                            similarity_top_k=queries[i].top_k,
+                            filters=filters[i],
+                        )
+                        for i, embedding in zip(searched, embeddings)
+                    ],
+                )
+                for i, result in zip(searched, results):
+                    scored[i] = list(zip(
+                        [node.metadata["chunk_id"] for node in result.nodes] if result.nodes else result.ids,
+                        result.similarities or [0.0] * len(result.ids),
+                    ))
+
+            # Resolve the chunk_ids of every query in a single lookup
+            fragment_map = await find_fragment_views_by_chunk_id(
+                [chunk_id for pairs in scored.values() for chunk_id, _ in pairs],
+                fields,
             )
-            for result in response.results
-        ]
 
-        return QueryEngineResponseModel(
-            answer=response.answer,
-            results=results,
-            metadata=response.metadata
-        )
+            for i in pending:
+                responses[i] = build_retrieval_response(queries[i], scored[i], fragment_map)
+                engines.response_cache.set(cache_keys[i], responses[i])
+
+        return typed_response(BatchRetrievalResponse(results=responses))
+
+    except ProviderOverloaded:
+        raise
     except Exception as e:
         print(e)
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/query-documents", response_model=QueryEngineResponseModel)
-async def query_documents(query: RetrievalQuery):
-    """Query the legislation using a query engine that searches for whole documents (Acts) and provides both an answer and retrieved fragments."""
-    try:
-        # Initialize document query engine
-        engine = DocumentQueryEngine()
+async def run_query_engine(
+    namespace: str,
+    query: RetrievalQuery,
+    engine: LegislationQueryEngine,
+    engines: EngineRegistry,
+    fields: Set[str],
+) -> QueryEngineResponseModel:
+    """Answer a query with an engine, serving repeated identical requests from the response cache."""
+    cache_key = make_cache_key(
+        namespace,
+        query.query,
+        top_k=query.top_k,
+        filters=engine.filters,
+        fields=sorted(fields),
+    )
+    cached = engines.response_cache.get(cache_key)
+    if cached is not None:
+        return cached
 
-        # Get response
-        response = await engine.query(query.query)
+    # Get response
+    response = await engine.query(query.query)
 
-        # Convert results to RetrievedFragment format
-        results = [
-            RetrievedFragment(
-                fragment=result["fragment"],
-                score=result["score"]
-            )
-            for result in response.results
-        ]
+    # The engine keeps slim fragments; load the heavy fields only if asked for
+    fragments = [result["fragment"] for result in response.results]
+    if fields:
+        fragment_map = await find_fragment_views_by_chunk_id([f.chunk_id for f in fragments], fields)
+        fragments = [fragment_map.get(f.chunk_id, f) for f in fragments]
 
-        return QueryEngineResponseModel(
-            answer=response.answer,
-            results=results,
-            metadata=response.metadata
+    # Convert results to RetrievedFragment format
+    results = [
+        RetrievedFragment(
+            fragment=fragment,
+            score=result["score"]
         )
+        for fragment, result in zip(fragments, response.results)
+    ]
+
+    model = QueryEngineResponseModel(
+        answer=response.answer,
+        results=results,
+        metadata=response.metadata
+    )
+    engines.response_cache.set(cache_key, model)
+    return model
+
+@router.post("/query", response_model=QueryEngineResponseModel, response_model_exclude_unset=True)
+async def query_legislation(
+    query: RetrievalQuery,
+    engine: LegislationQueryEngine = Depends(get_legislation_engine),
+    engines: EngineRegistry = Depends(get_engines),
+    fields: Set[str] = Depends(get_fragment_fields),
+):
+    """Query the legislation using a query engine that provides both an answer and retrieved fragments."""
+    try:
+        return typed_response(await run_query_engine("query", query, engine, engines, fields))
+    except ProviderOverloaded:
+        raise
     except Exception as e:
         print(e)
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/query-documents", response_model=QueryEngineResponseModel, response_model_exclude_unset=True)
+async def query_documents(
+    query: RetrievalQuery,
+    engine: DocumentQueryEngine = Depends(get_document_engine),
+    engines: EngineRegistry = Depends(get_engines),
+    fields: Set[str] = Depends(get_fragment_fields),
+):
+    """Query the legislation using a query engine that searches for whole documents (Acts) and provides both an answer and retrieved fragments."""
+    try:
+        return typed_response(await run_query_engine("query-documents", query, engine, engines, fields))
+    except ProviderOverloaded:
+        raise
+    except Exception as e:
+        print(e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/cache/stats")
+async def cache_stats(engines: EngineRegistry = Depends(get_engines)):
+    """Get hit/miss counters for the query caches."""
+    return engines.cache_stats()
+
+@router.get("/admission/stats")
+async def provider_admission_stats():
+    """Get concurrency, queue depth and wait time metrics for each outbound provider."""
+    return admission_stats()
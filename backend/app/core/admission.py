@@ -0,0 +1,181 @@
+from typing import Any, AsyncIterator, Deque, Dict
+from collections import deque
+from contextlib import asynccontextmanager
+from functools import lru_cache
+import asyncio
+import logging
+import time
+import numpy as np
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Providers with their own concurrency limit
+ANTHROPIC = "anthropic"
+VOYAGE_EMBED = "voyage-embed"
+VOYAGE_RERANK = "voyage-rerank"
+
+class ProviderOverloaded(Exception):
+    """Raised when a provider call is shed because its wait queue is full."""
+
+    def __init__(self, provider: str, retry_after: int):
+        super().__init__(f"{provider} is overloaded, retry after {retry_after}s")
+        self.provider = provider
+        self.retry_after = retry_after
+
+class ProviderLimiter:
+    """Concurrency limit with a bounded wait queue for one outbound provider.
+
+    At most max_concurrency calls run at once and at most max_queue wait for a
+    slot. Calls that arrive when the queue is full, or that wait longer than
+    queue_timeout, fail fast with ProviderOverloaded instead of piling up.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        max_queue: int,
+        queue_timeout: float,
+        retry_after: int,
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._waits: Deque[float] = deque(maxlen=1000)
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _overloaded(self) -> ProviderOverloaded:
+        return ProviderOverloaded(self.name, self.retry_after)
+
+    def check(self) -> None:
+        """Raise ProviderOverloaded if a new call would be shed right now."""
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise self._overloaded()
+
+    async def acquire(self) -> None:
+        """Wait for a slot, or raise ProviderOverloaded."""
+        self.check()
+
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise self._overloaded() from None
+        finally:
+            self.waiting -= 1
+
+        self._waits.append(time.perf_counter() - start)
+        self.admitted += 1
+        self.in_flight += 1
+
+    def release(self) -> None:
+        """Give a slot back."""
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold a slot for the duration of the block."""
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def hold_during(self, stream: AsyncIterator[Any]) -> "ReleasingStream":
+        """Release an acquired slot once stream is exhausted or closed."""
+        return ReleasingStream(self, stream)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, wait times and shedding counters."""
+        waits = np.asarray(self._waits) * 1000
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "max_queue_depth": self.max_waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "wait_ms": {
+                "mean": float(waits.mean()) if waits.size else 0.0,
+                "p95": float(np.percentile(waits, 95)) if waits.size else 0.0,
+                "max": float(waits.max()) if waits.size else 0.0,
+            },
+        }
+
+class ReleasingStream:
+    """Async iterator that gives its limiter slot back when the stream ends."""
+
+    def __init__(self, limiter: ProviderLimiter, stream: AsyncIterator[Any]):
+        self._limiter = limiter
+        self._stream = stream
+        self._released = False
+
+    def _release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._limiter.release()
+
+    def __aiter__(self) -> "ReleasingStream":
+        return self
+
+    async def __anext__(self) -> Any:
+        try:
+            return await self._stream.__anext__()
+        except BaseException:
+            self._release()
+            raise
+
+    async def aclose(self) -> None:
+        self._release()
+        aclose = getattr(self._stream, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+    def __del__(self) -> None:
+        # A stream that is dropped without being consumed must not leak its slot
+        self._release()
+
+@lru_cache()
+def get_limiters() -> Dict[str, ProviderLimiter]:
+    """The limiter for each provider, built once from settings."""
+    settings = get_settings()
+    concurrency = {
+        ANTHROPIC: settings.ANTHROPIC_MAX_CONCURRENCY,
+        VOYAGE_EMBED: settings.VOYAGE_EMBED_MAX_CONCURRENCY,
+        VOYAGE_RERANK: settings.VOYAGE_RERANK_MAX_CONCURRENCY,
+    }
+    return {
+        name: ProviderLimiter(
+            name,
+            max_concurrency=limit,
+            max_queue=settings.PROVIDER_MAX_QUEUE,
+            queue_timeout=settings.PROVIDER_QUEUE_TIMEOUT_SECONDS,
+            retry_after=settings.PROVIDER_RETRY_AFTER_SECONDS,
+        )
+        for name, limit in concurrency.items()
+    }
+
+def get_limiter(provider: str) -> ProviderLimiter:
+    """The limiter for a provider."""
+    return get_limiters()[provider]
+
+def admission_stats() -> Dict[str, Any]:
+    """Stats for every provider limiter."""
+    return {name: limiter.stats() for name, limiter in get_limiters().items()}
@@ -0,0 +1,81 @@
+from typing import Any, AsyncIterator, Sequence
+from llama_index.core.base.llms.types import ChatMessage, ChatResponse, ChatResponseAsyncGen
+from llama_index.llms.anthropic import Anthropic
+from app.core.admission import ANTHROPIC, get_limiter
+from app.core.metrics import record_token_usage
+
+async def _count_stream_usage(stream: AsyncIterator[Any], model: str) -> AsyncIterator[Any]:
+    """Pass a streamed message through, counting its tokens once it ends."""
+    input_tokens = output_tokens = 0
+    try:
+        async for event in stream:
+            if event.type == "message_start":
+                input_tokens = event.message.usage.input_tokens
+                output_tokens = event.message.usage.output_tokens
+            elif event.type == "message_delta":
+                # Output usage on message_delta is cumulative
+                output_tokens = event.usage.output_tokens
+            yield event
+    finally:
+        record_token_usage(model, input_tokens, output_tokens)
+
+class UsageRecordingMessages:
+    """Anthropic messages resource that counts the tokens each call uses."""
+
+    def __init__(self, messages: Any):
+        self._messages = messages
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._messages, name)
+
+    async def create(self, **kwargs: Any) -> Any:
+        response = await self._messages.create(**kwargs)
+        model = kwargs.get("model", "unknown")
+        if kwargs.get("stream"):
+            return _count_stream_usage(response, model)
+        record_token_usage(model, response.usage.input_tokens, response.usage.output_tokens)
+        return response
+
+class UsageRecordingClient:
+    """Async Anthropic client wrapper whose message calls feed the token counters."""
+
+    def __init__(self, client: Any):
+        self._client = client
+        self.messages = UsageRecordingMessages(client.messages)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+class AdmittedAnthropic(Anthropic):
+    """Anthropic LLM whose async calls wait for a slot from the provider limiter.
+
+    Completion calls go through achat, so limiting achat and astream_chat
+    covers every async path. A streaming call keeps its slot until the stream
+    is consumed. Token usage of every async call is counted per model.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self._aclient = UsageRecordingClient(self._aclient)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "AdmittedAnthropic"
+
+    async def achat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        async with get_limiter(ANTHROPIC).slot():
+            return await super().achat(messages, **kwargs)
+
+    async def astream_chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponseAsyncGen:
+        limiter = get_limiter(ANTHROPIC)
+        await limiter.acquire()
+        try:
+            stream = await super().astream_chat(messages, **kwargs)
+        except BaseException:
+            limiter.release()
+            raise
+        return limiter.hold_during(stream)
+
+    async def awarmup(self) -> None:
+        """Open a connection to the Anthropic API without generating any tokens."""
+        await self._aclient.models.list(limit=1)
@@ -0,0 +1,195 @@
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import asyncio
+import logging
+import math
+import os
+import re
+import numpy as np
+import orjson
+from llama_index.core.schema import BaseNode, MetadataMode
+from llama_index.core.vector_stores.types import MetadataFilters
+from app.core.config import get_settings
+from app.core.metrics import LEXICAL_QUERY, track_stage
+from app.core.numpy_vector_store import MetadataMasks
+
+logger = logging.getLogger(__name__)
+
+LEXICAL_INDEX_DIR = "bm25"
+OFFSETS_FILE = "offsets.npy"
+POSTINGS_FILE = "postings.npy"
+WEIGHTS_FILE = "weights.npy"
+DOCS_FILE = "docs.json"
+
+# Metadata kept per document so the vector retrieval filters can be applied
+FILTER_FIELDS = ("chunk_id", "fragment_type", "act_name", "act_year")
+
+K1 = 1.2
+B = 0.75
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a an and any are as at be been by for from has have if in into is it its may must
+not of on or such that the their there this to under was were which who with
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase words and numbers, without stopwords."""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+def document_text(node: BaseNode) -> str:
+    """Text a node is indexed under: its heading, then its content."""
+    heading = node.metadata.get("heading") or ""
+    return f"{heading}\n{node.get_content(metadata_mode=MetadataMode.NONE)}"
+
+def get_lexical_index_path() -> str:
+    return os.path.join(get_settings().VECTOR_STORE_PATH, LEXICAL_INDEX_DIR)
+
+class BM25Index:
+    """BM25 inverted index over fragment text and headings.
+
+    Postings are kept as three flat arrays: per-term offsets into the
+    document ids, and the BM25 weight of each posting, precomputed at build
+    time so a query only sums the postings of its terms. The arrays are
+    memory-mapped when loaded, so workers share one copy through the page
+    cache.
+    """
+
+    def __init__(
+        self,
+        terms: Dict[str, int],
+        offsets: np.ndarray,
+        postings: np.ndarray,
+        weights: np.ndarray,
+        node_ids: List[str],
+        metadata: List[Dict[str, Any]],
+    ):
+        self.terms = terms
+        self.offsets = offsets
+        self.postings = postings
+        self.weights = weights
+        self.node_ids = node_ids
+        self.metadata = metadata
+        self.masks = MetadataMasks(metadata)
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    @classmethod
+    def from_nodes(cls, nodes: Iterable[BaseNode]) -> "BM25Index":
+        """Tokenize the nodes and precompute the weight of every posting."""
+        node_ids, metadata, term_counts = [], [], []
+        for node in nodes:
+            node_ids.append(node.node_id)
+            metadata.append({field: node.metadata.get(field) for field in FILTER_FIELDS})
+            counts: Dict[str, int] = {}
+            for token in tokenize(document_text(node)):
+                counts[token] = counts.get(token, 0) + 1
+            term_counts.append(counts)
+
+        lengths = np.array([sum(counts.values()) for counts in term_counts], dtype=np.float32)
+        average_length = float(lengths.mean()) if len(lengths) else 0.0
+
+        # term -> [(document, term frequency)]
+        inverted: Dict[str, List[Tuple[int, int]]] = {}
+        for doc, counts in enumerate(term_counts):
+            for term, count in counts.items():
+                inverted.setdefault(term, []).append((doc, count))
+
+        terms = {term: i for i, term in enumerate(sorted(inverted))}
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        postings = np.zeros(sum(len(entries) for entries in inverted.values()), dtype=np.uint32)
+        weights = np.zeros(len(postings), dtype=np.float32)
+        position = 0
+        for term in sorted(inverted):
+            entries = inverted[term]
+            docs = np.array([doc for doc, _ in entries], dtype=np.uint32)
+            frequencies = np.array([count for _, count in entries], dtype=np.float32)
+            idf = math.log(1 + (len(node_ids) - len(entries) + 0.5) / (len(entries) + 0.5))
+            norms = K1 * (1 - B + B * lengths[docs] / (average_length or 1.0))
+            postings[position:position + len(entries)] = docs
+            weights[position:position + len(entries)] = idf * frequencies * (K1 + 1) / (frequencies + norms)
+            position += len(entries)
+            offsets[terms[term] + 1] = position
+
+        return cls(terms, offsets, postings, weights, node_ids, metadata)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["BM25Index"]:
+        """Load a persisted index, memory-mapping its arrays, or None if there is none."""
+        docs_path = os.path.join(path, DOCS_FILE)
+        if not os.path.exists(docs_path):
+            return None
+        with open(docs_path, "rb") as f:
+            docs = orjson.loads(f.read())
+        index = cls(
+            terms={term: i for i, term in enumerate(docs["terms"])},
+            offsets=np.load(os.path.join(path, OFFSETS_FILE), mmap_mode="r"),
+            postings=np.load(os.path.join(path, POSTINGS_FILE), mmap_mode="r"),
+            weights=np.load(os.path.join(path, WEIGHTS_FILE), mmap_mode="r"),
+            node_ids=docs["node_ids"],
+            metadata=docs["metadata"],
+        )
+        logger.info(f"Loaded BM25 index of {len(index)} documents and {len(index.terms)} terms from {path}")
+        return index
+
+    def persist(self, path: str) -> None:
+        """Write the index under path, replacing each file atomically."""
+        os.makedirs(path, exist_ok=True)
+        files = {
+            OFFSETS_FILE: self.offsets,
+            POSTINGS_FILE: self.postings,
+            WEIGHTS_FILE: self.weights,
+        }
+        for name, array in files.items():
+            with open(os.path.join(path, f"{name}.tmp"), "wb") as f:
+                np.save(f, np.ascontiguousarray(array))
+        terms = sorted(self.terms, key=self.terms.get)
+        with open(os.path.join(path, f"{DOCS_FILE}.tmp"), "wb") as f:
+            f.write(orjson.dumps({"terms": terms, "node_ids": self.node_ids, "metadata": self.metadata}))
+        # The docs file goes last: load only looks for it
+        for name in (*files, DOCS_FILE):
+            os.replace(os.path.join(path, f"{name}.tmp"), os.path.join(path, name))
+
+    def search(self, query: str, top_k: int, filters: Optional[MetadataFilters] = None) -> List[Tuple[str, float]]:
+        """Node ids and BM25 scores of the top_k documents matching a query, best first."""
+        scores = np.zeros(len(self), dtype=np.float32)
+        for token in set(tokenize(query)):
+            term = self.terms.get(token)
+            if term is None:
+                continue
+            start, end = self.offsets[term], self.offsets[term + 1]
+            # A term lists each document once, so plain fancy indexing accumulates correctly
+            scores[self.postings[start:end]] += self.weights[start:end]
+
+        if filters is not None and filters.filters:
+            scores[~self.masks.filters_mask(filters)] = 0.0
+        candidates = np.flatnonzero(scores)
+        if not len(candidates):
+            return []
+        k = min(top_k, len(candidates))
+        best = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [(self.node_ids[doc], float(scores[doc])) for doc in best]
+
+    async def asearch(self, query: str, top_k: int, filters: Optional[MetadataFilters] = None) -> List[Tuple[str, float]]:
+        """Search in a worker thread."""
+        with track_stage(LEXICAL_QUERY):
+            return await asyncio.to_thread(self.search, query, top_k, filters)
+
+def build_lexical_index(nodes: Sequence[BaseNode]) -> BM25Index:
+    """Build the BM25 index for the nodes and write it under VECTOR_STORE_PATH."""
+    index = BM25Index.from_nodes(nodes)
+    index.persist(get_lexical_index_path())
+    logger.info(f"Built BM25 index of {len(index)} documents and {len(index.terms)} terms")
+    return index
+
+def load_lexical_index() -> Optional[BM25Index]:
+    """Load the BM25 index for hybrid retrieval, or None when disabled or not built."""
+    settings = get_settings()
+    if not settings.HYBRID_RETRIEVAL_ENABLED:
+        return None
+    index = BM25Index.load(get_lexical_index_path())
+    if index is None:
+        logger.warning("No BM25 index found; retrieval is vector only until create-vector-index is re-run")
+    return index
@@ -0,0 +1,418 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def normalize_query(query: str) -> str:
+    """Normalise query text so trivially different spellings share a cache key."""
+    return " ".join(query.casefold().split())
+
+def make_cache_key(namespace: str, query: str, **params: Any) -> str:
+    """Build a stable cache key from a query and the parameters that affect its result."""
+    payload = json.dumps(
+        {"namespace": namespace, "query": normalize_query(query), **params},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class VersionedCache(ABC):
+    """Base for caches that are dropped whenever the index version changes."""
+
+    def __init__(self, version_fn: Optional[Callable[[], Optional[str]]] = None):
+        self._version_fn = version_fn
+        self._version = version_fn() if version_fn else None
+
+    def _check_version(self) -> None:
+        if self._version_fn is None:
+            return
+        version = self._version_fn()
+        if version != self._version:
+            self.clear()
+            self._version = version
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Drop every entry."""
+
+class ResponseCache(VersionedCache):
+    """Exact-match LRU cache of API responses.
+
+    Keys come from make_cache_key, so only requests with the same normalised
+    query and parameters share an entry. Setting max_entries to 0 disables the
+    cache.
+    """
+
+    def __init__(self, max_entries: int = 2048, ttl_seconds: float = 86400, version_fn: Optional[Callable[[], Optional[str]]] = None):
+        super().__init__(version_fn)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, if present and not expired."""
+        if self.max_entries <= 0:
+            return None
+
+        self._check_version()
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+                self.evictions += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: str, value: Any) -> None:
+        """Store value under key, evicting the least recently used entries."""
+        if self.max_entries <= 0:
+            return
+
+        self._check_version()
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop all entries."""
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current usage."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "index_version": self._version,
+        }
+
+@dataclass
+class _SemanticEntry:
+    query: str
+    value: Any
+    size: int
+    expires_at: float
+    slot: int
+
+class SemanticCache(VersionedCache):
+    """Cache of query engine answers looked up by query embedding similarity.
+
+    Embeddings are normalised and kept in a preallocated matrix, so a lookup is
+    a single matrix-vector product over all live entries. Entries are evicted
+    least recently used first once either max_entries or max_bytes is reached,
+    and expire after ttl_seconds.
+
+    All methods are synchronous and never await, so a cache shared by the
+    coroutines of one event loop needs no locking.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        max_entries: int = 1000,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl_seconds: float = 3600,
+        version_fn: Optional[Callable[[], Optional[str]]] = None,
+    ):
+        super().__init__(version_fn)
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+        self._entries: "OrderedDict[int, _SemanticEntry]" = OrderedDict()
+        self._slot_ids: Dict[int, int] = {}
+        self._vectors: Optional[np.ndarray] = None
+        self._free_slots: List[int] = list(range(max_entries - 1, -1, -1))
+        self._next_id = 0
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _normalise(self, embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        del self._slot_ids[entry.slot]
+        self._vectors[entry.slot] = 0.0
+        self._free_slots.append(entry.slot)
+        self._bytes -= entry.size
+
+    def _evict_expired(self, now: float) -> None:
+        expired = [entry_id for entry_id, entry in self._entries.items() if entry.expires_at <= now]
+        for entry_id in expired:
+            self._remove(entry_id)
+            self.evictions += 1
+
+    def lookup(self, embedding: List[float]) -> Optional[Tuple[Any, str, float]]:
+        """Return (value, cached query, similarity) for the closest entry above the threshold."""
+        self._check_version()
+        self._evict_expired(time.monotonic())
+
+        query = self._normalise(embedding)
+        if not self._entries or query.shape[0] != self._vectors.shape[1]:
+            self.misses += 1
+            return None
+
+        # Free slots are zeroed, so they can never pass a positive threshold
+        scores = self._vectors @ query
+        slot = int(np.argmax(scores))
+        similarity = float(scores[slot])
+        if similarity < self.threshold or slot not in self._slot_ids:
+            self.misses += 1
+            return None
+
+        entry_id = self._slot_ids[slot]
+        entry = self._entries[entry_id]
+        self._entries.move_to_end(entry_id)
+        self.hits += 1
+        return entry.value, entry.query, similarity
+
+    def store(self, query: str, embedding: List[float], value: Any, size: int) -> None:
+        """Add an entry, evicting least recently used entries to stay within the limits."""
+        if size > self.max_bytes or self.max_entries <= 0:
+            return
+
+        self._check_version()
+        vector = self._normalise(embedding)
+        if self._vectors is None:
+            self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+
+        while self._entries and (not self._free_slots or self._bytes + size > self.max_bytes):
+            oldest_id = next(iter(self._entries))
+            self._remove(oldest_id)
+            self.evictions += 1
+
+        slot = self._free_slots.pop()
+        self._vectors[slot] = vector
+        self._slot_ids[slot] = self._next_id
+        self._entries[self._next_id] = _SemanticEntry(
+            query=query,
+            value=value,
+            size=size,
+            expires_at=time.monotonic() + self.ttl_seconds,
+            slot=slot,
+        )
+        self._next_id += 1
+        self._bytes += size
+
+    def clear(self) -> None:
+        """Drop all entries."""
+        for entry_id in list(self._entries):
+            self._remove(entry_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current usage, for tuning the threshold."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "threshold": self.threshold,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "index_version": self._version,
+        }
+
+class EmbeddingCache:
+    """LRU cache of embedding vectors keyed by model and text.
+
+    Vectors are kept in memory as float32 arrays and, when a path is given,
+    written through to a sqlite file so they survive restarts. Entries never
+    expire: an embedding only depends on the model and the input text.
+    """
+
+    def __init__(self, max_entries: int = 10000, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.path = path
+        self._entries: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        # The connection is shared by the worker threads that read and write it
+        self._db_lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if path:
+            try:
+                self._db = self._open(path)
+            except sqlite3.Error as e:
+                logger.warning(f"Embedding cache persistence disabled: {e}")
+
+    def _open(self, path: str) -> sqlite3.Connection:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, text_hash))"
+        )
+        return db
+
+    @staticmethod
+    def _text_hash(text: str) -> str:
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def _remember(self, key: Tuple[str, str], vector: np.ndarray) -> None:
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _recall(self, key: Tuple[str, str]) -> Optional[np.ndarray]:
+        vector = self._entries.get(key)
+        if vector is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return vector
+
+    def _load(self, model: str, text: str) -> Optional[np.ndarray]:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT vector FROM embeddings WHERE model = ? AND text_hash = ?",
+                (model, self._text_hash(text)),
+            ).fetchone()
+        return np.frombuffer(row[0], dtype=np.float32) if row is not None else None
+
+    def _loaded(self, key: Tuple[str, str], vector: Optional[np.ndarray]) -> Optional[List[float]]:
+        if vector is None:
+            self.misses += 1
+            return None
+        self._remember(key, vector)
+        self.disk_hits += 1
+        return vector.tolist()
+
+    def _persist(self, model: str, text: str, vector: np.ndarray) -> None:
+        try:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)",
+                    (model, self._text_hash(text), vector.tobytes()),
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to persist embedding: {e}")
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        """Return the cached embedding for text, checking memory then disk."""
+        if self.max_entries <= 0:
+            return None
+
+        key = (model, text)
+        vector = self._recall(key)
+        if vector is not None:
+            return vector.tolist()
+        return self._loaded(key, self._load(model, text) if self._db is not None else None)
+
+    async def aget(self, model: str, text: str) -> Optional[List[float]]:
+        """Like get, but a memory miss reads sqlite in a worker thread."""
+        if self.max_entries <= 0:
+            return None
+
+        key = (model, text)
+        vector = self._recall(key)
+        if vector is not None:
+            return vector.tolist()
+        if self._db is None:
+            return self._loaded(key, None)
+        return self._loaded(key, await asyncio.to_thread(self._load, model, text))
+
+    def set(self, model: str, text: str, embedding: List[float]) -> None:
+        """Store an embedding in memory and, if enabled, on disk."""
+        if self.max_entries <= 0:
+            return
+
+        vector = np.asarray(embedding, dtype=np.float32)
+        self._remember((model, text), vector)
+        if self._db is not None:
+            self._persist(model, text, vector)
+
+    async def aset(self, model: str, text: str, embedding: List[float]) -> None:
+        """Like set, but writes to sqlite in a worker thread."""
+        if self.max_entries <= 0:
+            return
+
+        vector = np.asarray(embedding, dtype=np.float32)
+        self._remember((model, text), vector)
+        if self._db is not None:
+            await asyncio.to_thread(self._persist, model, text, vector)
+
+    async def aget_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """Cached embeddings for texts, reading every memory miss from sqlite in one worker thread."""
+        if self.max_entries <= 0:
+            return [None] * len(texts)
+
+        vectors = [self._recall((model, text)) for text in texts]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        loaded: List[Optional[np.ndarray]] = [None] * len(missing)
+        if missing and self._db is not None:
+            loaded = await asyncio.to_thread(lambda: [self._load(model, texts[i]) for i in missing])
+        embeddings = [vector.tolist() if vector is not None else None for vector in vectors]
+        for i, vector in zip(missing, loaded):
+            embeddings[i] = self._loaded((model, texts[i]), vector)
+        return embeddings
+
+    async def aset_many(self, model: str, texts: List[str], embeddings: List[List[float]]) -> None:
+        """Store embeddings in memory and write them to sqlite in one worker thread."""
+        if self.max_entries <= 0:
+            return
+
+        vectors = [np.asarray(embedding, dtype=np.float32) for embedding in embeddings]
+        for text, vector in zip(texts, vectors):
+            self._remember((model, text), vector)
+        if self._db is not None:
+            await asyncio.to_thread(lambda: [self._persist(model, text, vector) for text, vector in zip(texts, vectors)])
+
+    def clear(self) -> None:
+        """Drop the in-memory entries; the on-disk store is kept."""
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current usage."""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "path": self.path if self._db is not None else None,
+        }
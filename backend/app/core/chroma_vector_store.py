@@ -0,0 +1,176 @@
+from typing import Any, Dict, List, Optional
+import asyncio
+import json
+import math
+import logging
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode, TextNode
+from llama_index.core.vector_stores.types import MetadataFilters, VectorStoreQuery, VectorStoreQueryResult
+from llama_index.core.vector_stores.utils import metadata_dict_to_node
+from llama_index.vector_stores.chroma import ChromaVectorStore
+from llama_index.vector_stores.chroma.base import _to_chroma_filter
+from chromadb import HttpClient, AsyncHttpClient, Settings as ChromaSettings
+from app.core.config import get_settings
+from app.core.metrics import VECTOR_QUERY, track_stage
+
+logger = logging.getLogger(__name__)
+
+def get_chroma_client():
+    """Get or create a ChromaDB client."""
+    settings = get_settings()
+    return HttpClient(
+        host=settings.CHROMA_HOST,
+        port=settings.CHROMA_PORT,
+        settings=ChromaSettings(anonymized_telemetry=False, allow_reset=True, is_persistent=True)
+    )
+
+async def get_async_chroma_client():
+    """Create an async ChromaDB client."""
+    settings = get_settings()
+    return await AsyncHttpClient(
+        host=settings.CHROMA_HOST,
+        port=settings.CHROMA_PORT,
+        settings=ChromaSettings(anonymized_telemetry=False)
+    )
+
+def node_from_chroma(node_id: str, text: str, metadata: Dict[str, Any]) -> BaseNode:
+    """Rebuild a node stored in Chroma."""
+    try:
+        node = metadata_dict_to_node(metadata)
+        node.set_content(text)
+    except Exception:
+        # Nodes written without LlamaIndex metadata
+        node = TextNode(text=text, id_=node_id, metadata=metadata)
+    return node
+
+def query_result_from_chroma(results: Dict[str, Any], position: int = 0) -> VectorStoreQueryResult:
+    """Convert one query's results from a Chroma query response into a VectorStoreQueryResult."""
+    nodes = []
+    similarities = []
+    ids = []
+    for node_id, text, metadata, distance in zip(
+        results["ids"][position],
+        results["documents"][position],
+        results["metadatas"][position],
+        results["distances"][position],
+    ):
+        nodes.append(node_from_chroma(node_id, text, metadata))
+        # Same distance to similarity conversion as ChromaVectorStore
+        similarities.append(math.exp(-distance))
+        ids.append(node_id)
+
+    return VectorStoreQueryResult(nodes=nodes, similarities=similarities, ids=ids)
+
+class AsyncChromaVectorStore(ChromaVectorStore):
+    """ChromaVectorStore whose aquery does not block the event loop.
+
+    ChromaVectorStore.aquery falls back to the synchronous HTTP client, so
+    similarity queries here go through Chroma's async client instead. Anything
+    else still uses the sync client, offloaded to a worker thread.
+    """
+    _async_collection: Any = PrivateAttr(default=None)
+    _async_lock: asyncio.Lock = PrivateAttr(default_factory=asyncio.Lock)
+
+    async def _get_async_collection(self) -> Any:
+        """Open the async client and collection on first use."""
+        async with self._async_lock:
+            if self._async_collection is None:
+                client = await get_async_chroma_client()
+                self._async_collection = await client.get_collection(self._collection.name)
+        return self._async_collection
+
+    async def aquery(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        """Query the collection with the async client."""
+        if not query.query_embedding:
+            # Metadata-only gets have no async path here
+            return await asyncio.to_thread(self.query, query, **kwargs)
+
+        if query.filters is not None:
+            where = _to_chroma_filter(query.filters)
+        else:
+            where = kwargs.pop("where", None)
+
+        collection = await self._get_async_collection()
+        with track_stage(VECTOR_QUERY):
+            results = await collection.query(
+                query_embeddings=[query.query_embedding],
+                n_results=query.similarity_top_k,
+                where=where or None,
+                **kwargs,
+            )
+        return query_result_from_chroma(results)
+
+    async def aget_nodes(self, node_ids: Optional[List[str]] = None, filters: Optional[MetadataFilters] = None) -> List[BaseNode]:
+        """Get nodes by id and/or filters with the async client."""
+        collection = await self._get_async_collection()
+        results = await collection.get(
+            ids=node_ids,
+            where=_to_chroma_filter(filters) if filters is not None else None,
+            include=["documents", "metadatas"],
+        )
+        return [
+            node_from_chroma(node_id, text, metadata)
+            for node_id, text, metadata in zip(results["ids"], results["documents"], results["metadatas"])
+        ]
+
+    async def aquery_batch(self, queries: List[VectorStoreQuery]) -> List[VectorStoreQueryResult]:
+        """Run several similarity queries with one Chroma request per distinct filter."""
+        groups: Dict[str, List[int]] = {}
+        wheres: Dict[str, Dict[str, Any]] = {}
+        for i, query in enumerate(queries):
+            where = _to_chroma_filter(query.filters) if query.filters is not None else {}
+            key = json.dumps(where, sort_keys=True, default=str)
+            groups.setdefault(key, []).append(i)
+            wheres[key] = where
+
+        collection = await self._get_async_collection()
+        results: List[Optional[VectorStoreQueryResult]] = [None] * len(queries)
+
+        async def run(key: str, positions: List[int]) -> None:
+            with track_stage(VECTOR_QUERY):
+                response = await collection.query(
+                    query_embeddings=[queries[i].query_embedding for i in positions],
+                    n_results=max(queries[i].similarity_top_k for i in positions),
+                    where=wheres[key] or None,
+                )
+            for position, i in enumerate(positions):
+                result = query_result_from_chroma(response, position)
+                top_k = queries[i].similarity_top_k
+                results[i] = VectorStoreQueryResult(
+                    nodes=result.nodes[:top_k],
+                    similarities=result.similarities[:top_k],
+                    ids=result.ids[:top_k],
+                )
+
+        await asyncio.gather(*(run(key, positions) for key, positions in groups.items()))
+        return results
+
+def open_chroma_vector_store(collection_name: str) -> AsyncChromaVectorStore:
+    """Get or create a Chroma collection."""
+    # Initialize ChromaDB client
+    chroma_client = get_chroma_client()
+
+    # List existing collections
+    existing_collections = chroma_client.list_collections()
+    logger.info(f"Existing collections: {existing_collections}")
+
+    # Get or create collection
+    collection = chroma_client.get_or_create_collection(
+        name=collection_name,
+        configuration={
+            "hnsw": {
+                "space": "cosine",
+                "ef_construction": 100,
+                "ef_search": 100,
+                "max_neighbors": 64
+            }
+        }
+    )
+
+    # Create and return vector store
+    vector_store = AsyncChromaVectorStore(
+        chroma_collection=collection,
+        store_metadata=True
+    )
+
+    return vector_store
\ No newline at end of file
@@ -0,0 +1,263 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from dataclasses import dataclass
+import logging
+import os
+import re
+import orjson
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import MetadataFilters
+from app.core.config import get_settings
+from app.core.numpy_vector_store import MetadataMasks
+
+logger = logging.getLogger(__name__)
+
+CITATIONS_FILE = "citations.json"
+
+# Node metadata kept per fragment
+FIELDS = (
+    "chunk_id",
+    "fragment_type",
+    "act_name",
+    "act_year",
+    "part_label",
+    "subpart_label",
+    "section_label",
+    "schedule_label",
+    "paragraph_label",
+)
+
+LABEL = r"(\d+[a-z]{0,4})"
+SECTION_PATTERN = re.compile(r"\b(?:sections?|sec|ss?)\.?\s*" + LABEL + r"((?:\s*\(\s*[0-9a-z]+\s*\))*)")
+SUBSECTION_PATTERN = re.compile(r"\bsubsection\s*\(\s*([0-9a-z]+)\s*\)")
+SUBPART_PATTERN = re.compile(r"\b(?:subpart|subpt)\.?\s*" + LABEL)
+PART_PATTERN = re.compile(r"\b(?:part|pt)\.?\s*" + LABEL)
+SCHEDULE_PATTERN = re.compile(r"\b(?:schedule|sched|sch)\.?\s*" + LABEL)
+BRACKET_PATTERN = re.compile(r"\(\s*([0-9a-z]+)\s*\)")
+SUBSECTION_ID_PATTERN = re.compile(r"\bSubsection \(([^)]+)\)")
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Fragment types keyed on their section and subdivisions; Notes and tables
+# share their section's labels but are not what a citation names
+SECTION_LEVEL_TYPES = ("Section", "Subsection", "LabelPara")
+
+# Words that may surround a citation without making the query a question about something else
+FILLER_WORDS = frozenset("the of in under see show me text what does say says".split())
+
+@dataclass(frozen=True)
+class Citation:
+    """A reference to a provision of an Act, with labels upper-cased."""
+    act: str
+    part: Optional[str] = None
+    subpart: Optional[str] = None
+    schedule: Optional[str] = None
+    section: Optional[str] = None
+    # Subsection then paragraph labels, e.g. ("1", "A") for s 47(1)(a)
+    subdivisions: Tuple[str, ...] = ()
+
+    @property
+    def act_only(self) -> bool:
+        """Whether this names the whole Act rather than a provision of it."""
+        return self.part is None and self.schedule is None and self.section is None
+
+    def keys(self) -> List[Tuple[str, ...]]:
+        """Index keys for this citation, most specific first."""
+        if self.section is not None:
+            base = (self.act, "section", self.schedule or "", self.section)
+            return [base + self.subdivisions[:n] for n in range(len(self.subdivisions), -1, -1)]
+        if self.part is not None:
+            keys = [(self.act, "part", self.schedule or "", self.part)]
+            if self.subpart is not None:
+                keys.insert(0, (self.act, "part", self.schedule or "", self.part, self.subpart))
+            return keys
+        if self.schedule is not None:
+            return [(self.act, "schedule", self.schedule)]
+        return [(self.act, "act")]
+
+def _label(value: Optional[str]) -> Optional[str]:
+    return value.strip().upper() if value else None
+
+def entry_keys(entry: Dict[str, Any]) -> List[Tuple[str, ...]]:
+    """Index keys a fragment is found under."""
+    act = entry.get("act_name")
+    if not act:
+        return []
+    fragment_type = entry.get("fragment_type")
+    if fragment_type == "Act":
+        return [(act, "act")]
+    schedule = _label(entry.get("schedule_label")) or ""
+    if fragment_type == "Part" and entry.get("part_label"):
+        return [(act, "part", schedule, _label(entry["part_label"]))]
+    if fragment_type == "Subpart" and entry.get("part_label") and entry.get("subpart_label"):
+        return [(act, "part", schedule, _label(entry["part_label"]), _label(entry["subpart_label"]))]
+    if fragment_type == "Schedule" and entry.get("schedule_label"):
+        return [(act, "schedule", _label(entry["schedule_label"]))]
+    if fragment_type in SECTION_LEVEL_TYPES and entry.get("section_label"):
+        subdivisions = []
+        # Paragraphs sit under a subsection too, which only their chunk_id records
+        match = SUBSECTION_ID_PATTERN.search(entry.get("chunk_id") or "")
+        if match is not None:
+            subdivisions.append(match.group(1))
+        elif fragment_type == "Subsection":
+            return []
+        subdivisions.extend(WORD_PATTERN.findall((entry.get("paragraph_label") or "").lower()))
+        base = (act, "section", schedule, _label(entry["section_label"]))
+        return [base + tuple(_label(label) for label in subdivisions)]
+    return []
+
+class CitationIndex:
+    """In-memory lookup from citations like "Commerce Act 1986 s 36" to fragments.
+
+    Fragments are keyed on their Act and labels (part, subpart, schedule,
+    section, subsection and paragraph) and on their chunk_id. A query is
+    only resolved when it is nothing but a citation; questions that merely
+    mention a provision still go through search. A bare Act title is only
+    resolved for callers whose filters select Act fragments alone, so
+    elsewhere it is searched like any other query.
+    """
+
+    def __init__(self, entries: List[Dict[str, Any]]):
+        self.entries = entries
+        self.masks = MetadataMasks(entries)
+        self._keys: Dict[Tuple[str, ...], List[int]] = {}
+        self._chunk_ids: Dict[str, int] = {}
+        # Lower-cased Act title, with and without its year -> Act name
+        titles: Dict[str, Tuple[str, str]] = {}
+        for i, entry in enumerate(entries):
+            for key in entry_keys(entry):
+                self._keys.setdefault(key, []).append(i)
+            if entry.get("chunk_id"):
+                self._chunk_ids[entry["chunk_id"].lower()] = i
+            act = entry.get("act_name")
+            if act and act.lower() not in titles:
+                year = str(entry.get("act_year") or "")
+                titles[act.lower()] = (act, year)
+                short = act.lower().removesuffix(f" {year}") if year else None
+                # A title without its year names the most recent Act of that title
+                if short and short != act.lower() and year >= titles.get(short, ("", ""))[1]:
+                    titles[short] = (act, year)
+        self._acts = {title: act for title, (act, _) in titles.items()}
+        alternatives = "|".join(re.escape(title) for title in sorted(self._acts, key=len, reverse=True))
+        self._act_pattern = re.compile(r"\b(" + alternatives + r")\b") if alternatives else None
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @classmethod
+    def from_nodes(cls, nodes: Iterable[BaseNode]) -> "CitationIndex":
+        return cls([{field: node.metadata.get(field) for field in FIELDS} for node in nodes])
+
+    @classmethod
+    def load(cls, path: str) -> Optional["CitationIndex"]:
+        """Load a persisted index, or None if there is none."""
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            index = cls(orjson.loads(f.read()))
+        logger.info(f"Loaded citation index of {len(index)} fragments from {path}")
+        return index
+
+    def persist(self, path: str) -> None:
+        """Write the index to path atomically."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(f"{path}.tmp", "wb") as f:
+            f.write(orjson.dumps(self.entries))
+        os.replace(f"{path}.tmp", path)
+
+    def parse(self, query: str) -> Optional[Citation]:
+        """The citation a query consists of, or None if it is not only a citation."""
+        text = " ".join(query.lower().split()).strip(" .?")
+        if self._act_pattern is None:
+            return None
+        act_match = self._act_pattern.search(text)
+        if act_match is None:
+            return None
+        act = self._acts[act_match.group(1)]
+        rest = text[:act_match.start()] + " " + text[act_match.end():]
+
+        fields: Dict[str, Any] = {}
+        for name, pattern in (
+            ("section", SECTION_PATTERN),
+            ("subsection", SUBSECTION_PATTERN),
+            ("subpart", SUBPART_PATTERN),
+            ("part", PART_PATTERN),
+            ("schedule", SCHEDULE_PATTERN),
+        ):
+            match = pattern.search(rest)
+            if match is None:
+                continue
+            fields[name] = match
+            rest = rest[:match.start()] + " " + rest[match.end():]
+
+        # Anything left other than filler words makes this a question, not a citation
+        if any(word not in FILLER_WORDS for word in WORD_PATTERN.findall(rest)):
+            return None
+
+        subdivisions: List[str] = []
+        if "section" in fields:
+            subdivisions = BRACKET_PATTERN.findall(fields["section"].group(2) or "")
+            if not subdivisions and "subsection" in fields:
+                subdivisions = [fields["subsection"].group(1)]
+        elif "subsection" in fields:
+            # A subsection needs its section
+            return None
+
+        return Citation(
+            act=act,
+            part=_label(fields["part"].group(1)) if "part" in fields else None,
+            subpart=_label(fields["subpart"].group(1)) if "subpart" in fields else None,
+            schedule=_label(fields["schedule"].group(1)) if "schedule" in fields else None,
+            section=_label(fields["section"].group(1)) if "section" in fields else None,
+            subdivisions=tuple(_label(label) for label in subdivisions),
+        )
+
+    def resolve(self, query: str, filters: Optional[MetadataFilters] = None, top_k: int = 10) -> List[str]:
+        """chunk_ids of the fragments a citation query names, or [] if it names none.
+
+        A cited subdivision that is filtered out, such as a Subsection under
+        the default filters, falls back to the provision containing it.
+        """
+        try:
+            mask = self.masks.filters_mask(filters) if filters is not None else None
+        except ValueError:
+            # A filter the masks cannot answer; leave the query to search
+            return []
+        matches = (lambda i: True) if mask is None else (lambda i: bool(mask[i]))
+        # Whether the caller asks for Acts, and nothing else
+        acts = mask is not None and bool(mask.any()) and not (mask & ~self.masks.value_mask("fragment_type", "Act")).any()
+
+        exact = self._chunk_ids.get(" ".join(query.lower().split()))
+        if exact is not None:
+            if self.entries[exact].get("fragment_type") == "Act" and not acts:
+                return []
+            return [self.entries[exact]["chunk_id"]] if matches(exact) else []
+
+        citation = self.parse(query)
+        if citation is None:
+            return []
+        if citation.act_only and not acts:
+            return []
+        for key in citation.keys():
+            found = [i for i in self._keys.get(key, []) if matches(i)]
+            if found:
+                return [self.entries[i]["chunk_id"] for i in found[:top_k]]
+        return []
+
+def get_citation_index_path() -> str:
+    return os.path.join(get_settings().VECTOR_STORE_PATH, CITATIONS_FILE)
+
+def build_citation_index(nodes: Iterable[BaseNode]) -> CitationIndex:
+    """Build the citation index for the nodes and write it under VECTOR_STORE_PATH."""
+    index = CitationIndex.from_nodes(nodes)
+    index.persist(get_citation_index_path())
+    logger.info(f"Built citation index of {len(index)} fragments")
+    return index
+
+def load_citation_index() -> Optional[CitationIndex]:
+    """Load the citation index for the lookup fast path, or None when disabled or not built."""
+    settings = get_settings()
+    if not settings.CITATION_LOOKUP_ENABLED:
+        return None
+    index = CitationIndex.load(get_citation_index_path())
+    if index is None:
+        logger.warning("No citation index found; citation lookup is off until create-vector-index is re-run")
+    return index
@@ -17,13 +17,106 @@ class Settings(BaseSettings):
 
     # Vector Store Settings
     VECTOR_STORE_PATH: str = "vector_store"
+    # "chroma", or "numpy" for exact in-process search over a memory-mapped
+    # matrix under VECTOR_STORE_PATH, built by create-vector-index
+    VECTOR_STORE_BACKEND: str = "chroma"
+    # Keep Acts, Subsections and the other fragment types in separate
+    # collections, so fragment_type filters pick a collection instead of
+    # filtering inside one. Needs a re-run of create-vector-index.
+    VECTOR_STORE_PARTITIONED: bool = False
 
     # Chroma Settings
     CHROMA_HOST: str = "localhost"
     CHROMA_PORT: int = 9000
 
-    # Phoenix Settings
-    PHOENIX_API_KEY: str
+    # Hybrid retrieval: a BM25 index over fragment text and headings, built
+    # with the vector index, is searched alongside it and the two rankings
+    # are fused by reciprocal rank before rerank. The query engines then ask
+    # the vector store for fewer candidates and rerank fewer.
+    HYBRID_RETRIEVAL_ENABLED: bool = True
+    HYBRID_VECTOR_TOP_K: int = 10
+    HYBRID_LEXICAL_TOP_K: int = 10
+    HYBRID_RERANK_CANDIDATES: int = 12
+    HYBRID_RRF_K: int = 60
+
+    # Queries that only cite a provision ("Commerce Act 1986 s 36") take the
+    # cited fragments from an in-memory citation index built with the vector
+    # index, skipping embedding, search and rerank; the answer is still synthesised
+    CITATION_LOOKUP_ENABLED: bool = True
+
+    # Semantic answer cache for the query engines
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 1000
+    SEMANTIC_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    SEMANTIC_CACHE_TTL_SECONDS: int = 3600
+
+    # Exact-match response cache for the tools endpoints (0 entries disables it)
+    RESPONSE_CACHE_MAX_ENTRIES: int = 2048
+    RESPONSE_CACHE_TTL_SECONDS: int = 86400
+
+    # Rerank ordering cache (0 entries disables it)
+    RERANK_CACHE_MAX_ENTRIES: int = 4096
+
+    # Query embedding cache, persisted under VECTOR_STORE_PATH when enabled
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 10000
+    EMBEDDING_CACHE_PERSIST: bool = True
+
+    # Outbound provider concurrency limits and load shedding
+    ANTHROPIC_MAX_CONCURRENCY: int = 8
+    VOYAGE_EMBED_MAX_CONCURRENCY: int = 16
+    VOYAGE_RERANK_MAX_CONCURRENCY: int = 8
+    PROVIDER_MAX_QUEUE: int = 64
+    PROVIDER_QUEUE_TIMEOUT_SECONDS: float = 10.0
+    PROVIDER_RETRY_AFTER_SECONDS: int = 2
+
+    # ETag/Last-Modified validators remembered for 304s on the legislation API
+    VALIDATOR_CACHE_MAX_ENTRIES: int = 10000
+    VALIDATOR_CACHE_TTL_SECONDS: int = 300
+
+    # Built tables of contents and fragment subtrees
+    LEGISLATION_TREE_CACHE_MAX_ENTRIES: int = 256
+    LEGISLATION_TREE_CACHE_TTL_SECONDS: int = 86400
+
+    # Response compression
+    RESPONSE_COMPRESSION_MIN_BYTES: int = 1024
+    RESPONSE_GZIP_LEVEL: int = 6
+    RESPONSE_BROTLI_QUALITY: int = 5
+
+    # Chat agent: "react" runs one tool per step, "function_calling" runs the
+    # tool calls the LLM requests together concurrently. The function calling
+    # agent cannot stream, so in that mode /api/chat sends no answer tokens
+    # as they are generated, only the whole answer as one text part at the end
+    AGENT_MODE: str = "react"
+
+    # Speculative retrieval for the chat message, reused by close enough tool queries
+    CHAT_PREFETCH_ENABLED: bool = True
+    CHAT_PREFETCH_SIMILARITY: float = 0.85
+
+    # Server-side chat sessions: history replayed to the agent and background summaries
+    CHAT_MEMORY_TOKEN_LIMIT: int = 4000
+    CHAT_SUMMARY_TRIGGER_TOKENS: int = 3000
+    CHAT_SUMMARY_KEEP_MESSAGES: int = 4
+
+    # Startup warmup: open provider connections and run a dummy retrieval before reporting ready
+    WARMUP_ENABLED: bool = True
+    WARMUP_QUERY: str = "fair trading"
+
+    # Tracing: "otlp" sends spans to TRACING_ENDPOINT, which must be set,
+    # "file" appends them as JSON lines to TRACING_FILE_PATH, "none" turns
+    # tracing off. Spans are sampled and exported in batches off the request
+    # path; a full queue drops spans.
+    TRACING_EXPORTER: str = "none"
+    TRACING_ENDPOINT: str | None = None
+    TRACING_FILE_PATH: str = "traces.jsonl"
+    TRACING_PROJECT_NAME: str = "pco-chatbot-rnd2"
+    TRACING_SAMPLE_RATE: float = 1.0
+    TRACING_MAX_QUEUE_SIZE: int = 2048
+    TRACING_EXPORT_BATCH_SIZE: int = 512
+    TRACING_EXPORT_DELAY_MS: int = 5000
+
+    # Phoenix Settings: bearer token for the OTLP exporter
+    PHOENIX_API_KEY: str | None = None
 
     class Config:
         env_file = "../.env"
@@ -1,20 +1,149 @@
-from llama_index.embeddings.voyageai import VoyageEmbedding
+from typing import Any, Dict, List, Optional
+import asyncio
+from pathlib import Path
 from llama_index.core import Settings
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import PrivateAttr
 from app.core.config import get_settings
-import voyageai
-from llama_index.postprocessor.voyageai_rerank import VoyageAIRerank
+from app.core.cache import EmbeddingCache
+from app.core.admission import VOYAGE_EMBED, get_limiter
+from app.core.metrics import EMBED_QUERY, track_stage
 
-def configure_embeddings() -> None:
+EMBEDDING_CACHE_FILE = "embedding_cache.sqlite"
+
+# Queries are short, so they can be sent in much larger batches than documents
+QUERY_BATCH_SIZE = 128
+
+class CachedEmbedding(BaseEmbedding):
+    """Embedding model wrapper that caches query embeddings.
+
+    Queries are looked up by (model, text) before calling the wrapped model,
+    so a repeated query or agent sub-query costs no API round-trip. Document
+    embeddings are only computed at index time and are passed straight through.
+    Async calls to the wrapped model wait for a slot from the provider limiter.
+    """
+    _inner: BaseEmbedding = PrivateAttr()
+    _cache: EmbeddingCache = PrivateAttr()
+
+    def __init__(self, inner: BaseEmbedding, cache: EmbeddingCache, **kwargs: Any):
+        super().__init__(
+            model_name=inner.model_name,
+            embed_batch_size=inner.embed_batch_size,
+            callback_manager=inner.callback_manager,
+            **kwargs,
+        )
+        self._inner = inner
+        self._cache = cache
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    @property
+    def inner(self) -> BaseEmbedding:
+        return self._inner
+
+    @property
+    def cache(self) -> EmbeddingCache:
+        return self._cache
+
+    @property
+    def _cache_model(self) -> str:
+        # Voyage embeds queries and documents differently, so keep them apart
+        return f"{self.model_name}:query"
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        embedding = self._cache.get(self._cache_model, query)
+        if embedding is None:
+            with track_stage(EMBED_QUERY):
+                embedding = self._inner._get_query_embedding(query)
+            self._cache.set(self._cache_model, query, embedding)
+        return embedding
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        embedding = await self._cache.aget(self._cache_model, query)
+        if embedding is None:
+            async with get_limiter(VOYAGE_EMBED).slot():
+                with track_stage(EMBED_QUERY):
+                    embedding = await self._inner._aget_query_embedding(query)
+            await self._cache.aset(self._cache_model, query, embedding)
+        return embedding
+
+    async def _aembed_queries(self, queries: List[str]) -> List[List[float]]:
+        # VoyageEmbedding embeds a list of queries in one request
+        if hasattr(self._inner, "_aembed"):
+            return await self._inner._aembed(queries, input_type="query")
+        return await asyncio.gather(*(self._inner._aget_query_embedding(query) for query in queries))
+
+    async def aget_query_embedding_batch(self, queries: List[str]) -> List[List[float]]:
+        """Embed many queries, sending only the uncached ones to the model in batches."""
+        embeddings = await self._cache.aget_many(self._cache_model, queries)
+        missing = list(dict.fromkeys(query for query, embedding in zip(queries, embeddings) if embedding is None))
+
+        computed = {}
+        for start in range(0, len(missing), QUERY_BATCH_SIZE):
+            batch = missing[start:start + QUERY_BATCH_SIZE]
+            async with get_limiter(VOYAGE_EMBED).slot():
+                with track_stage(EMBED_QUERY):
+                    vectors = await self._aembed_queries(batch)
+            computed.update(zip(batch, vectors))
+            await self._cache.aset_many(self._cache_model, batch, vectors)
+
+        return [
+            embedding if embedding is not None else computed[query]
+            for query, embedding in zip(queries, embeddings)
+        ]
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._inner._get_text_embedding(text)
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        async with get_limiter(VOYAGE_EMBED).slot():
+            return await self._inner._aget_text_embedding(text)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._inner._get_text_embeddings(texts)
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        async with get_limiter(VOYAGE_EMBED).slot():
+            return await self._inner._aget_text_embeddings(texts)
+
+    def stats(self) -> Dict[str, Any]:
+        """Query embedding cache counters."""
+        return self._cache.stats()
+
+async def aembed_queries(embed_model: BaseEmbedding, queries: List[str]) -> List[List[float]]:
+    """Embed a list of queries, batched when the model supports it."""
+    if isinstance(embed_model, CachedEmbedding):
+        return await embed_model.aget_query_embedding_batch(queries)
+    return await asyncio.gather(*(embed_model.aget_query_embedding(query) for query in queries))
+
+def create_embedding_cache() -> EmbeddingCache:
+    """Create the query embedding cache from settings."""
+    settings = get_settings()
+    path: Optional[str] = None
+    if settings.EMBEDDING_CACHE_PERSIST:
+        path = str(Path(settings.VECTOR_STORE_PATH) / EMBEDDING_CACHE_FILE)
+    return EmbeddingCache(max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES, path=path)
+
+def configure_embeddings() -> BaseEmbedding:
     """Configure the embedding model for LlamaIndex."""
+    # The Voyage SDK is heavy to import, so only load it when the model is configured
+    import voyageai
+    from llama_index.embeddings.voyageai import VoyageEmbedding
+
     settings = get_settings()
 
     # Set API key directly in VoyageAI module
     voyageai.api_key = settings.VOYAGE_API_KEY
 
     # Initialize VoyageAI embedding model
-    embed_model = VoyageEmbedding(
-        model_name="voyage-law-2"
+    embed_model = CachedEmbedding(
+        VoyageEmbedding(model_name="voyage-law-2"),
+        create_embedding_cache(),
     )
 
     # Configure LlamaIndex settings
-    Settings.embed_model = embed_model
\ No newline at end of file
+    Settings.embed_model = embed_model
+
+    return embed_model
@@ -0,0 +1,88 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+import asyncio
+from llama_index.core import VectorStoreIndex
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import BaseNode, NodeWithScore, QueryBundle
+from llama_index.core.vector_stores.types import MetadataFilters
+from app.core.bm25 import BM25Index
+
+# Damping constant from the original RRF paper: ranks past the first few add little
+RRF_K = 60
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = RRF_K) -> List[Tuple[str, float]]:
+    """Fuse ranked lists of ids by summing 1 / (k + rank), best first."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, node_id in enumerate(ranking, start=1):
+            scores[node_id] = scores.get(node_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+class HybridRetriever(BaseRetriever):
+    """Vector and BM25 retrieval run side by side and fused by reciprocal rank.
+
+    Exact legal terms and section numbers that the embedding ranks poorly
+    are picked up by BM25. Nodes found only by BM25 are loaded from the
+    vector store (or the docstore, for stores that do not keep text) so the
+    reranker sees their content.
+    """
+
+    def __init__(
+        self,
+        index: VectorStoreIndex,
+        vector_retriever: BaseRetriever,
+        lexical_index: BM25Index,
+        filters: Optional[MetadataFilters] = None,
+        lexical_top_k: int = 10,
+        top_k: int = 12,
+        rrf_k: int = RRF_K,
+    ):
+        super().__init__()
+        self.index = index
+        self.vector_retriever = vector_retriever
+        self.lexical_index = lexical_index
+        self.filters = filters
+        self.lexical_top_k = lexical_top_k
+        self.top_k = top_k
+        self.rrf_k = rrf_k
+
+    def _get_nodes(self, node_ids: List[str]) -> List[BaseNode]:
+        if self.index.vector_store.stores_text:
+            return self.index.vector_store.get_nodes(node_ids)
+        return self.index.docstore.get_nodes(node_ids)
+
+    async def _aget_nodes(self, node_ids: List[str]) -> List[BaseNode]:
+        if self.index.vector_store.stores_text:
+            return await self.index.vector_store.aget_nodes(node_ids)
+        return self.index.docstore.get_nodes(node_ids)
+
+    def _fuse(self, vector_nodes: List[NodeWithScore], lexical_ids: List[str]) -> List[Tuple[str, float]]:
+        fused = reciprocal_rank_fusion([[node.node.node_id for node in vector_nodes], lexical_ids], self.rrf_k)
+        return fused[: self.top_k]
+
+    def _with_nodes(self, fused: List[Tuple[str, float]], nodes: Dict[str, BaseNode]) -> List[NodeWithScore]:
+        # A node missing from the store (a stale BM25 index) is dropped
+        return [NodeWithScore(node=nodes[node_id], score=score) for node_id, score in fused if node_id in nodes]
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        vector_nodes = self.vector_retriever.retrieve(query_bundle)
+        lexical = self.lexical_index.search(query_bundle.query_str, self.lexical_top_k, self.filters)
+        fused = self._fuse(vector_nodes, [node_id for node_id, _ in lexical])
+
+        nodes = {node.node.node_id: node.node for node in vector_nodes}
+        missing = [node_id for node_id, _ in fused if node_id not in nodes]
+        if missing:
+            nodes.update((node.node_id, node) for node in self._get_nodes(missing))
+        return self._with_nodes(fused, nodes)
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        vector_nodes, lexical = await asyncio.gather(
+            self.vector_retriever.aretrieve(query_bundle),
+            self.lexical_index.asearch(query_bundle.query_str, self.lexical_top_k, self.filters),
+        )
+        fused = self._fuse(vector_nodes, [node_id for node_id, _ in lexical])
+
+        nodes = {node.node.node_id: node.node for node in vector_nodes}
+        missing = [node_id for node_id, _ in fused if node_id not in nodes]
+        if missing:
+            nodes.update((node.node_id, node) for node in await self._aget_nodes(missing))
+        return self._with_nodes(fused, nodes)
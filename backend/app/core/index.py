@@ -4,8 +4,13 @@ from llama_index.core.schema import TextNode, NodeRelationship, RelatedNodeInfo
 from llama_index.core.storage import StorageContext
 from app.db.models import LegislationFragment
 from app.core.vector_store import get_vector_store
+from app.core.numpy_vector_store import NumpyVectorStore
+from app.core.partitioned_vector_store import PartitionedVectorStore
+from app.core.bm25 import build_lexical_index
+from app.core.citations import build_citation_index
 from app.core.llm import configure_llm
 from app.core.embeddings import configure_embeddings
+from app.core.index_version import write_index_version
 
 def create_legislation_index(nodes: List[TextNode]) -> VectorStoreIndex:
     """Create a vector index from provided nodes."""
@@ -33,6 +38,17 @@ def create_legislation_index(nodes: List[TextNode]) -> VectorStoreIndex:
         insert_batch_size=1024,
     )
 
+    # The numpy store holds the nodes in memory until written out
+    if isinstance(vector_store, (NumpyVectorStore, PartitionedVectorStore)):
+        vector_store.persist()
+
+    # The BM25 and citation indexes are built from the same nodes
+    build_lexical_index(nodes)
+    build_citation_index(nodes)
+
+    # Stamp the new index so every cache keyed on the old version is dropped
+    write_index_version(len(nodes))
+
     return index
 
 def create_nodes_from_fragments(fragments: List[LegislationFragment]) -> List[TextNode]:
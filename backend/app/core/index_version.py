@@ -0,0 +1,51 @@
+from typing import Optional
+from datetime import datetime, timezone
+import json
+import os
+import uuid
+from app.core.config import get_settings
+
+INDEX_VERSION_FILE = "index_version.json"
+
+# (mtime, version) of the last version file read
+_index_version_cache: tuple[int, Optional[str]] | None = None
+
+def get_index_version_path() -> str:
+    """Path of the file holding the current index version stamp."""
+    return os.path.join(get_settings().VECTOR_STORE_PATH, INDEX_VERSION_FILE)
+
+def write_index_version(node_count: int) -> str:
+    """Write a new index version stamp, invalidating caches keyed on the old one."""
+    version = uuid.uuid4().hex
+    path = get_index_version_path()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    # Write atomically so readers never see a partial file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({
+            "version": version,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "node_count": node_count,
+        }, f)
+    os.replace(tmp_path, path)
+
+    return version
+
+def read_index_version() -> Optional[str]:
+    """Read the current index version stamp, or None if the index has never been stamped.
+
+    The file is only re-read when its mtime changes, so this is cheap enough
+    to call on every request.
+    """
+    global _index_version_cache
+    path = get_index_version_path()
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    if _index_version_cache is None or _index_version_cache[0] != mtime:
+        with open(path) as f:
+            _index_version_cache = (mtime, json.load(f).get("version"))
+    return _index_version_cache[1]
@@ -1,17 +1,22 @@
 from llama_index.core import Settings
-from llama_index.llms.anthropic import Anthropic
+from llama_index.core.llms import LLM
 from app.core.config import get_settings
 
-def configure_llm():
+def configure_llm() -> LLM:
     """Configure global LLM settings for LlamaIndex."""
+    # The Anthropic SDK is heavy to import, so only load it when the LLM is configured
+    from app.core.anthropic_llm import AdmittedAnthropic
+
     settings = get_settings()
 
     # Configure Anthropic LLM
-    llm = Anthropic(
+    llm = AdmittedAnthropic(
         model="claude-3-haiku-20240307",
         api_key=settings.ANTHROPIC_API_KEY,
         temperature=0.1,
     )
 
     # Set global settings
-    Settings.llm = llm
\ No newline at end of file
+    Settings.llm = llm
+
+    return llm
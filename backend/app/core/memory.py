@@ -0,0 +1,170 @@
+from typing import Any, Callable, Dict, List, Optional, Set
+from datetime import datetime, timezone
+import asyncio
+import logging
+from pymongo import ReturnDocument
+from llama_index.core.llms import ChatMessage, LLM, MessageRole
+from llama_index.core.memory import ChatMemoryBuffer
+from llama_index.core.utils import get_tokenizer
+from app.db.models import ChatSession, ChatTurn
+from app.core.admission import ProviderOverloaded
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = """Update the running summary of a conversation between a user and a New Zealand legislation research assistant.
+Keep the questions the user asked, the Acts, sections and other fragments of legislation that were cited, and any answers that later questions may refer back to.
+Leave out greetings and reasoning steps. Reply with the updated summary only.
+
+Current summary:
+{summary}
+
+New messages:
+{messages}"""
+
+def to_chat_message(turn: ChatTurn) -> ChatMessage:
+    """Convert a stored chat turn into a llama-index ChatMessage."""
+    role = MessageRole.USER if turn.role == "user" else MessageRole.ASSISTANT
+    return ChatMessage(role=role, content=turn.content)
+
+class ChatSessionStore:
+    """Server-side chat sessions with a token-bounded history.
+
+    Each turn is appended to a ChatSession in MongoDB. Once the messages that
+    have not been summarised grow past summary_trigger_tokens, the older ones
+    are folded into a running summary by a background task, so the history
+    replayed to the agent stays small however long the conversation gets.
+    """
+
+    def __init__(
+        self,
+        llm: LLM,
+        token_limit: int = 4000,
+        summary_trigger_tokens: int = 3000,
+        keep_messages: int = 4,
+        tokenizer_fn: Optional[Callable[[str], List]] = None,
+    ):
+        self.llm = llm
+        self.token_limit = token_limit
+        self.summary_trigger_tokens = summary_trigger_tokens
+        self.keep_messages = keep_messages
+        self.tokenizer_fn = tokenizer_fn or get_tokenizer()
+        self._tasks: Set[asyncio.Task] = set()
+        self._summarizing: Set[str] = set()
+        self.summaries = 0
+        self.summary_failures = 0
+
+    def count_tokens(self, turns: List[ChatTurn]) -> int:
+        return sum(len(self.tokenizer_fn(turn.content)) for turn in turns)
+
+    async def load(self, conversation_id: str) -> ChatSession:
+        """Load a session, or start an empty one if the id is new."""
+        session = await ChatSession.get(conversation_id)
+        return session or ChatSession(id=conversation_id)
+
+    def history(self, session: ChatSession) -> List[ChatMessage]:
+        """Chat history for the agent: the summary, then as many recent messages as fit in token_limit."""
+        history: List[ChatMessage] = []
+        budget = self.token_limit
+        if session.summary:
+            summary = ChatMessage(
+                role=MessageRole.SYSTEM,
+                content=f"Summary of the earlier conversation:\n{session.summary}",
+            )
+            history.append(summary)
+            budget -= len(self.tokenizer_fn(summary.content))
+
+        # ChatMemoryBuffer drops the oldest messages that do not fit the budget
+        recent = ChatMemoryBuffer.from_defaults(
+            chat_history=[to_chat_message(turn) for turn in session.messages[session.summarized_until:]],
+            token_limit=max(budget, 1),
+            tokenizer_fn=self.tokenizer_fn,
+        )
+        return history + recent.get()
+
+    async def append(self, conversation_id: str, turns: List[ChatTurn]) -> ChatSession:
+        """Append turns to a session, creating it if needed, and summarise it in the background if it has grown."""
+        raw = await ChatSession.get_motor_collection().find_one_and_update(
+            {"_id": conversation_id},
+            {
+                "$push": {"messages": {"$each": [turn.model_dump() for turn in turns]}},
+                "$set": {"updated_at": datetime.now(timezone.utc)},
+                "$setOnInsert": {"summary": None, "summarized_until": 0},
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        session = ChatSession.model_validate(raw)
+        self.schedule_summary(session)
+        return session
+
+    def schedule_summary(self, session: ChatSession) -> None:
+        """Start a background summary of the session if its unsummarised messages are over the trigger."""
+        if session.id in self._summarizing:
+            return
+        pending = session.messages[session.summarized_until:]
+        if len(pending) <= self.keep_messages or self.count_tokens(pending) <= self.summary_trigger_tokens:
+            return
+
+        self._summarizing.add(session.id)
+        task = asyncio.create_task(self.summarize(session))
+        self._tasks.add(task)
+
+        def done(task: asyncio.Task) -> None:
+            self._tasks.discard(task)
+            self._summarizing.discard(session.id)
+
+        task.add_done_callback(done)
+
+    async def summarize(self, session: ChatSession) -> None:
+        """Fold all but the most recent messages into the session summary."""
+        end = len(session.messages) - self.keep_messages
+        # Keep the recent window starting on a user message
+        while end > session.summarized_until and session.messages[end].role != "user":
+            end -= 1
+        if end <= session.summarized_until:
+            return
+
+        folded = "\n\n".join(
+            f"{turn.role}: {turn.content}" for turn in session.messages[session.summarized_until:end]
+        )
+        prompt = SUMMARY_PROMPT.format(summary=session.summary or "(none)", messages=folded)
+        try:
+            response = await self.llm.achat([ChatMessage(role=MessageRole.USER, content=prompt)])
+        except ProviderOverloaded:
+            # Try again after a later turn, when the LLM is less busy
+            logger.info(f"Skipping summary of chat session {session.id}: LLM overloaded")
+            return
+        except Exception as e:
+            self.summary_failures += 1
+            logger.error(f"Failed to summarise chat session {session.id}: {str(e)}")
+            return
+
+        # Only move forward; a concurrent summary of the same messages loses
+        await ChatSession.get_motor_collection().update_one(
+            {"_id": session.id, "summarized_until": session.summarized_until},
+            {"$set": {"summary": response.message.content.strip(), "summarized_until": end}},
+        )
+        self.summaries += 1
+
+    async def aclose(self) -> None:
+        """Wait for background summaries to finish."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "summaries": self.summaries,
+            "summary_failures": self.summary_failures,
+            "summaries_in_flight": len(self._tasks),
+        }
+
+def create_session_store(llm: LLM) -> ChatSessionStore:
+    """Create the chat session store from settings."""
+    settings = get_settings()
+    return ChatSessionStore(
+        llm,
+        token_limit=settings.CHAT_MEMORY_TOKEN_LIMIT,
+        summary_trigger_tokens=settings.CHAT_SUMMARY_TRIGGER_TOKENS,
+        keep_messages=settings.CHAT_SUMMARY_KEEP_MESSAGES,
+    )
@@ -0,0 +1,177 @@
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+import bisect
+import threading
+import time
+
+# Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Pipeline stages span cache hits (well under a millisecond) to LLM synthesis (tens of seconds)
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class Counter:
+    """Monotonic counter with labels."""
+    kind = "counter"
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(str(labels[name]) for name in self.labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in values]
+
+class Histogram:
+    """Cumulative-bucket histogram with labels, in the Prometheus layout."""
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = (), buckets: Sequence[float] = STAGE_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: a count for each bucket plus one for +Inf, and the sum
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            counts[index] += 1
+            self._sums[key] += value
+
+    def count(self, **labels: str) -> int:
+        return sum(self._counts.get(tuple(str(labels[name]) for name in self.labels), ()))
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            snapshot = sorted((key, list(counts), self._sums[key]) for key, counts in self._counts.items())
+        lines = []
+        for key, counts, total in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _format_labels(self.labels, key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    """Process-wide set of metrics rendered by the /metrics endpoint."""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "rag_stage_duration_seconds",
+    "Time spent in each stage of the retrieval and answer pipeline.",
+    labels=("stage",),
+))
+
+LLM_TOKENS = REGISTRY.register(Counter(
+    "llm_tokens_total",
+    "Tokens sent to and generated by each LLM.",
+    labels=("model", "kind"),
+))
+
+# Stage names
+CITATION_LOOKUP = "citation_lookup"
+EMBED_QUERY = "embed_query"
+VECTOR_QUERY = "vector_query"
+LEXICAL_QUERY = "lexical_query"
+FRAGMENT_FETCH = "fragment_fetch"
+RERANK = "rerank"
+SYNTHESIZE = "synthesize"
+AGENT_TOOL_CALL = "agent_tool_call"
+AGENT_TURN = "agent_turn"
+
+# Stage durations of the request being served, summed per stage. Tasks started
+# by the request copy the context, so their stages land in the same dict.
+_request_stages: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_stages", default=None)
+
+@contextmanager
+def collect_request_stages() -> Iterator[Dict[str, float]]:
+    """Collect the durations of the stages run inside the block, in seconds."""
+    stages: Dict[str, float] = {}
+    token = _request_stages.set(stages)
+    try:
+        yield stages
+    finally:
+        _request_stages.reset(token)
+
+def request_stages() -> Dict[str, float]:
+    """Stage durations collected so far for the current request, in seconds."""
+    return dict(_request_stages.get() or {})
+
+def observe_stage(stage: str, seconds: float) -> None:
+    """Record the duration of one pipeline stage."""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    stages = _request_stages.get()
+    if stages is not None:
+        stages[stage] = stages.get(stage, 0.0) + seconds
+
+@contextmanager
+def track_stage(stage: str) -> Iterator[None]:
+    """Time the enclosed block as a pipeline stage, including when it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+def record_token_usage(model: str, input_tokens: Optional[int], output_tokens: Optional[int]) -> None:
+    """Count the tokens used by one LLM call."""
+    if input_tokens:
+        LLM_TOKENS.inc(input_tokens, model=model, kind="input")
+    if output_tokens:
+        LLM_TOKENS.inc(output_tokens, model=model, kind="output")
@@ -0,0 +1,351 @@
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import asyncio
+import logging
+import os
+import numpy as np
+import orjson
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode, MetadataMode, TextNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    FilterCondition,
+    FilterOperator,
+    MetadataFilter,
+    MetadataFilters,
+    VectorStoreQuery,
+    VectorStoreQueryResult,
+)
+from llama_index.core.vector_stores.utils import metadata_dict_to_node, node_to_metadata_dict
+from app.core.metrics import VECTOR_QUERY, track_stage
+
+logger = logging.getLogger(__name__)
+
+EMBEDDINGS_FILE = "embeddings.npy"
+NODES_FILE = "nodes.json"
+
+# Metadata fields with a boolean row mask per distinct value, built when the store is loaded
+MASKED_FIELDS = ("fragment_type", "act_name", "act_year")
+
+# Below this share of rows passing the filters, score only those rows instead of the whole matrix
+SUBSET_SCORING_RATIO = 0.25
+
+# Masks for fields outside MASKED_FIELDS, built on first use
+MAX_CACHED_MASKS = 256
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def _compare(operator: FilterOperator) -> Callable[[Any, Any], bool]:
+    comparisons = {
+        FilterOperator.GT: lambda a, b: a is not None and a > b,
+        FilterOperator.GTE: lambda a, b: a is not None and a >= b,
+        FilterOperator.LT: lambda a, b: a is not None and a < b,
+        FilterOperator.LTE: lambda a, b: a is not None and a <= b,
+    }
+    if operator not in comparisons:
+        raise ValueError(f"Unsupported filter operator for the numpy vector store: {operator}")
+    return comparisons[operator]
+
+class MetadataMasks:
+    """Boolean row masks answering metadata filters over a list of metadata dicts.
+
+    Fields in `fields` get a mask per distinct value up front; masks on any
+    other field are built on first use and cached.
+    """
+
+    def __init__(self, metadata: Sequence[Dict[str, Any]], fields: Sequence[str] = MASKED_FIELDS):
+        self.metadata = metadata
+        # field -> value -> rows holding that value
+        self._masks: Dict[str, Dict[Any, np.ndarray]] = {}
+        self._extra_masks: Dict[Tuple[str, str], np.ndarray] = {}
+        for field in fields:
+            values = [row.get(field) for row in metadata]
+            codes: Dict[Any, int] = {}
+            row_codes = np.fromiter((codes.setdefault(value, len(codes)) for value in values), dtype=np.int32, count=len(values))
+            self._masks[field] = {value: row_codes == code for value, code in codes.items()}
+
+    def __len__(self) -> int:
+        return len(self.metadata)
+
+    def value_mask(self, key: str, value: Any) -> np.ndarray:
+        """Rows whose metadata key equals value."""
+        masks = self._masks.get(key)
+        if masks is not None:
+            mask = masks.get(value)
+            return mask if mask is not None else np.zeros(len(self), dtype=bool)
+
+        cache_key = (key, orjson.dumps(value).decode())
+        mask = self._extra_masks.get(cache_key)
+        if mask is None:
+            mask = np.fromiter((row.get(key) == value for row in self.metadata), dtype=bool, count=len(self))
+            if len(self._extra_masks) >= MAX_CACHED_MASKS:
+                self._extra_masks.pop(next(iter(self._extra_masks)))
+            self._extra_masks[cache_key] = mask
+        return mask
+
+    def filter_mask(self, filter: MetadataFilter) -> np.ndarray:
+        """Rows passing one filter."""
+        operator = filter.operator
+        if operator == FilterOperator.EQ:
+            return self.value_mask(filter.key, filter.value)
+        if operator == FilterOperator.NE:
+            return ~self.value_mask(filter.key, filter.value)
+        if operator in (FilterOperator.IN, FilterOperator.NIN):
+            mask = np.zeros(len(self), dtype=bool)
+            for value in filter.value:
+                mask |= self.value_mask(filter.key, value)
+            return mask if operator == FilterOperator.IN else ~mask
+
+        compare = _compare(operator)
+        return np.fromiter(
+            (compare(row.get(filter.key), filter.value) for row in self.metadata),
+            dtype=bool,
+            count=len(self),
+        )
+
+    def filters_mask(self, filters: MetadataFilters) -> np.ndarray:
+        """Rows passing a possibly nested set of filters."""
+        masks = [
+            self.filters_mask(f) if isinstance(f, MetadataFilters) else self.filter_mask(f)
+            for f in filters.filters
+        ]
+        if not masks:
+            return np.ones(len(self), dtype=bool)
+        if filters.condition == FilterCondition.OR:
+            return np.logical_or.reduce(masks)
+        if filters.condition == FilterCondition.NOT:
+            return ~np.logical_and.reduce(masks)
+        return np.logical_and.reduce(masks)
+
+class NumpyVectorStore(BasePydanticVectorStore):
+    """Exact in-process vector search over a memory-mapped float32 matrix.
+
+    Embeddings are stored L2-normalised, one row per node, with the node ids,
+    texts and metadata in a parallel list, so a query is a single matrix
+    product followed by argpartition for the top k. Filters on
+    fragment_type, act_name and act_year are answered from boolean masks
+    built when the store is loaded.
+    """
+    stores_text: bool = True
+    persist_dir: Optional[str] = None
+
+    _embeddings: np.ndarray = PrivateAttr()
+    _ids: List[str] = PrivateAttr(default_factory=list)
+    _texts: List[str] = PrivateAttr(default_factory=list)
+    _metadata: List[Dict[str, Any]] = PrivateAttr(default_factory=list)
+    _masks: MetadataMasks = PrivateAttr(default_factory=lambda: MetadataMasks([]))
+    _positions: Dict[str, int] = PrivateAttr(default_factory=dict)
+    # Rows added since the matrix was last assembled
+    _pending: List[np.ndarray] = PrivateAttr(default_factory=list)
+
+    def __init__(self, persist_dir: Optional[str] = None, dim: int = 0, **kwargs: Any):
+        super().__init__(persist_dir=persist_dir, **kwargs)
+        self._embeddings = np.zeros((0, dim), dtype=np.float32)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "NumpyVectorStore"
+
+    @classmethod
+    def from_persist_dir(cls, persist_dir: str) -> "NumpyVectorStore":
+        """Load a persisted store, memory-mapping its embeddings, or start an empty one."""
+        store = cls(persist_dir=persist_dir)
+        embeddings_path = os.path.join(persist_dir, EMBEDDINGS_FILE)
+        nodes_path = os.path.join(persist_dir, NODES_FILE)
+        if not (os.path.exists(embeddings_path) and os.path.exists(nodes_path)):
+            logger.warning(f"No numpy vector store in {persist_dir}, starting empty")
+            return store
+
+        with open(nodes_path, "rb") as f:
+            nodes = orjson.loads(f.read())
+        store._embeddings = np.load(embeddings_path, mmap_mode="r")
+        store._ids = nodes["ids"]
+        store._texts = nodes["texts"]
+        store._metadata = nodes["metadata"]
+        store._build_masks()
+        logger.info(f"Loaded {len(store._ids)} vectors of dimension {store._embeddings.shape[1]} from {persist_dir}")
+        return store
+
+    @property
+    def client(self) -> Any:
+        return None
+
+    def _build_masks(self) -> None:
+        self._positions = {node_id: i for i, node_id in enumerate(self._ids)}
+        self._masks = MetadataMasks(self._metadata)
+
+    def add(self, nodes: Sequence[BaseNode], **kwargs: Any) -> List[str]:
+        """Append nodes in memory; call persist to write them out."""
+        if not nodes:
+            return []
+        self._pending.append(_normalize_rows(np.asarray([node.get_embedding() for node in nodes], dtype=np.float32)))
+        for node in nodes:
+            self._ids.append(node.node_id)
+            self._texts.append(node.get_content(metadata_mode=MetadataMode.NONE))
+            self._metadata.append(node_to_metadata_dict(node, remove_text=True, flat_metadata=False))
+        return [node.node_id for node in nodes]
+
+    def _assemble(self) -> None:
+        """Fold rows added since the last query into the matrix and rebuild the masks."""
+        if not self._pending:
+            return
+        blocks = self._pending
+        if self._embeddings.shape[0]:
+            blocks = [np.asarray(self._embeddings)] + blocks
+        self._embeddings = np.concatenate(blocks)
+        self._pending = []
+        self._build_masks()
+
+    def _keep_rows(self, keep: np.ndarray) -> None:
+        self._assemble()
+        self._embeddings = np.asarray(self._embeddings)[keep]
+        self._ids = [value for value, k in zip(self._ids, keep) if k]
+        self._texts = [value for value, k in zip(self._texts, keep) if k]
+        self._metadata = [value for value, k in zip(self._metadata, keep) if k]
+        self._build_masks()
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        self._keep_rows(np.array([metadata.get("ref_doc_id") != ref_doc_id for metadata in self._metadata], dtype=bool))
+
+    def clear(self) -> None:
+        self._pending = []
+        self._embeddings = np.zeros((0, self._embeddings.shape[1]), dtype=np.float32)
+        self._ids, self._texts, self._metadata = [], [], []
+        self._build_masks()
+
+    def persist(self, persist_path: Optional[str] = None, fs: Any = None) -> None:
+        """Write the embeddings and nodes under persist_dir.
+
+        Files are replaced atomically, so workers that have the old matrix
+        mapped keep reading a consistent copy until they reload.
+        """
+        self._assemble()
+        persist_dir = persist_path or self.persist_dir
+        os.makedirs(persist_dir, exist_ok=True)
+        embeddings_path = os.path.join(persist_dir, EMBEDDINGS_FILE)
+        nodes_path = os.path.join(persist_dir, NODES_FILE)
+
+        with open(f"{embeddings_path}.tmp", "wb") as f:
+            np.save(f, np.ascontiguousarray(self._embeddings, dtype=np.float32))
+        with open(f"{nodes_path}.tmp", "wb") as f:
+            f.write(orjson.dumps({"ids": self._ids, "texts": self._texts, "metadata": self._metadata}))
+        os.replace(f"{embeddings_path}.tmp", embeddings_path)
+        os.replace(f"{nodes_path}.tmp", nodes_path)
+
+    def _top_k(self, scores: np.ndarray, rows: Optional[np.ndarray], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Indices and scores of the k best rows, best first."""
+        k = min(k, scores.shape[0])
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        best_scores = scores[best]
+        if rows is not None:
+            best = rows[best]
+        # Rows masked out by the filters scored -inf
+        keep = np.isfinite(best_scores)
+        return best[keep], best_scores[keep]
+
+    def _node(self, i: int) -> BaseNode:
+        try:
+            return metadata_dict_to_node(self._metadata[i], text=self._texts[i])
+        except Exception:
+            # Nodes written without LlamaIndex metadata
+            return TextNode(id_=self._ids[i], text=self._texts[i], metadata=self._metadata[i])
+
+    def get_nodes(self, node_ids: Optional[List[str]] = None, filters: Optional[MetadataFilters] = None) -> List[BaseNode]:
+        """Nodes by id and/or filters."""
+        self._assemble()
+        if node_ids is not None:
+            rows = [self._positions[node_id] for node_id in node_ids if node_id in self._positions]
+        else:
+            rows = list(range(len(self._ids)))
+        if filters is not None:
+            mask = self._masks.filters_mask(filters)
+            rows = [i for i in rows if mask[i]]
+        return [self._node(i) for i in rows]
+
+    def _result(self, indices: np.ndarray, scores: np.ndarray) -> VectorStoreQueryResult:
+        return VectorStoreQueryResult(
+            nodes=[self._node(i) for i in indices],
+            similarities=[float(score) for score in scores],
+            ids=[self._ids[i] for i in indices],
+        )
+
+    def _candidates(self, query: VectorStoreQuery) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """The mask of rows a query may return, and the rows to score when few enough pass it."""
+        masks = []
+        if query.filters is not None:
+            masks.append(self._masks.filters_mask(query.filters))
+        # An empty id list means no restriction, as VectorIndexRetriever sends for stores that keep text
+        if query.doc_ids:
+            doc_ids = set(query.doc_ids)
+            masks.append(np.fromiter(
+                (metadata.get("ref_doc_id") in doc_ids for metadata in self._metadata),
+                dtype=bool,
+                count=len(self._ids),
+            ))
+        if query.node_ids:
+            mask = np.zeros(len(self._ids), dtype=bool)
+            mask[[self._positions[node_id] for node_id in query.node_ids if node_id in self._positions]] = True
+            masks.append(mask)
+        if not masks:
+            return None, None
+        mask = np.logical_and.reduce(masks)
+        if mask.sum() < SUBSET_SCORING_RATIO * len(self._ids):
+            return mask, np.flatnonzero(mask)
+        return mask, None
+
+    def _query_group(self, queries: Sequence[VectorStoreQuery]) -> List[VectorStoreQueryResult]:
+        """Answer queries restricted to the same rows with one matrix product."""
+        mask, rows = self._candidates(queries[0])
+        matrix = self._embeddings if rows is None else self._embeddings[rows]
+        vectors = _normalize_rows(np.asarray([query.query_embedding for query in queries], dtype=np.float32))
+        scores = vectors @ matrix.T
+        if mask is not None and rows is None:
+            scores[:, ~mask] = -np.inf
+
+        results = []
+        for query, row_scores in zip(queries, scores):
+            indices, best_scores = self._top_k(row_scores, rows, query.similarity_top_k)
+            results.append(self._result(indices, best_scores))
+        return results
+
+    def query_batch(self, queries: Sequence[VectorStoreQuery]) -> List[VectorStoreQueryResult]:
+        """Answer several queries with one matrix product per distinct set of filters and ids."""
+        if any(query.query_embedding is None for query in queries):
+            raise ValueError("The numpy vector store only answers embedding queries")
+        self._assemble()
+        if not queries or not self._ids:
+            return [VectorStoreQueryResult(nodes=[], similarities=[], ids=[]) for _ in queries]
+
+        groups: Dict[bytes, List[int]] = {}
+        for i, query in enumerate(queries):
+            key = orjson.dumps([
+                query.filters.model_dump() if query.filters is not None else None,
+                query.doc_ids,
+                query.node_ids,
+            ])
+            groups.setdefault(key, []).append(i)
+
+        results: List[Optional[VectorStoreQueryResult]] = [None] * len(queries)
+        for positions in groups.values():
+            for i, result in zip(positions, self._query_group([queries[i] for i in positions])):
+                results[i] = result
+        return results
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        """Exact cosine top-k search."""
+        return self.query_batch([query])[0]
+
+    async def aquery(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        """Search in a worker thread; numpy releases the GIL during the matrix product."""
+        with track_stage(VECTOR_QUERY):
+            return await asyncio.to_thread(self.query, query, **kwargs)
+
+    async def aquery_batch(self, queries: List[VectorStoreQuery]) -> List[VectorStoreQueryResult]:
+        """Run several queries in a worker thread with one matrix product per distinct filter."""
+        with track_stage(VECTOR_QUERY):
+            return await asyncio.to_thread(self.query_batch, queries)
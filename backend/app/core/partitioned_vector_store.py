@@ -0,0 +1,229 @@
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+import asyncio
+import dataclasses
+import logging
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    FilterCondition,
+    FilterOperator,
+    MetadataFilter,
+    MetadataFilters,
+    VectorStoreQuery,
+    VectorStoreQueryResult,
+)
+
+logger = logging.getLogger(__name__)
+
+FRAGMENT_TYPE = "fragment_type"
+
+# Partition suffix -> fragment types it holds; None holds every type not listed elsewhere
+PARTITIONS: Dict[str, Optional[Tuple[str, ...]]] = {
+    "acts": ("Act",),
+    "subsections": ("Subsection",),
+    "provisions": None,
+}
+
+# fragment_type filters that can be answered by choosing partitions
+ROUTABLE_OPERATORS = (FilterOperator.EQ, FilterOperator.NE, FilterOperator.IN, FilterOperator.NIN)
+
+# How much of a partition a set of fragment_type filters selects
+NONE = "none"
+PARTIAL = "partial"
+ALL = "all"
+
+def partition_collection_name(collection_name: str, partition: str) -> str:
+    return f"{collection_name}_{partition}"
+
+def _passes(fragment_type: str, filter: MetadataFilter) -> bool:
+    if filter.operator == FilterOperator.EQ:
+        return fragment_type == filter.value
+    if filter.operator == FilterOperator.NE:
+        return fragment_type != filter.value
+    if filter.operator == FilterOperator.IN:
+        return fragment_type in filter.value
+    return fragment_type not in filter.value
+
+def _filter_values(filter: MetadataFilter) -> Set[str]:
+    return set(filter.value) if filter.operator in (FilterOperator.IN, FilterOperator.NIN) else {filter.value}
+
+def split_type_filters(filters: Optional[MetadataFilters]) -> Tuple[Optional[List[MetadataFilter]], Optional[MetadataFilters]]:
+    """Split ANDed top-level fragment_type filters from the rest.
+
+    Returns None for the type filters when the filters cannot be routed, for
+    example when they are ORed.
+    """
+    if filters is None:
+        return [], None
+    if filters.condition not in (None, FilterCondition.AND):
+        return None, filters
+    type_filters, rest = [], []
+    for f in filters.filters:
+        if isinstance(f, MetadataFilter) and f.key == FRAGMENT_TYPE and f.operator in ROUTABLE_OPERATORS:
+            type_filters.append(f)
+        else:
+            rest.append(f)
+    return type_filters, MetadataFilters(filters=rest, condition=filters.condition) if rest else None
+
+def partition_coverage(types: Optional[Iterable[str]], listed: Set[str], type_filters: Sequence[MetadataFilter]) -> str:
+    """Whether the type filters select none, part or all of a partition's rows.
+
+    types is the partition's fragment types, or None for the partition
+    holding every type outside listed.
+    """
+    if types is not None:
+        kept = [t for t in types if all(_passes(t, f) for f in type_filters)]
+        if not kept:
+            return NONE
+        return ALL if len(kept) == len(tuple(types)) else PARTIAL
+
+    coverage = ALL
+    for f in type_filters:
+        values = _filter_values(f)
+        if f.operator in (FilterOperator.EQ, FilterOperator.IN):
+            # Only the named types pass; none of them live here if all are listed elsewhere
+            if values <= listed:
+                return NONE
+            coverage = PARTIAL
+        elif not values <= listed:
+            # Excludes a type held here
+            coverage = PARTIAL
+    return coverage
+
+def merge_results(results: Sequence[VectorStoreQueryResult], top_k: int) -> VectorStoreQueryResult:
+    """Best top_k hits across partition results, by similarity."""
+    hits = []
+    for result in results:
+        ids = result.ids or []
+        # Stores that do not keep text return ids only
+        nodes = result.nodes or [None] * len(ids)
+        hits.extend(zip(result.similarities or [], ids, nodes))
+    hits.sort(key=lambda hit: hit[0], reverse=True)
+    hits = hits[:top_k]
+    nodes = [node for _, _, node in hits]
+    return VectorStoreQueryResult(
+        nodes=nodes if all(node is not None for node in nodes) else None,
+        similarities=[similarity for similarity, _, _ in hits],
+        ids=[node_id for _, node_id, _ in hits],
+    )
+
+class PartitionedVectorStore(BasePydanticVectorStore):
+    """Vector store split into one collection per group of fragment types.
+
+    Nodes are written to the partition for their fragment_type. A query's
+    fragment_type filters pick the partitions to search: a partition the
+    filters select entirely is searched without them, so the ANN index is
+    never post-filtered, and results from several partitions are merged by
+    similarity.
+    """
+    stores_text: bool = True
+    partitions: Dict[str, BasePydanticVectorStore]
+    partition_types: Dict[str, Optional[Tuple[str, ...]]] = PARTITIONS
+
+    def __init__(self, partitions: Dict[str, BasePydanticVectorStore], **kwargs: Any):
+        stores_text = all(store.stores_text for store in partitions.values())
+        super().__init__(partitions=partitions, stores_text=stores_text, **kwargs)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "PartitionedVectorStore"
+
+    @property
+    def client(self) -> Any:
+        return None
+
+    def _listed_types(self) -> Set[str]:
+        return {t for types in self.partition_types.values() if types is not None for t in types}
+
+    def partition_for(self, fragment_type: Optional[str]) -> str:
+        """Partition holding nodes of a fragment type."""
+        catch_all = None
+        for partition, types in self.partition_types.items():
+            if types is None:
+                catch_all = partition
+            elif fragment_type in types:
+                return partition
+        if catch_all is None:
+            raise ValueError(f"No partition holds fragment type {fragment_type}")
+        return catch_all
+
+    def route(self, query: VectorStoreQuery) -> List[Tuple[str, VectorStoreQuery]]:
+        """The partitions to search for a query, each with the filters it still needs."""
+        type_filters, rest = split_type_filters(query.filters)
+        if type_filters is None:
+            return [(partition, query) for partition in self.partitions]
+
+        listed = self._listed_types()
+        routed = []
+        for partition in self.partitions:
+            coverage = partition_coverage(self.partition_types[partition], listed, type_filters)
+            if coverage == ALL:
+                routed.append((partition, dataclasses.replace(query, filters=rest)))
+            elif coverage == PARTIAL:
+                routed.append((partition, query))
+        return routed
+
+    def add(self, nodes: Sequence[BaseNode], **kwargs: Any) -> List[str]:
+        groups: Dict[str, List[BaseNode]] = {}
+        for node in nodes:
+            groups.setdefault(self.partition_for(node.metadata.get(FRAGMENT_TYPE)), []).append(node)
+        for partition, group in groups.items():
+            self.partitions[partition].add(group, **kwargs)
+        return [node.node_id for node in nodes]
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        for store in self.partitions.values():
+            store.delete(ref_doc_id, **delete_kwargs)
+
+    def clear(self) -> None:
+        for partition, store in self.partitions.items():
+            try:
+                store.clear()
+            except Exception as e:
+                # Clearing an empty collection can fail
+                logger.debug(f"Could not clear partition {partition}: {str(e)}")
+
+    def persist(self, persist_path: Optional[str] = None, fs: Any = None) -> None:
+        """Persist each partition to its own location."""
+        for store in self.partitions.values():
+            store.persist()
+
+    def get_nodes(self, node_ids: Optional[List[str]] = None, filters: Optional[MetadataFilters] = None) -> List[BaseNode]:
+        return [node for store in self.partitions.values() for node in store.get_nodes(node_ids, filters)]
+
+    async def aget_nodes(self, node_ids: Optional[List[str]] = None, filters: Optional[MetadataFilters] = None) -> List[BaseNode]:
+        """Get nodes from every partition concurrently."""
+        groups = await asyncio.gather(*(store.aget_nodes(node_ids, filters) for store in self.partitions.values()))
+        return [node for nodes in groups for node in nodes]
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        results = [self.partitions[partition].query(routed, **kwargs) for partition, routed in self.route(query)]
+        return merge_results(results, query.similarity_top_k)
+
+    async def aquery(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        """Search the routed partitions concurrently."""
+        results = await asyncio.gather(*(
+            self.partitions[partition].aquery(routed, **kwargs) for partition, routed in self.route(query)
+        ))
+        return merge_results(results, query.similarity_top_k)
+
+    async def aquery_batch(self, queries: List[VectorStoreQuery]) -> List[VectorStoreQueryResult]:
+        """Run several queries, batched per partition when the partition supports it."""
+        batches: Dict[str, List[Tuple[int, VectorStoreQuery]]] = {}
+        for i, query in enumerate(queries):
+            for partition, routed in self.route(query):
+                batches.setdefault(partition, []).append((i, routed))
+
+        async def run(partition: str, batch: List[Tuple[int, VectorStoreQuery]]) -> List[VectorStoreQueryResult]:
+            store = self.partitions[partition]
+            routed = [query for _, query in batch]
+            if hasattr(store, "aquery_batch"):
+                return await store.aquery_batch(routed)
+            return await asyncio.gather(*(store.aquery(query) for query in routed))
+
+        partition_results = await asyncio.gather(*(run(partition, batch) for partition, batch in batches.items()))
+        per_query: List[List[VectorStoreQueryResult]] = [[] for _ in queries]
+        for batch, results in zip(batches.values(), partition_results):
+            for (i, _), result in zip(batch, results):
+                per_query[i].append(result)
+        return [merge_results(results, query.similarity_top_k) for query, results in zip(queries, per_query)]
@@ -0,0 +1,103 @@
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import time
+import numpy as np
+from llama_index.core.schema import NodeWithScore, QueryBundle
+from app.core.cache import normalize_query
+from app.core.query_engines import LegislationQueryEngine
+
+logger = logging.getLogger(__name__)
+
+class PrefetchStats:
+    """Counters for speculative retrieval across chat turns."""
+
+    def __init__(self):
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+        # Prefetches that no tool call reused, including misses
+        self.unused = 0
+        self.errors = 0
+        self.time_saved_ms = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        matched = self.hits + self.misses
+        return {
+            "started": self.started,
+            "hits": self.hits,
+            "misses": self.misses,
+            "unused": self.unused,
+            "errors": self.errors,
+            "hit_rate": self.hits / matched if matched else 0.0,
+            "time_saved_ms": self.time_saved_ms,
+        }
+
+class RetrievalPrefetch:
+    """Retrieval for a chat message, started before the agent decides to call a tool.
+
+    The message is embedded, searched and reranked while the agent's first
+    reasoning step runs. A later tool query whose embedding is at least
+    threshold similar to the message reuses the prefetched nodes instead of
+    retrieving again.
+    """
+
+    def __init__(self, engine: LegislationQueryEngine, message: str, threshold: float, stats: PrefetchStats):
+        self.engine = engine
+        self.message = message
+        self.threshold = threshold
+        self.stats = stats
+        self.used = False
+        self.duration = 0.0
+        stats.started += 1
+        self.task = asyncio.create_task(self._run())
+
+    async def _run(self) -> Tuple[List[float], List[NodeWithScore]]:
+        start = time.perf_counter()
+        embedding = await self.engine.index._embed_model.aget_query_embedding(self.message)
+        nodes = await self.engine.retrieve(QueryBundle(self.message, embedding=embedding))
+        self.duration = time.perf_counter() - start
+        return embedding, nodes
+
+    async def similarity(self, query: str, embedding: List[float]) -> float:
+        if normalize_query(query) == normalize_query(self.message):
+            return 1.0
+        # The query embedding is cached, so the engine does not embed it again
+        other = await self.engine.index._embed_model.aget_query_embedding(query)
+        a = np.asarray(embedding, dtype=np.float32)
+        b = np.asarray(other, dtype=np.float32)
+        denominator = float(np.linalg.norm(a) * np.linalg.norm(b))
+        return float(a @ b) / denominator if denominator else 0.0
+
+    async def match(self, query: str) -> Optional[List[NodeWithScore]]:
+        """Return the prefetched nodes if query is close enough to the message."""
+        waiting = time.perf_counter()
+        try:
+            embedding, nodes = await asyncio.shield(self.task)
+        except Exception as e:
+            self.stats.errors += 1
+            logger.warning(f"Prefetch for chat message failed: {str(e)}")
+            return None
+        waited = time.perf_counter() - waiting
+
+        similarity = await self.similarity(query, embedding)
+        if similarity < self.threshold:
+            self.stats.misses += 1
+            return None
+
+        if not self.used:
+            # Saved: the part of the prefetch that ran before the tool call asked for it
+            self.used = True
+            self.stats.time_saved_ms += max(self.duration - waited, 0.0) * 1000
+        self.stats.hits += 1
+        return nodes
+
+    def close(self) -> None:
+        """Cancel the prefetch if it is still running and count it if nothing used it."""
+        if not self.task.done():
+            self.task.cancel()
+        elif not self.task.cancelled():
+            # Mark a failure as retrieved so asyncio does not log it
+            self.task.exception()
+        if not self.used:
+            self.stats.unused += 1
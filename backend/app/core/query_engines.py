@@ -1,18 +1,28 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Sequence
+import asyncio
+import time
 from llama_index.core import VectorStoreIndex
-from llama_index.core.schema import TextNode, QueryBundle
+from llama_index.core.schema import TextNode, QueryBundle, NodeWithScore
 from llama_index.core.vector_stores import MetadataFilter, FilterOperator, MetadataFilters
 from llama_index.core.retrievers import VectorIndexAutoRetriever
 from llama_index.core.vector_stores.types import MetadataInfo, VectorStoreInfo, VectorStoreQuerySpec
 from llama_index.core.query_engine import RetrieverQueryEngine
-from llama_index.core.response_synthesizers import ResponseMode
+from llama_index.core.response_synthesizers import ResponseMode, SimpleSummarize
+from llama_index.core.types import RESPONSE_TEXT_TYPE
 from llama_index.core.prompts import PromptTemplate
-from llama_index.postprocessor.voyageai_rerank import VoyageAIRerank
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
 from app.core.vector_store import get_vector_store
 from app.core.embeddings import configure_embeddings
 from app.core.llm import configure_llm
+from app.core.rerank import create_reranker
+from app.core.cache import SemanticCache, make_cache_key
+from app.core.singleflight import SingleFlight
 from app.core.config import get_settings
-from app.db.models import LegislationFragment
+from app.core.metrics import CITATION_LOOKUP, SYNTHESIZE, observe_stage, track_stage
+from app.core.bm25 import BM25Index
+from app.core.citations import CitationIndex
+from app.core.hybrid_retriever import HybridRetriever
+from app.db.projections import find_fragment_views_by_chunk_id
 
 class QueryEngineResponse:
     def __init__(self, answer: str, results: List[Dict[str, Any]], metadata: Dict[str, Any]):
@@ -20,20 +30,83 @@ class QueryEngineResponse:
         self.results = results
         self.metadata = metadata
 
+    def estimated_size(self) -> int:
+        """Rough number of bytes held by this response, used to cap cache memory."""
+        size = len(self.answer)
+        for result in self.results:
+            fragment = result["fragment"]
+            size += len(fragment.text or "") + len(fragment.xml or "") + len(fragment.summary_long or "")
+            size += 8 * len(fragment.embedding or [])
+        return size
+
+class OffloadedSimpleSummarize(SimpleSummarize):
+    """SimpleSummarize that packs the prompt in a worker thread.
+
+    Truncating the retrieved fragments to the context window runs the token
+    splitter over every fragment, which is CPU bound and would otherwise stall
+    the event loop for long Parts and Schedules.
+    """
+
+    async def aget_response(
+        self,
+        query_str: str,
+        text_chunks: Sequence[str],
+        **response_kwargs: Any,
+    ) -> RESPONSE_TEXT_TYPE:
+        text_qa_template = self._text_qa_template.partial_format(query_str=query_str)
+        truncated_chunks = await asyncio.to_thread(
+            self._prompt_helper.truncate,
+            prompt=text_qa_template,
+            text_chunks=["\n".join(text_chunks)],
+            llm=self._llm,
+        )
+
+        if self._streaming:
+            return await self._llm.astream(text_qa_template, context_str=truncated_chunks, **response_kwargs)
+
+        response = await self._llm.apredict(text_qa_template, context_str=truncated_chunks, **response_kwargs)
+        return response or "Empty Response"
+
 class LegislationQueryEngine:
-    def __init__(self):
-        # Configure embeddings and LLM
-        configure_embeddings()
-        configure_llm()
+    # Metadata filter applied to every retrieval
+    fragment_type_filter: str = "Subsection"
+    fragment_type_operator: FilterOperator = FilterOperator.NE
+
+    def __init__(
+        self,
+        index: Optional[VectorStoreIndex] = None,
+        reranker: Optional[BaseNodePostprocessor] = None,
+        semantic_cache: Optional[SemanticCache] = None,
+        lexical_index: Optional[BM25Index] = None,
+        citation_index: Optional[CitationIndex] = None,
+    ):
+        if index is None:
+            # Configure embeddings and LLM
+            configure_embeddings()
+            configure_llm()
+
+            # Create index from existing vector store
+            index = VectorStoreIndex.from_vector_store(get_vector_store())
+
+        self.index = index
 
-        # Get vector store
-        self.vector_store = get_vector_store()
+        # Reuse the caller's reranker so its HTTP client is shared
+        self.reranker = reranker if reranker is not None else create_reranker()
 
-        # Create index from existing vector store
-        self.index = VectorStoreIndex.from_vector_store(self.vector_store)
+        # Answers to earlier, near-identical queries
+        self.semantic_cache = semantic_cache
+
+        # Identical queries already being answered
+        self.single_flight = SingleFlight()
+
+        # BM25 index fused with vector retrieval, or None for vector only
+        self.lexical_index = lexical_index
+
+        # Lookup for queries that only cite a provision
+        self.citation_index = citation_index
 
         # Create retriever with default filters
-        self.retriever = self._create_retriever()
+        self.retriever = self._create_retriever(self.fragment_type_filter, self.fragment_type_operator)
 
         # Create prompt template
         self.prompt = self._create_prompt()
@@ -41,19 +114,33 @@ class LegislationQueryEngine:
         # Create query engine
         self.query_engine = self._create_query_engine()
 
+    def _create_filters(self, fragment_type_filter: str, operator: FilterOperator) -> MetadataFilters:
+        """Metadata filters on fragment type."""
+        return MetadataFilters(
+            filters=[
+                MetadataFilter(
+                    key="fragment_type",
+                    value=fragment_type_filter,
+                    operator=operator
+                )
+            ]
+        )
+
     def _create_retriever(self, fragment_type_filter: str = "Subsection", operator: FilterOperator = FilterOperator.NE) -> RetrieverQueryEngine:
         """Create a retriever with the specified filters."""
-        return self.index.as_retriever(
-            similarity_top_k=20,
-            filters=MetadataFilters(
-                filters=[
-                    MetadataFilter(
-                        key="fragment_type",
-                        value=fragment_type_filter,
-                        operator=operator
-                    )
-                ]
-            )
+        filters = self._create_filters(fragment_type_filter, operator)
+        if self.lexical_index is None:
+            return self.index.as_retriever(similarity_top_k=20, filters=filters)
+
+        settings = get_settings()
+        return HybridRetriever(
+            index=self.index,
+            vector_retriever=self.index.as_retriever(similarity_top_k=settings.HYBRID_VECTOR_TOP_K, filters=filters),
+            lexical_index=self.lexical_index,
+            filters=filters,
+            lexical_top_k=settings.HYBRID_LEXICAL_TOP_K,
+            top_k=settings.HYBRID_RERANK_CANDIDATES,
+            rrf_k=settings.HYBRID_RRF_K,
         )
 
     def _create_prompt(self) -> PromptTemplate:
@@ -106,40 +193,125 @@ Provide your response directly without any tags. Use markdown formatting to stru
 
     def _create_query_engine(self) -> RetrieverQueryEngine:
         """Create the query engine with the configured retriever and prompt."""
-        settings = get_settings()
-        voyageai_rerank = VoyageAIRerank(
-            api_key=settings.VOYAGE_API_KEY,
-            top_k=10,
-            model="rerank-2",
-            truncation=True
-        )
-
         return RetrieverQueryEngine.from_args(
             retriever=self.retriever,
-            response_mode=ResponseMode.SIMPLE_SUMMARIZE,
-            text_qa_template=self.prompt,
+            response_synthesizer=OffloadedSimpleSummarize(text_qa_template=self.prompt),
             response_kwargs={
                 "verbose": True,
                 "similarity_threshold": 0.5
             },
-            node_postprocessors=[voyageai_rerank]
+            node_postprocessors=[self.reranker]
         )
 
-    async def query(self, query: str) -> QueryEngineResponse:
-        """Execute a query and return the response with retrieved fragments."""
-        # Get response
-        response = self.query_engine.query(query)
+    @property
+    def filters(self) -> Dict[str, Any]:
+        """The metadata filter this engine applies, for use in cache keys."""
+        return {"fragment_type": {self.fragment_type_operator.value: self.fragment_type_filter}}
+
+    async def query(self, query: str, nodes: Optional[List[NodeWithScore]] = None) -> QueryEngineResponse:
+        """Execute a query and return the response with retrieved fragments.
+
+        nodes are reranked nodes already retrieved for a close enough query,
+        such as a speculative prefetch; retrieval is skipped when given.
+        """
+        if nodes is not None:
+            # The answer is built from another query's retrieval, so it is
+            # neither shared with identical queries nor cached for them
+            return await self._query(query, nodes)
+
+        # Concurrent identical queries share a single computation
+        key = make_cache_key("engine", query, filters=self.filters)
+        return await self.single_flight.do(key, lambda: self._query(query))
+
+    async def retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        """Retrieve and rerank nodes for a query without synthesising an answer."""
+        nodes = await self.retriever.aretrieve(query_bundle)
+        return await self.reranker.apostprocess_nodes(nodes, query_bundle=query_bundle)
+
+    async def _query(self, query: str, nodes: Optional[List[NodeWithScore]] = None) -> QueryEngineResponse:
+        """Answer a query from the citation index, the semantic cache or by running the pipeline.
+
+        Given prefetched nodes, the semantic cache is neither read nor written.
+        """
+        if self.citation_index is not None:
+            # The cited fragments stand in for retrieval; their answer is not
+            # cached, as queries citing neighbouring sections embed alike
+            cited = await self._cited(query)
+            if cited:
+                return await self._execute(QueryBundle(query), cited, cited=True)
+
+        if self.semantic_cache is None or nodes is not None:
+            return await self._execute(QueryBundle(query), nodes)
+
+        # Embed once up front; the retriever reuses the embedding on a cache miss
+        embedding = await self.index._embed_model.aget_query_embedding(query)
+        cached = self.semantic_cache.lookup(embedding)
+        if cached is not None:
+            response, cached_query, similarity = cached
+            return QueryEngineResponse(
+                answer=response.answer,
+                results=response.results,
+                metadata={
+                    **response.metadata,
+                    "query": query,
+                    "cache": {"hit": True, "query": cached_query, "similarity": similarity},
+                }
+            )
+
+        response = await self._execute(QueryBundle(query, embedding=embedding))
+        self.semantic_cache.store(query, embedding, response, response.estimated_size())
+        return response
+
+    async def _cited(self, query: str) -> List[NodeWithScore]:
+        """The nodes of the fragments a query that only cites provisions names, or [] if it is not a citation."""
+        with track_stage(CITATION_LOOKUP):
+            chunk_ids = self.citation_index.resolve(
+                query,
+                self._create_filters(self.fragment_type_filter, self.fragment_type_operator),
+            )
+        if not chunk_ids:
+            return []
+
+        vector_store = self.index.vector_store
+        if vector_store.stores_text:
+            nodes = await vector_store.aget_nodes(chunk_ids)
+        else:
+            nodes = self.index.docstore.get_nodes(chunk_ids, raise_error=False)
+        found = {node.node_id: node for node in nodes if node is not None}
+        return [NodeWithScore(node=found[chunk_id], score=1.0) for chunk_id in chunk_ids if chunk_id in found]
+
+    async def _execute(
+        self,
+        query_bundle: QueryBundle,
+        nodes: Optional[List[NodeWithScore]] = None,
+        cited: bool = False,
+    ) -> QueryEngineResponse:
+        """Run retrieval, reranking and synthesis for a query.
+
+        Given nodes, from a prefetch or the fragments the query cites,
+        retrieval and reranking are skipped.
+        """
+        query = query_bundle.query_str
+        prefetched = nodes is not None
+
+        # Run each stage through its async API so the event loop is never blocked.
+        # RetrieverQueryEngine.aquery would run the reranker synchronously.
+        start = time.perf_counter()
+        if not prefetched:
+            nodes = await self.retriever.aretrieve(query_bundle)
+        retrieved = time.perf_counter()
+        if not prefetched:
+            nodes = await self.reranker.apostprocess_nodes(nodes, query_bundle=query_bundle)
+        reranked = time.perf_counter()
+        response = await self.query_engine.asynthesize(query_bundle, nodes)
+        synthesized = time.perf_counter()
+        observe_stage(SYNTHESIZE, synthesized - reranked)
 
         # Get all chunk_ids from the source nodes
         chunk_ids = [node.metadata["chunk_id"] for node in response.source_nodes]
 
-        # Fetch all fragments in one query
-        fragments = await LegislationFragment.find(
-            {"chunk_id": {"$in": chunk_ids}}
-        ).to_list()
-
-        # Create a map of chunk_id to fragment for quick lookup
-        fragment_map = {f.chunk_id: f for f in fragments}
+        # Fetch all fragments in one query, without their heavy fields
+        fragment_map = await find_fragment_views_by_chunk_id(chunk_ids)
 
         # Format retrieved fragments
         results = []
@@ -159,20 +331,26 @@ Provide your response directly without any tags. Use markdown formatting to stru
                 "filters": {
                     "fragment_type": "not Subsection"
                 },
-                "query": query
+                "query": query,
+                "prefetched": prefetched and not cited,
+                **({"citation": chunk_ids} if cited else {}),
+                "timings_ms": {
+                    "retrieve": (retrieved - start) * 1000,
+                    "rerank": (reranked - retrieved) * 1000,
+                    "synthesize": (synthesized - reranked) * 1000,
+                }
             }
         )
 
 class DocumentQueryEngine(LegislationQueryEngine):
     """Query engine specifically for searching whole documents (Acts)."""
-    def __init__(self):
-        super().__init__()
-        # Override retriever to only search for Acts
-        self.retriever = self._create_retriever("Act", FilterOperator.EQ)
-        # Override prompt for document-level queries
-        self.prompt = self._create_document_prompt()
-        # Recreate query engine with new retriever and prompt
-        self.query_engine = self._create_query_engine()
+    # Only search for Acts
+    fragment_type_filter: str = "Act"
+    fragment_type_operator: FilterOperator = FilterOperator.EQ
+
+    def _create_prompt(self) -> PromptTemplate:
+        """Use the document-level prompt instead of the fragment prompt."""
+        return self._create_document_prompt()
 
     def _create_document_prompt(self) -> PromptTemplate:
         """Create a prompt template specifically for document-level queries."""
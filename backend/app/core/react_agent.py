@@ -1,38 +1,151 @@
-from typing import List, Dict, Any, Optional, Tuple
-from llama_index.core.agent import ReActAgent
+from typing import List, Dict, Any, Optional, Tuple, AsyncGenerator, Union
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+import asyncio
+import logging
+import time
+import uuid
+from llama_index.core.agent import FunctionCallingAgent, ReActAgent
 from llama_index.core.tools import BaseTool
 from llama_index.core.callbacks import CallbackManager, LlamaDebugHandler
 from llama_index.core.memory import ChatMemoryBuffer
 from llama_index.core import VectorStoreIndex
-from llama_index.core.llms import ChatMessage
+from llama_index.core.llms import ChatMessage, LLM
+from llama_index.core.chat_engine.types import StreamingAgentChatResponse
 from app.core.llm import configure_llm
 from app.core.embeddings import configure_embeddings
 from app.core.vector_store import get_vector_store
 from app.db.models import LegislationFragment
-from app.core.index import create_nodes_from_fragments
 from app.core.query_engines import LegislationQueryEngine, DocumentQueryEngine
+from app.core.prefetch import PrefetchStats, RetrievalPrefetch
+from app.core.metrics import AGENT_TOOL_CALL, AGENT_TURN, observe_stage, track_stage
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class AgentEvent:
+    """A progress event or answer token produced while the agent is running.
+
+    type is one of "tool_call", "tool_result", "fragments" or "text".
+    """
+    type: str
+    data: Dict[str, Any] = field(default_factory=dict)
+
+# Agent modes: a ReAct loop running one tool per step, or native function
+# calling, where the LLM may request several tools at once and they run concurrently
+REACT = "react"
+FUNCTION_CALLING = "function_calling"
+
+AGENT_CONTEXT = """
+You are an AI assistant designed to be a legislation research tool for New Zealand's legislation.
+You are part of a website provided by the Parliamentary Council Office. Your purpose is to find answers to users' questions about legislation using the provided tools.
+You must strictly avoid offering legal interpretation of the legislation or making assertions about the user's situation or the outcome of legal cases.
+
+You have access to a database of New Zealand legislation that you should use to find the answer for the users question.
+Use the query_index tool to retrieve sections of legislation that are relevant to the users question, do not rely on prior knowledge.
+
+As a public servant and a representative of the Parliamentary Counsel Office, you should:
+- Avoid making legal interpretations of the legislation, only use the legislation to answer the users question.
+- Avoid making judgement about what the law means or how it applies to the users situation, instead help the user find the relevant legislation.
+- Avoid making predictions about the outcome of a legal case or what a court would rule.
+- Do not provide general advice, unless it is based on legislation retrieved from the database.
+- Assume that the user is asking a question that can be answered by New Zealand legislation.
+- You may need to reword the users question to be more specific to legislation.
+- Answer in english, do not use any other language.
+- If the task is not answering a question about New Zealand legislation, decline to answer politely.
+- If you cannot find a clear answer, admit that you don't know or that the information is not available in the legislation you have access to.
+- Cite specific fragments of legislation that back up your answers
+- Always reference where in legislation the answer can be found
+
+You MUST use the provided tools to answer questions about New Zealand legislation.
+Your training data is outdated and could be inaccurate. Even if you believe you know the answer,
+you MUST verify it by searching the knowledge base. Any response about New Zealand legislation not
+supported by a tool call will be considered incorrect.
+
+You MUST cite where in legislation the answer can be found.
+
+Do NOT generate observations you have not been given.
+
+The current year is 2025."""
+
+# Event queue for the chat turn currently being streamed, if any
+_agent_events: ContextVar[Optional[asyncio.Queue]] = ContextVar("agent_events", default=None)
+
+# Speculative retrieval for the chat turn currently being streamed, if any
+_prefetch: ContextVar[Optional[RetrievalPrefetch]] = ContextVar("prefetch", default=None)
+
+def _emit(event: AgentEvent) -> None:
+    """Publish an event to the streaming chat turn, if there is one."""
+    queue = _agent_events.get()
+    if queue is not None:
+        queue.put_nowait(event)
 
 class LegislationReActAgent:
-    def __init__(self):
-        # Configure LLM and embeddings
-        self.llm = configure_llm()
-        configure_embeddings()
+    def __init__(
+        self,
+        llm: Optional[LLM] = None,
+        legislation_engine: Optional[LegislationQueryEngine] = None,
+        document_engine: Optional[DocumentQueryEngine] = None,
+        mode: str = REACT,
+        prefetch: bool = False,
+        prefetch_threshold: float = 0.85,
+    ):
+        if llm is None:
+            # Configure LLM and embeddings
+            llm = configure_llm()
+            configure_embeddings()
+        self.llm = llm
 
-        # Get vector store and create index from existing vector store
-        vector_store = get_vector_store()
-        self.index = VectorStoreIndex.from_vector_store(vector_store)
+        if legislation_engine is None or document_engine is None:
+            # Get vector store and create index from existing vector store
+            index = VectorStoreIndex.from_vector_store(get_vector_store())
+            legislation_engine = legislation_engine or LegislationQueryEngine(index)
+            document_engine = document_engine or DocumentQueryEngine(index, legislation_engine.reranker)
+        self.legislation_engine = legislation_engine
+        self.document_engine = document_engine
 
+        if mode not in (REACT, FUNCTION_CALLING):
+            raise ValueError(f"Unknown agent mode: {mode}")
+        if mode == FUNCTION_CALLING and not self.llm.metadata.is_function_calling_model:
+            logger.warning(f"{type(self.llm).__name__} does not support function calling, using the ReAct agent")
+            mode = REACT
+        self.mode = mode
+
+        # Retrieve for the raw message while the agent is still reasoning
+        self.prefetch = prefetch
+        self.prefetch_threshold = prefetch_threshold
+        self.prefetch_stats = PrefetchStats()
+
+        # Create tools
+        self.tools = self._create_tools()
+
+    def _create_agent(self) -> Union[ReActAgent, FunctionCallingAgent]:
+        """Create an agent with its own memory for a single conversation turn.
+
+        The tools, engines and LLM are shared, so this is cheap and keeps
+        concurrent conversations from writing into each other's memory.
+        """
         # Create debug handler
         debug_handler = LlamaDebugHandler(print_trace_on_end=True)
         callback_manager = CallbackManager([debug_handler])
 
-        # Create tools
-        self.tools = self._create_tools()
+        if self.mode == FUNCTION_CALLING:
+            # Tool calls requested together in one step are run concurrently
+            return FunctionCallingAgent.from_tools(
+                tools=self.tools,
+                llm=self.llm,
+                memory=ChatMemoryBuffer.from_defaults(llm=self.llm),
+                callback_manager=callback_manager,
+                verbose=True,
+                allow_parallel_tool_calls=True,
+                system_prompt=AGENT_CONTEXT,
+            )
 
         # Create the agent with system prompt
-        self.agent = ReActAgent.from_tools(
+        return ReActAgent.from_tools(
             tools=self.tools,
             llm=self.llm,
+            memory=ChatMemoryBuffer.from_defaults(llm=self.llm),
             callback_manager=callback_manager,
             verbose=True,
 #             context="""You are a helpful AI assistant specialized in handling legislation-related queries.
@@ -62,37 +175,7 @@ class LegislationReActAgent:
 
 # You MUST cite where in legislation the answer can be found.
 # """
-            context="""
-You are an AI assistant designed to be a legislation research tool for New Zealand's legislation.
-You are part of a website provided by the Parliamentary Council Office. Your purpose is to find answers to users' questions about legislation using the provided tools.
-You must strictly avoid offering legal interpretation of the legislation or making assertions about the user's situation or the outcome of legal cases.
-
-You have access to a database of New Zealand legislation that you should use to find the answer for the users question.
-Use the query_index tool to retrieve sections of legislation that are relevant to the users question, do not rely on prior knowledge.
-
-As a public servant and a representative of the Parliamentary Counsel Office, you should:
-- Avoid making legal interpretations of the legislation, only use the legislation to answer the users question.
-- Avoid making judgement about what the law means or how it applies to the users situation, instead help the user find the relevant legislation.
-- Avoid making predictions about the outcome of a legal case or what a court would rule.
-- Do not provide general advice, unless it is based on legislation retrieved from the database.
-- Assume that the user is asking a question that can be answered by New Zealand legislation.
-- You may need to reword the users question to be more specific to legislation.
-- Answer in english, do not use any other language.
-- If the task is not answering a question about New Zealand legislation, decline to answer politely.
-- If you cannot find a clear answer, admit that you don't know or that the information is not available in the legislation you have access to.
-- Cite specific fragments of legislation that back up your answers
-- Always reference where in legislation the answer can be found
-
-You MUST use the provided tools to answer questions about New Zealand legislation.
-Your training data is outdated and could be inaccurate. Even if you believe you know the answer,
-you MUST verify it by searching the knowledge base. Any response about New Zealand legislation not
-supported by a tool call will be considered incorrect.
-
-You MUST cite where in legislation the answer can be found.
-
-Do NOT generate observations you have not been given.
-
-The current year is 2025."""
+            context=AGENT_CONTEXT
         )
 
     def _create_tools(self) -> List[BaseTool]:
@@ -108,9 +191,7 @@ The current year is 2025."""
 
         async def query_legislation(query: str) -> str:
             """Query the legislation index and get a response."""
-            engine = LegislationQueryEngine()
-            response = await engine.query(query)
-            return response.answer
+            return await self._run_engine_tool("query_legislation_fragments", self.legislation_engine, query)
 
         return FunctionTool.from_defaults(
             fn=query_legislation,
@@ -128,9 +209,7 @@ The current year is 2025."""
 
         async def query_documents(query: str) -> str:
             """Query the legislation index and get a response about whole documents."""
-            engine = DocumentQueryEngine()
-            response = await engine.query(query)
-            return response.answer
+            return await self._run_engine_tool("query_documents", self.document_engine, query)
 
         return FunctionTool.from_defaults(
             fn=query_documents,
@@ -141,11 +220,92 @@ The current year is 2025."""
             All documents are from New Zealand legislation so don't include "new zealand" in your query unless it's part of the question."""
         )
 
+    async def _run_engine_tool(self, tool_name: str, engine: LegislationQueryEngine, query: str) -> str:
+        """Run a query engine for a tool call, reporting progress to any streaming client."""
+        tool_call_id = uuid.uuid4().hex
+        _emit(AgentEvent("tool_call", {"toolCallId": tool_call_id, "toolName": tool_name, "args": {"query": query}}))
+
+        # Reuse the turn's speculative retrieval if the tool query is close to the message
+        with track_stage(AGENT_TOOL_CALL):
+            nodes = None
+            prefetch = _prefetch.get()
+            if prefetch is not None and engine is prefetch.engine:
+                nodes = await prefetch.match(query)
+
+            response = await engine.query(query, nodes)
+
+        _emit(AgentEvent("fragments", {
+            "toolCallId": tool_call_id,
+            "fragments": [
+                {"chunk_id": result["fragment"].chunk_id, "score": result["score"]}
+                for result in response.results
+            ]
+        }))
+        _emit(AgentEvent("tool_result", {"toolCallId": tool_call_id, "result": response.answer}))
+        return response.answer
+
     async def chat(self, message: str, chat_history: List[ChatMessage] = None) -> str:
         """Process a chat message and return the agent's response."""
         if chat_history is None:
             chat_history = []
 
         # Get response with chat history
-        response = await self.agent.achat(message, chat_history=chat_history)
-        return str(response)
\ No newline at end of file
+        agent = self._create_agent()
+        with track_stage(AGENT_TURN):
+            response = await agent.achat(message, chat_history=chat_history)
+        return str(response)
+
+    async def stream_chat(self, message: str, chat_history: List[ChatMessage] = None) -> AsyncGenerator[AgentEvent, None]:
+        """Process a chat message, yielding tool progress events and then the answer token by token."""
+        if chat_history is None:
+            chat_history = []
+
+        start = time.perf_counter()
+        events: asyncio.Queue = asyncio.Queue()
+        agent = self._create_agent()
+
+        # The function calling agent cannot stream, so its answer arrives in one piece
+        run = agent.achat if self.mode == FUNCTION_CALLING else agent.astream_chat
+
+        # Start retrieval for the message alongside the agent's first reasoning step
+        prefetch = None
+        if self.prefetch:
+            prefetch = RetrievalPrefetch(self.legislation_engine, message, self.prefetch_threshold, self.prefetch_stats)
+
+        # The task copies the current context, so tool calls made by the agent see this turn's queue
+        token = _agent_events.set(events)
+        prefetch_token = _prefetch.set(prefetch)
+        try:
+            chat_task = asyncio.create_task(run(message, chat_history=chat_history))
+        finally:
+            _prefetch.reset(prefetch_token)
+            _agent_events.reset(token)
+
+        try:
+            # Relay tool events while the agent is reasoning
+            while not chat_task.done():
+                next_event = asyncio.create_task(events.get())
+                await asyncio.wait({chat_task, next_event}, return_when=asyncio.FIRST_COMPLETED)
+                if next_event.done():
+                    yield next_event.result()
+                else:
+                    next_event.cancel()
+
+            while not events.empty():
+                yield events.get_nowait()
+
+            response = chat_task.result()
+        finally:
+            if not chat_task.done():
+                chat_task.cancel()
+            if prefetch is not None:
+                prefetch.close()
+
+        if isinstance(response, StreamingAgentChatResponse):
+            # Stream the final answer as it arrives from the LLM
+            async for delta in response.async_response_gen():
+                yield AgentEvent("text", {"delta": delta})
+        else:
+            # The answer was produced without a streamed step, send it in one piece
+            yield AgentEvent("text", {"delta": str(response)})
+        observe_stage(AGENT_TURN, time.perf_counter() - start)
@@ -0,0 +1,166 @@
+from typing import Any, Dict, Optional
+from dataclasses import dataclass, field
+import importlib
+import logging
+import time
+from llama_index.core import VectorStoreIndex
+from llama_index.core.schema import QueryBundle
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.llms import LLM
+from app.core.embeddings import CachedEmbedding, configure_embeddings
+from app.core.llm import configure_llm
+from app.core.vector_store import get_vector_store
+from app.core.query_engines import LegislationQueryEngine, DocumentQueryEngine
+from app.core.rerank import CachedRerank, create_reranker
+from app.core.bm25 import load_lexical_index
+from app.core.citations import CitationIndex, load_citation_index
+from app.core.cache import SemanticCache, ResponseCache
+from app.core.singleflight import SingleFlight
+from app.core.index_version import read_index_version
+from app.core.config import get_settings
+from app.core.react_agent import LegislationReActAgent
+from app.core.memory import ChatSessionStore, create_session_store
+
+logger = logging.getLogger(__name__)
+
+def create_semantic_cache() -> Optional[SemanticCache]:
+    """Create a semantic answer cache from settings, or None when disabled."""
+    settings = get_settings()
+    if not settings.SEMANTIC_CACHE_ENABLED:
+        return None
+    return SemanticCache(
+        threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+        max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+        max_bytes=settings.SEMANTIC_CACHE_MAX_BYTES,
+        ttl_seconds=settings.SEMANTIC_CACHE_TTL_SECONDS,
+        version_fn=read_index_version,
+    )
+
+def create_response_cache() -> ResponseCache:
+    """Create the exact-match response cache from settings."""
+    settings = get_settings()
+    return ResponseCache(
+        max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS,
+        version_fn=read_index_version,
+    )
+
+# Provider SDKs the engines are built from, imported only when first needed
+PROVIDER_MODULES = ("app.core.anthropic_llm", "app.core.voyage_rerank", "llama_index.embeddings.voyageai")
+
+def import_providers() -> None:
+    """Import the provider SDKs, which take seconds, so the lifespan can load them off the event loop."""
+    modules = list(PROVIDER_MODULES)
+    if get_settings().VECTOR_STORE_BACKEND == "chroma":
+        modules.append("app.core.chroma_vector_store")
+    for module in modules:
+        importlib.import_module(module)
+
+@dataclass
+class EngineRegistry:
+    """Long-lived engines shared by every request on a worker.
+
+    Everything here is built once at startup. The engines hold no per-query
+    state, and the agent creates a fresh ReAct runner for every chat turn,
+    so a single instance can serve concurrent requests.
+    """
+    embed_model: BaseEmbedding
+    llm: LLM
+    index: VectorStoreIndex
+    legislation_engine: LegislationQueryEngine
+    document_engine: DocumentQueryEngine
+    agent: LegislationReActAgent
+    response_cache: ResponseCache
+    sessions: ChatSessionStore
+    citation_index: Optional[CitationIndex] = None
+    single_flight: SingleFlight = field(default_factory=SingleFlight)
+
+    @classmethod
+    def create(cls) -> "EngineRegistry":
+        """Configure providers and build all engines once."""
+        logger.info("Building query engines...")
+        settings = get_settings()
+
+        # Configure embeddings and LLM
+        embed_model = configure_embeddings()
+        llm = configure_llm()
+
+        # Create index from existing vector store
+        index = VectorStoreIndex.from_vector_store(get_vector_store())
+
+        # BM25 index for hybrid retrieval, memory-mapped and shared by the engines
+        lexical_index = load_lexical_index()
+
+        # Citation lookup tried before any search
+        citation_index = load_citation_index()
+
+        # Share a single reranker between the engines
+        reranker = create_reranker()
+        legislation_engine = LegislationQueryEngine(index, reranker, create_semantic_cache(), lexical_index, citation_index)
+        document_engine = DocumentQueryEngine(index, reranker, create_semantic_cache(), lexical_index, citation_index)
+
+        agent = LegislationReActAgent(
+            llm=llm,
+            legislation_engine=legislation_engine,
+            document_engine=document_engine,
+            mode=settings.AGENT_MODE,
+            prefetch=settings.CHAT_PREFETCH_ENABLED,
+            prefetch_threshold=settings.CHAT_PREFETCH_SIMILARITY,
+        )
+
+        logger.info("Query engines built")
+        return cls(
+            embed_model=embed_model,
+            llm=llm,
+            index=index,
+            legislation_engine=legislation_engine,
+            document_engine=document_engine,
+            agent=agent,
+            response_cache=create_response_cache(),
+            sessions=create_session_store(llm),
+            citation_index=citation_index,
+        )
+
+    async def warmup(self, query: str) -> Dict[str, Any]:
+        """Open provider and vector store connections and run a dummy retrieval before serving.
+
+        A failed step is logged and skipped, so a slow provider delays
+        readiness but does not stop the worker from starting.
+        """
+        timings: Dict[str, Any] = {}
+
+        async def step(name: str, fn) -> None:
+            start = time.perf_counter()
+            try:
+                await fn()
+            except Exception as e:
+                logger.warning(f"Warmup step {name} failed: {str(e)}")
+                timings[name] = None
+                return
+            timings[name] = (time.perf_counter() - start) * 1000
+
+        if hasattr(self.llm, "awarmup"):
+            await step("llm", self.llm.awarmup)
+        # Embeds, searches Chroma and reranks, opening each client on the way
+        await step("retrieve", lambda: self.legislation_engine.retrieve(QueryBundle(query)))
+
+        logger.info(f"Warmup finished: {timings}")
+        return timings
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Cache counters for the response, embedding and rerank caches and each engine."""
+        stats = {
+            "responses": self.response_cache.stats(),
+            "single_flight": self.single_flight.stats(),
+            "chat_sessions": self.sessions.stats(),
+            "prefetch": self.agent.prefetch_stats.stats(),
+        }
+        if isinstance(self.embed_model, CachedEmbedding):
+            stats["embeddings"] = self.embed_model.stats()
+        if isinstance(self.legislation_engine.reranker, CachedRerank):
+            stats["rerank"] = self.legislation_engine.reranker.stats()
+        for name, engine in (("legislation", self.legislation_engine), ("documents", self.document_engine)):
+            stats[name] = {"single_flight": engine.single_flight.stats()}
+            if engine.semantic_cache is not None:
+                stats[name]["semantic"] = engine.semantic_cache.stats()
+        return stats
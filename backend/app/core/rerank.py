@@ -0,0 +1,137 @@
+from typing import Any, Deque, Dict, List, Optional
+from collections import deque
+import time
+import numpy as np
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import NodeWithScore, QueryBundle
+from app.core.cache import ResponseCache, make_cache_key
+from app.core.admission import VOYAGE_RERANK, get_limiter
+from app.core.index_version import read_index_version
+from app.core.metrics import RERANK, observe_stage
+from app.core.config import get_settings
+
+def _candidate_id(node: NodeWithScore) -> str:
+    return node.node.metadata.get("chunk_id", node.node.node_id)
+
+class CachedRerank(BaseNodePostprocessor):
+    """Reranker wrapper that reuses the ordering for a repeated candidate set.
+
+    Results are keyed on the query, the sorted candidate chunk_ids and the
+    reranker model, and stored as (chunk_id, score) pairs so a hit is rebuilt
+    from the freshly retrieved nodes without calling the reranker. Async calls
+    to the wrapped reranker wait for a slot from the provider limiter.
+    """
+    _inner: BaseNodePostprocessor = PrivateAttr()
+    _cache: ResponseCache = PrivateAttr()
+    _latencies: Deque[float] = PrivateAttr()
+    _calls: int = PrivateAttr(default=0)
+    _total_seconds: float = PrivateAttr(default=0.0)
+
+    def __init__(self, inner: BaseNodePostprocessor, cache: ResponseCache, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._inner = inner
+        self._cache = cache
+        self._latencies = deque(maxlen=1000)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedRerank"
+
+    @property
+    def inner(self) -> BaseNodePostprocessor:
+        return self._inner
+
+    def _cache_key(self, nodes: List[NodeWithScore], query_bundle: QueryBundle) -> str:
+        return make_cache_key(
+            "rerank",
+            query_bundle.query_str,
+            model=getattr(self._inner, "model", None),
+            top_n=getattr(self._inner, "top_n", None),
+            candidates=sorted(_candidate_id(node) for node in nodes),
+        )
+
+    def _from_cache(self, key: str, nodes: List[NodeWithScore]) -> Optional[List[NodeWithScore]]:
+        ranking = self._cache.get(key)
+        if ranking is None:
+            return None
+        candidates = {_candidate_id(node): node.node for node in nodes}
+        return [NodeWithScore(node=candidates[chunk_id], score=score) for chunk_id, score in ranking]
+
+    def _store(self, key: str, nodes: List[NodeWithScore], elapsed: float) -> None:
+        self._calls += 1
+        self._total_seconds += elapsed
+        self._latencies.append(elapsed)
+        observe_stage(RERANK, elapsed)
+        self._cache.set(key, [(_candidate_id(node), node.score) for node in nodes])
+
+    def _postprocess_nodes(
+        self,
+        nodes: List[NodeWithScore],
+        query_bundle: Optional[QueryBundle] = None,
+    ) -> List[NodeWithScore]:
+        """Rerank nodes, reusing a cached ordering when available."""
+        if query_bundle is None or not nodes:
+            return self._inner.postprocess_nodes(nodes, query_bundle=query_bundle)
+
+        key = self._cache_key(nodes, query_bundle)
+        cached = self._from_cache(key, nodes)
+        if cached is not None:
+            return cached
+
+        start = time.perf_counter()
+        new_nodes = self._inner.postprocess_nodes(nodes, query_bundle=query_bundle)
+        self._store(key, new_nodes, time.perf_counter() - start)
+        return new_nodes
+
+    async def _apostprocess_nodes(
+        self,
+        nodes: List[NodeWithScore],
+        query_bundle: Optional[QueryBundle] = None,
+    ) -> List[NodeWithScore]:
+        """Rerank nodes asynchronously, reusing a cached ordering when available."""
+        if query_bundle is None or not nodes:
+            return await self._inner.apostprocess_nodes(nodes, query_bundle=query_bundle)
+
+        key = self._cache_key(nodes, query_bundle)
+        cached = self._from_cache(key, nodes)
+        if cached is not None:
+            return cached
+
+        async with get_limiter(VOYAGE_RERANK).slot():
+            start = time.perf_counter()
+            new_nodes = await self._inner.apostprocess_nodes(nodes, query_bundle=query_bundle)
+        self._store(key, new_nodes, time.perf_counter() - start)
+        return new_nodes
+
+    def stats(self) -> Dict[str, Any]:
+        """Reranker call latency and cache counters."""
+        latencies = np.asarray(self._latencies) * 1000
+        return {
+            "calls": self._calls,
+            "latency_ms": {
+                "mean": self._total_seconds * 1000 / self._calls if self._calls else 0.0,
+                "p50": float(np.percentile(latencies, 50)) if latencies.size else 0.0,
+                "p95": float(np.percentile(latencies, 95)) if latencies.size else 0.0,
+            },
+            "cache": self._cache.stats(),
+        }
+
+def create_reranker() -> CachedRerank:
+    """Create the cached VoyageAI reranker shared by the query engines."""
+    # The Voyage SDK is heavy to import, so only load it when the reranker is created
+    from app.core.voyage_rerank import AsyncVoyageAIRerank
+
+    settings = get_settings()
+    reranker = AsyncVoyageAIRerank(
+        api_key=settings.VOYAGE_API_KEY,
+        top_k=10,
+        model="rerank-2",
+        truncation=True
+    )
+    cache = ResponseCache(
+        max_entries=settings.RERANK_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS,
+        version_fn=read_index_version,
+    )
+    return CachedRerank(reranker, cache)
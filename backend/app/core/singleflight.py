@@ -0,0 +1,49 @@
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one computation.
+
+    The first caller for a key starts the work as a task; callers that arrive
+    while it is running await the same task instead of repeating it. The work
+    is shielded, so one caller disconnecting does not cancel it for the others.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run fn for key, or wait for the call already in flight for key."""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+            self.leaders += 1
+        else:
+            self.followers += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the exception as retrieved in case every caller went away
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"Coalesced call failed: {task.exception()}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for calls that ran versus calls that joined one in flight."""
+        calls = self.leaders + self.followers
+        return {
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "coalesced_rate": self.followers / calls if calls else 0.0,
+            "in_flight": len(self._calls),
+        }
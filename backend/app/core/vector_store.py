@@ -1,46 +1,33 @@
-from typing import Optional
-from llama_index.vector_stores.chroma import ChromaVectorStore
-from chromadb import HttpClient, Settings as ChromaSettings
-import logging
+from typing import List
+import asyncio
+import os
+from llama_index.core.vector_stores.types import BasePydanticVectorStore, VectorStoreQuery, VectorStoreQueryResult
 from app.core.config import get_settings
+from app.core.numpy_vector_store import NumpyVectorStore
+from app.core.partitioned_vector_store import PARTITIONS, PartitionedVectorStore, partition_collection_name
 
-logger = logging.getLogger(__name__)
+async def aquery_batch(vector_store: BasePydanticVectorStore, queries: List[VectorStoreQuery]) -> List[VectorStoreQueryResult]:
+    """Run several similarity queries, batched when the store supports it."""
+    if hasattr(vector_store, "aquery_batch"):
+        return await vector_store.aquery_batch(queries)
+    return await asyncio.gather(*(vector_store.aquery(query) for query in queries))
 
-def get_chroma_client():
-    """Get or create a ChromaDB client."""
+def get_vector_store(collection_name: str = "legislation") -> BasePydanticVectorStore:
+    """Get or create the vector store selected by VECTOR_STORE_BACKEND and VECTOR_STORE_PARTITIONED."""
     settings = get_settings()
-    return HttpClient(
-        host=settings.CHROMA_HOST,
-        port=settings.CHROMA_PORT,
-        settings=ChromaSettings(anonymized_telemetry=False, allow_reset=True, is_persistent=True)
-    )
+    if settings.VECTOR_STORE_PARTITIONED:
+        return PartitionedVectorStore(partitions={
+            partition: open_vector_store(partition_collection_name(collection_name, partition), settings.VECTOR_STORE_BACKEND)
+            for partition in PARTITIONS
+        })
+    return open_vector_store(collection_name, settings.VECTOR_STORE_BACKEND)
 
-def get_vector_store(collection_name: str = "legislation") -> ChromaVectorStore:
-    """Get or create a ChromaDB vector store."""
-    # Initialize ChromaDB client
-    chroma_client = get_chroma_client()
-
-    # List existing collections
-    existing_collections = chroma_client.list_collections()
-    logger.info(f"Existing collections: {existing_collections}")
-
-    # Get or create collection
-    collection = chroma_client.get_or_create_collection(
-        name=collection_name,
-        configuration={
-            "hnsw": {
-                "space": "cosine",
-                "ef_construction": 100,
-                "ef_search": 100,
-                "max_neighbors": 64
-            }
-        }
-    )
-
-    # Create and return vector store
-    vector_store = ChromaVectorStore(
-        chroma_collection=collection,
-        store_metadata=True
-    )
+def open_vector_store(collection_name: str, backend: str = "chroma") -> BasePydanticVectorStore:
+    """Get or create a single collection on the given backend."""
+    settings = get_settings()
+    if backend == "numpy":
+        return NumpyVectorStore.from_persist_dir(os.path.join(settings.VECTOR_STORE_PATH, collection_name))
 
-    return vector_store
\ No newline at end of file
+    # chromadb is heavy to import, so only load it when a Chroma collection is opened
+    from app.core.chroma_vector_store import open_chroma_vector_store
+    return open_chroma_vector_store(collection_name)
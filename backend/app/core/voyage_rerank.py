@@ -0,0 +1,61 @@
+from typing import Any, List, Optional
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.instrumentation import get_dispatcher
+from llama_index.core.instrumentation.events.rerank import ReRankEndEvent, ReRankStartEvent
+from llama_index.core.schema import MetadataMode, NodeWithScore, QueryBundle
+from llama_index.postprocessor.voyageai_rerank import VoyageAIRerank
+import voyageai
+
+dispatcher = get_dispatcher(__name__)
+
+class AsyncVoyageAIRerank(VoyageAIRerank):
+    """VoyageAIRerank with a native async path.
+
+    The base postprocessor only has a sync client, so apostprocess_nodes would
+    either block the event loop or need a worker thread for every query.
+    """
+    _aclient: Any = PrivateAttr()
+
+    def __init__(self, model: str, api_key: Optional[str] = None, **kwargs: Any):
+        super().__init__(model=model, api_key=api_key, **kwargs)
+        self._aclient = voyageai.AsyncClient(api_key=api_key)
+
+    async def _apostprocess_nodes(
+        self,
+        nodes: List[NodeWithScore],
+        query_bundle: Optional[QueryBundle] = None,
+    ) -> List[NodeWithScore]:
+        """Rerank nodes with the async VoyageAI client."""
+        dispatcher.event(
+            ReRankStartEvent(
+                query=query_bundle,
+                nodes=nodes,
+                top_n=self.top_n or len(nodes),
+                model_name=self.model,
+            )
+        )
+
+        if query_bundle is None:
+            raise ValueError("Missing query bundle in extra info.")
+        if len(nodes) == 0:
+            return []
+
+        texts = [
+            node.node.get_content(metadata_mode=MetadataMode.EMBED)
+            for node in nodes
+        ]
+        response = await self._aclient.rerank(
+            model=self.model,
+            top_k=self.top_n,
+            query=query_bundle.query_str,
+            documents=texts,
+            truncation=self.truncation,
+        )
+
+        new_nodes = [
+            NodeWithScore(node=nodes[result.index].node, score=result.relevance_score)
+            for result in response.results
+        ]
+
+        dispatcher.event(ReRankEndEvent(nodes=new_nodes))
+        return new_nodes
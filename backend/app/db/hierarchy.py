@@ -0,0 +1,149 @@
+from typing import Any, Dict, Iterable, List, Optional
+from beanie import PydanticObjectId
+from bson import DBRef
+from pydantic import BaseModel, ConfigDict, Field
+from .models import LegislationDocument, LegislationFragment
+from .projections import FragmentView, HEAVY_FRAGMENT_FIELDS, LIGHT_FRAGMENT_FIELDS
+
+# Fragment types that make up an Act's table of contents
+TOC_FRAGMENT_TYPES = ("Part", "Subpart", "Schedule", "Section")
+
+# Deepest subtree a single request may ask for
+MAX_SUBTREE_DEPTH = 5
+
+class TocEntry(BaseModel):
+    """A heading in an Act's table of contents.
+
+    Cross-headings are not fragments of their own, so consecutive sections
+    that share a crosshead_name are grouped under a CrossHead entry without
+    an id.
+    """
+    model_config = ConfigDict(populate_by_name=True)
+
+    id: Optional[PydanticObjectId] = Field(default=None, alias="_id")
+    chunk_id: Optional[str] = None
+    fragment_type: str
+    fragment_label: str | None = None
+    descriptive_label: str | None = None
+    heading: str | None = None
+    order: int
+    children: List["TocEntry"] = []
+
+class FragmentNode(FragmentView):
+    """A fragment with its descendants nested beneath it."""
+    children: List["FragmentNode"] = []
+
+def _parent_id(raw: Dict[str, Any]) -> Any:
+    parent = raw.get("parent_fragment")
+    if isinstance(parent, DBRef):
+        return parent.id
+    if isinstance(parent, dict):
+        return parent.get("$id", parent.get("id"))
+    return None
+
+def _group_crossheads(entries: List[TocEntry], crossheads: Dict[Any, Optional[str]]) -> List[TocEntry]:
+    grouped: List[TocEntry] = []
+    for entry in entries:
+        entry.children = _group_crossheads(entry.children, crossheads)
+        name = crossheads.get(entry.id) if entry.fragment_type == "Section" else None
+        if name is None:
+            grouped.append(entry)
+            continue
+
+        previous = grouped[-1] if grouped else None
+        if previous is not None and previous.fragment_type == "CrossHead" and previous.heading == name:
+            previous.children.append(entry)
+        else:
+            grouped.append(TocEntry(fragment_type="CrossHead", heading=name, order=entry.order, children=[entry]))
+    return grouped
+
+async def build_table_of_contents(document_query: Dict[str, Any]) -> List[TocEntry]:
+    """Build an Act's heading hierarchy from a single aggregation over its fragments."""
+    pipeline = [
+        {"$match": {"$and": [document_query, {"fragment_type": {"$in": list(TOC_FRAGMENT_TYPES)}}]}},
+        {"$sort": {"order": 1}},
+        {"$project": {
+            "chunk_id": 1,
+            "fragment_type": 1,
+            "fragment_label": 1,
+            "descriptive_label": 1,
+            "heading": 1,
+            "crosshead_name": 1,
+            "order": 1,
+            "parent_fragment": 1,
+        }},
+    ]
+    rows = await LegislationFragment.get_motor_collection().aggregate(pipeline).to_list(None)
+
+    # Rows arrive in document order, so appending keeps siblings ordered
+    entries = {row["_id"]: TocEntry.model_validate({**row, "children": []}) for row in rows}
+    crossheads = {row["_id"]: row.get("crosshead_name") for row in rows}
+    roots: List[TocEntry] = []
+    for row in rows:
+        parent = entries.get(_parent_id(row))
+        (parent.children if parent is not None else roots).append(entries[row["_id"]])
+
+    return _group_crossheads(roots, crossheads)
+
+def _node_projection(fields: Iterable[str], prefix: str) -> Dict[str, Any]:
+    projection: Dict[str, Any] = {"_id": f"{prefix}_id", "parent_fragment": f"{prefix}parent_fragment"}
+    for name in (*LIGHT_FRAGMENT_FIELDS, *fields):
+        projection[name] = f"{prefix}{name}"
+    projection["token_count"] = {"$size": {"$regexFindAll": {"input": f"{prefix}text", "regex": r"\S+"}}}
+    return projection
+
+async def find_fragment_version(fragment_id: PydanticObjectId) -> Optional[str]:
+    """The date_as_at of the document owning a fragment, "" if it has none, or None if there is no such fragment."""
+    pipeline = [
+        {"$match": {"_id": fragment_id}},
+        {"$lookup": {
+            "from": LegislationDocument.get_motor_collection().name,
+            "localField": "document.$id",
+            "foreignField": "_id",
+            "as": "document",
+        }},
+        {"$project": {"date_as_at": {"$arrayElemAt": ["$document.date_as_at", 0]}}},
+    ]
+    rows = await LegislationFragment.get_motor_collection().aggregate(pipeline).to_list(1)
+    if not rows:
+        return None
+    return rows[0].get("date_as_at") or ""
+
+async def build_subtree(fragment_id: PydanticObjectId, depth: int, fields: Iterable[str] = ()) -> Optional[FragmentNode]:
+    """Load a fragment and `depth` levels of descendants with one $graphLookup."""
+    fields = [name for name in fields if name in HEAVY_FRAGMENT_FIELDS]
+    pipeline = [
+        {"$match": {"_id": fragment_id}},
+        {"$graphLookup": {
+            "from": LegislationFragment.get_motor_collection().name,
+            "startWith": "$_id",
+            "connectFromField": "_id",
+            "connectToField": "parent_fragment.$id",
+            "as": "descendants",
+            "maxDepth": depth - 1,
+        }},
+        # Trim every fragment to the requested fields before leaving the server
+        {"$project": {
+            **_node_projection(fields, "$"),
+            "descendants": {"$map": {
+                "input": "$descendants",
+                "as": "d",
+                "in": _node_projection(fields, "$$d."),
+            }},
+        }},
+    ]
+    rows = await LegislationFragment.get_motor_collection().aggregate(pipeline).to_list(None)
+    if not rows:
+        return None
+
+    root_row = rows[0]
+    descendants = sorted(root_row.pop("descendants", []), key=lambda row: row["order"])
+    nodes = {
+        row["_id"]: FragmentNode.model_validate({**row, "children": []})
+        for row in [root_row, *descendants]
+    }
+    for row in descendants:
+        parent = nodes.get(_parent_id(row))
+        if parent is not None:
+            parent.children.append(nodes[row["_id"]])
+    return nodes[root_row["_id"]]
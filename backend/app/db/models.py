@@ -1,6 +1,11 @@
 from typing import List, Optional, Dict, Any
+from datetime import datetime, timezone
 from beanie import Document, Indexed, Link
-from pydantic import Field, computed_field
+from pydantic import BaseModel, Field, computed_field
+from pymongo import ASCENDING, IndexModel
+
+# Chat sessions are dropped by MongoDB after this long without a new turn
+CHAT_SESSION_TTL_SECONDS = 7 * 24 * 60 * 60
 
 class LegislationFragment(Document):
     """MongoDB document model for legislation fragments"""
@@ -78,7 +83,28 @@ class LegislationDocument(Document):
     class Settings:
         name = "legislation_documents"
         indexes = [
+            "title",
             "year",
             "type",
             "administered_by"
-        ]
\ No newline at end of file
+        ]
+
+class ChatTurn(BaseModel):
+    """A single message in a chat session"""
+    role: str
+    content: str
+
+class ChatSession(Document):
+    """MongoDB document model for the server-side memory of a conversation"""
+    id: str
+    messages: List[ChatTurn] = []
+    summary: str | None = None
+    # Number of leading messages already folded into the summary
+    summarized_until: int = 0
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+    class Settings:
+        name = "chat_sessions"
+        indexes = [
+            IndexModel([("updated_at", ASCENDING)], expireAfterSeconds=CHAT_SESSION_TTL_SECONDS)
+        ]
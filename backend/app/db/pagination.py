@@ -0,0 +1,75 @@
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+import base64
+import json
+from beanie import PydanticObjectId
+
+# Page sizes accepted by the paginated endpoints
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Encode the sort key of the last item on a page as an opaque cursor."""
+    payload = json.dumps([str(v) if isinstance(v, PydanticObjectId) else v for v in values])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """Decode a cursor produced by encode_cursor."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
+
+def keyset_query(
+    query: Mapping[str, Any],
+    sort_fields: Sequence[str],
+    cursor: Optional[str],
+    object_id_fields: Sequence[str] = (),
+) -> Dict[str, Any]:
+    """Restrict a filter to the items that sort after the cursor.
+
+    Sorting is ascending on sort_fields, which must end with a unique field so
+    that every item has a distinct position.
+    """
+    if not cursor:
+        return dict(query)
+
+    values = decode_cursor(cursor)
+    if len(values) != len(sort_fields):
+        raise ValueError("Invalid cursor")
+    values = [
+        PydanticObjectId(value) if field in object_id_fields else value
+        for field, value in zip(sort_fields, values)
+    ]
+
+    # (a, b) > (x, y)  <=>  a > x or (a == x and b > y)
+    clauses = []
+    for i, field in enumerate(sort_fields):
+        clause = {sort_fields[j]: values[j] for j in range(i)}
+        clause[field] = {"$gt": values[i]}
+        clauses.append(clause)
+    return {"$and": [dict(query), {"$or": clauses}]} if query else {"$or": clauses}
+
+def sort_spec(sort_fields: Sequence[str]) -> List[Tuple[str, int]]:
+    """Ascending MongoDB sort on sort_fields."""
+    return [(field, 1) for field in sort_fields]
+
+def split_page(
+    items: Sequence[Any],
+    limit: Optional[int],
+    sort_fields: Sequence[str],
+    attributes: Mapping[str, str] = {},
+) -> Tuple[List[Any], Optional[str]]:
+    """Trim items fetched with limit + 1 to a page and the cursor for the next one.
+
+    attributes maps sort fields to model attribute names where they differ,
+    such as _id to id.
+    """
+    if limit is None or len(items) <= limit:
+        return list(items), None
+    page = list(items[:limit])
+    last = page[-1]
+    return page, encode_cursor([getattr(last, attributes.get(field, field)) for field in sort_fields])
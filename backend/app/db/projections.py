@@ -0,0 +1,127 @@
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set
+from beanie import PydanticObjectId
+from pydantic import BaseModel, ConfigDict, Field
+from .models import LegislationDocument, LegislationFragment
+from ..core.metrics import FRAGMENT_FETCH, track_stage
+
+# Large fragment fields that are only loaded and returned when asked for
+HEAVY_FRAGMENT_FIELDS = ("text", "xml", "summary_long", "embedding")
+
+class FragmentView(BaseModel):
+    """A legislation fragment without its heavy fields unless they were requested.
+
+    Heavy fields that were not projected are left unset, so responses built
+    with exclude_unset omit them entirely.
+    """
+    model_config = ConfigDict(populate_by_name=True)
+
+    id: Optional[PydanticObjectId] = Field(default=None, alias="_id")
+    chunk_id: str
+    order: int
+    fragment_type: str
+    fragment_label: str | None = None
+    descriptive_label: str | None = None
+
+    summary: str | None = None
+    summary_context: str | None = None
+
+    act_name: str | None = None
+    act_number: str | None = None
+    act_year: str | None = None
+
+    schedule_label: str | None = None
+    schedule_name: str | None = None
+
+    part_label: str | None = None
+    part_name: str | None = None
+
+    subpart_label: str | None = None
+    subpart_name: str | None = None
+
+    crosshead_name: str | None = None
+
+    section_label: str | None = None
+    section_name: str | None = None
+
+    paragraph_label: list[str] = []
+
+    heading: str | None = None
+    token_count: int | None = None
+
+    # Heavy fields, opt-in through fields=
+    text: str | None = None
+    xml: str | None = None
+    summary_long: str | None = None
+    embedding: list[float] | None = None
+
+class DocumentSummary(BaseModel):
+    """The fields of a legislation document shown in listings."""
+    model_config = ConfigDict(populate_by_name=True)
+
+    id: str = Field(alias="_id")
+    title: str
+    year: str
+    type: str
+    no: str
+    date_as_at: str
+
+LIGHT_FRAGMENT_FIELDS = tuple(
+    name for name in FragmentView.model_fields
+    if name not in HEAVY_FRAGMENT_FIELDS and name not in ("id", "token_count")
+)
+
+def parse_fragment_fields(fields: Optional[str]) -> Set[str]:
+    """Parse a comma separated fields= value into a set of heavy field names."""
+    if not fields:
+        return set()
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(HEAVY_FRAGMENT_FIELDS)
+    if unknown:
+        raise ValueError(
+            f"Unknown fields: {', '.join(sorted(unknown))}. "
+            f"Choose from: {', '.join(HEAVY_FRAGMENT_FIELDS)}"
+        )
+    return requested
+
+def fragment_projection(fields: Iterable[str] = ()) -> Dict[str, Any]:
+    """MongoDB projection for FragmentView plus the requested heavy fields."""
+    projection: Dict[str, Any] = {name: 1 for name in LIGHT_FRAGMENT_FIELDS}
+    # Count words server side so text only crosses the wire when it was asked for
+    projection["token_count"] = {"$size": {"$regexFindAll": {"input": "$text", "regex": r"\S+"}}}
+    for name in fields:
+        projection[name] = 1
+    return projection
+
+async def find_fragment_views(
+    query: Mapping[str, Any],
+    fields: Iterable[str] = (),
+    sort: Optional[List[Any]] = None,
+    limit: Optional[int] = None,
+) -> List[FragmentView]:
+    """Load fragments matching a MongoDB filter as FragmentViews."""
+    cursor = LegislationFragment.get_motor_collection().find(dict(query), fragment_projection(fields))
+    if sort:
+        cursor = cursor.sort(sort)
+    if limit:
+        cursor = cursor.limit(limit)
+    with track_stage(FRAGMENT_FETCH):
+        return [FragmentView.model_validate(document) async for document in cursor]
+
+async def find_fragment_views_by_chunk_id(chunk_ids: Iterable[str], fields: Iterable[str] = ()) -> Dict[str, FragmentView]:
+    """Load fragments in one query and map them by chunk_id."""
+    views = await find_fragment_views({"chunk_id": {"$in": list(set(chunk_ids))}}, fields)
+    return {view.chunk_id: view for view in views}
+
+async def find_document_summaries(
+    query: Mapping[str, Any],
+    sort: Optional[List[Any]] = None,
+    limit: Optional[int] = None,
+) -> List[DocumentSummary]:
+    """Load legislation documents matching a MongoDB filter as DocumentSummaries."""
+    projection = {name: 1 for name in DocumentSummary.model_fields if name != "id"}
+    cursor = LegislationDocument.get_motor_collection().find(dict(query), projection)
+    if sort:
+        cursor = cursor.sort(sort)
+    if limit:
+        cursor = cursor.limit(limit)
+    return [DocumentSummary.model_validate(document) async for document in cursor]
@@ -1,25 +1,78 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from motor.motor_asyncio import AsyncIOMotorClient
+import asyncio
 import logging
 
 from .db.mongodb import init_mongodb, close_mongodb_connection
 from .api import legislation, tools, chat
-from .observability import init_observability
+from .core.registry import EngineRegistry, import_providers
+from .core.admission import ProviderOverloaded
+from .core.config import get_settings
+from .core import metrics
+from .middleware import CompressionMiddleware, ServerTimingMiddleware
+from .observability import init_observability, shutdown_observability
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+settings = get_settings()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.ready = False
+    app.state.warmup = {}
+    app.state.tracer_provider = None
+
+    # Set up tracing and import the provider SDKs in worker threads while MongoDB connects
+    tracing = asyncio.create_task(asyncio.to_thread(init_observability))
+    providers = asyncio.create_task(asyncio.to_thread(import_providers))
+
+    logger.info("Starting up MongoDB client...")
+    try:
+        app.mongodb_client = await init_mongodb()
+        logger.info("MongoDB client initialized successfully")
+    except Exception as e:
+        logger.error(f"Failed to initialize MongoDB client: {str(e)}")
+        raise
+
+    # Build query engines and the agent once for the lifetime of the worker
+    await providers
+    app.state.engines = EngineRegistry.create()
+
+    try:
+        app.state.tracer_provider = await tracing
+    except Exception as e:
+        logger.error(f"Failed to initialize observability: {str(e)}")
+
+    # Open provider and Chroma connections before taking traffic
+    if settings.WARMUP_ENABLED:
+        app.state.warmup = await app.state.engines.warmup(settings.WARMUP_QUERY)
+    app.state.ready = True
+
+    yield
+
+    app.state.ready = False
+
+    # Let background chat summaries finish before the connection closes
+    await app.state.engines.sessions.aclose()
+    await close_mongodb_connection(app.mongodb_client)
+
+    # Export the spans still queued
+    await asyncio.to_thread(shutdown_observability, app.state.tracer_provider)
+
 app = FastAPI(
     title="RAG API",
     description="API for RAG-based chatbot using LlamaIndex",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
-init_observability()
-
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -27,21 +80,29 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Conversation-Id"],
 )
 
-@app.on_event("startup")
-async def startup_db_client():
-    logger.info("Starting up MongoDB client...")
-    try:
-        app.mongodb_client = await init_mongodb()
-        logger.info("MongoDB client initialized successfully")
-    except Exception as e:
-        logger.error(f"Failed to initialize MongoDB client: {str(e)}")
-        raise
+# Compress large JSON responses for clients that accept it
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.RESPONSE_COMPRESSION_MIN_BYTES,
+    gzip_level=settings.RESPONSE_GZIP_LEVEL,
+    brotli_quality=settings.RESPONSE_BROTLI_QUALITY,
+)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    await close_mongodb_connection(app.mongodb_client)
+# Break down where the time of each tools and chat request went
+app.add_middleware(ServerTimingMiddleware)
+
+@app.exception_handler(ProviderOverloaded)
+async def provider_overloaded_handler(request: Request, exc: ProviderOverloaded):
+    """Shed load with a 503 and Retry-After when a provider queue is full."""
+    logger.warning(f"Shedding request to {request.url.path}: {exc}")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
 # Include routers first
 app.include_router(legislation.router)
@@ -54,4 +115,16 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+@app.get("/ready")
+async def readiness_check(request: Request):
+    """Report ready once startup and warmup have finished."""
+    if not getattr(request.app.state, "ready", False):
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    return {"status": "ready", "warmup_ms": request.app.state.warmup}
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Pipeline stage latencies and LLM token usage in the Prometheus text format."""
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
@@ -0,0 +1,165 @@
+from typing import Dict, Optional, Sequence
+import gzip
+import json
+import logging
+import time
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.metrics import collect_request_stages
+
+access_logger = logging.getLogger("app.access")
+
+# Content types worth compressing
+COMPRESSIBLE_TYPES = ("application/json", "text/html", "text/plain", "text/css", "application/javascript")
+
+# In order of preference
+SUPPORTED_ENCODINGS = ("br", "gzip")
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick the best supported encoding the client accepts, preferring brotli."""
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    for encoding in SUPPORTED_ENCODINGS:
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+def weaken_etag(headers: MutableHeaders) -> None:
+    """Mark a strong ETag weak, as the encoded bytes differ from the body it was computed over."""
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        headers["ETag"] = f"W/{etag}"
+
+class CompressionMiddleware:
+    """Compress large single-body responses with brotli or gzip.
+
+    Streaming responses, such as the chat stream, are passed through untouched
+    so that tokens are not held back in a compressor buffer.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 5):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                if message["status"] == 304:
+                    # Revalidations carry the same ETag as the compressed response they confirm
+                    weaken_etag(MutableHeaders(raw=message["headers"]))
+                    passthrough = True
+                    await send(message)
+                elif "content-encoding" in headers or not content_type.startswith(COMPRESSIBLE_TYPES):
+                    passthrough = True
+                    await send(message)
+                else:
+                    # Hold the headers until we know whether the body is worth compressing
+                    start = message
+                return
+
+            body = message.get("body", b"")
+            if message.get("more_body", False) or len(body) < self.minimum_size:
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            compressed = self.compress(body, encoding)
+            headers = MutableHeaders(raw=start["headers"])
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            weaken_etag(headers)
+            await send(start)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level)
+
+def format_server_timing(stages: Dict[str, float], total: float) -> str:
+    """Format stage durations in seconds as a Server-Timing header value in milliseconds."""
+    metrics = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in stages.items()]
+    metrics.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(metrics)
+
+class ServerTimingMiddleware:
+    """Report pipeline stage durations in a Server-Timing header and the access log.
+
+    The header holds the stages that finished before the response started, so
+    for a streamed response it only covers the work done before the first
+    byte; the access log line is written once the body has been sent and
+    covers the whole request.
+    """
+
+    def __init__(self, app: ASGIApp, path_prefixes: Sequence[str] = ("/api/tools", "/api/chat")):
+        self.app = app
+        self.path_prefixes = tuple(path_prefixes)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        with collect_request_stages() as stages:
+            async def send_with_timing(message: Message) -> None:
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", format_server_timing(stages, time.perf_counter() - start))
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_timing)
+            finally:
+                self.log(scope, status, stages, time.perf_counter() - start)
+
+    def log(self, scope: Scope, status: int, stages: Dict[str, float], total: float) -> None:
+        """Write one structured access log line for a request."""
+        headers = Headers(scope=scope)
+        access_logger.info(json.dumps({
+            "method": scope["method"],
+            "path": scope["path"],
+            "status": status,
+            "request_id": headers.get("x-request-id"),
+            "duration_ms": round(total * 1000, 1),
+            "stages_ms": {stage: round(seconds * 1000, 1) for stage, seconds in stages.items()},
+        }))
@@ -1,20 +1,91 @@
-import os
+from typing import Sequence
+import json
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
 from app.core.config import get_settings
-from phoenix.otel import register
-from openinference.instrumentation.llama_index import LlamaIndexInstrumentor
+
+OTLP = "otlp"
+FILE = "file"
+NONE = "none"
+
+def create_file_exporter(path: str):
+    """Span exporter that appends finished spans to a file as JSON lines, for local or offline runs."""
+    from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+
+    class JsonLinesSpanExporter(SpanExporter):
+        def __init__(self, path: str):
+            self.path = path
+            self._lock = threading.Lock()
+
+        def export(self, spans: Sequence) -> SpanExportResult:
+            lines = "".join(json.dumps(json.loads(span.to_json())) + "\n" for span in spans)
+            try:
+                with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                    f.write(lines)
+            except OSError as e:
+                logger.warning(f"Failed to write spans to {self.path}: {str(e)}")
+                return SpanExportResult.FAILURE
+            return SpanExportResult.SUCCESS
+
+        def shutdown(self) -> None:
+            pass
+
+    return JsonLinesSpanExporter(path)
+
+def create_span_exporter(settings):
+    """Create the span exporter selected by TRACING_EXPORTER."""
+    if settings.TRACING_EXPORTER == FILE:
+        return create_file_exporter(settings.TRACING_FILE_PATH)
+    if settings.TRACING_EXPORTER == OTLP:
+        if not settings.TRACING_ENDPOINT:
+            raise ValueError("TRACING_EXPORTER=otlp needs TRACING_ENDPOINT")
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        headers = {}
+        if settings.PHOENIX_API_KEY:
+            headers["authorization"] = f"Bearer {settings.PHOENIX_API_KEY}"
+        return OTLPSpanExporter(endpoint=settings.TRACING_ENDPOINT, headers=headers)
+    raise ValueError(f"Unknown TRACING_EXPORTER: {settings.TRACING_EXPORTER}")
 
 def init_observability():
+    """Set up sampled LlamaIndex tracing with a batching exporter and return the tracer provider."""
     settings = get_settings()
-    logger.info(f"Initializing observability with Phoenix API key: {settings.PHOENIX_API_KEY}")
-    os.environ["PHOENIX_API_KEY"] = settings.PHOENIX_API_KEY
-    tracer_provider = register(
-        project_name="pco-chatbot-rnd2", # Default is 'default'
-        endpoint="https://pco-chatbot-rnd-phoenix.cloud.boost.co.nz/v1/traces",
-        auto_instrument=True # Auto-instrument your app based on installed dependencies
+    if settings.TRACING_EXPORTER == NONE:
+        logger.info("Tracing is disabled")
+        return None
+
+    # OpenTelemetry and OpenInference are heavy to import, so only load them when tracing is set up
+    from opentelemetry import trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+    from openinference.semconv.resource import ResourceAttributes
+    from openinference.instrumentation.llama_index import LlamaIndexInstrumentor
+
+    tracer_provider = TracerProvider(
+        resource=Resource.create({ResourceAttributes.PROJECT_NAME: settings.TRACING_PROJECT_NAME}),
+        # Sample whole traces: child spans follow their root's decision
+        sampler=ParentBased(TraceIdRatioBased(settings.TRACING_SAMPLE_RATE)),
     )
+    # Spans are queued and exported from a background thread; when the queue is full they are dropped
+    tracer_provider.add_span_processor(BatchSpanProcessor(
+        create_span_exporter(settings),
+        max_queue_size=settings.TRACING_MAX_QUEUE_SIZE,
+        max_export_batch_size=settings.TRACING_EXPORT_BATCH_SIZE,
+        schedule_delay_millis=settings.TRACING_EXPORT_DELAY_MS,
+    ))
+    trace.set_tracer_provider(tracer_provider)
 
     LlamaIndexInstrumentor().instrument(tracer_provider=tracer_provider)
+    logger.info(
+        f"Tracing {settings.TRACING_SAMPLE_RATE:.0%} of requests to the {settings.TRACING_EXPORTER} exporter"
+    )
+    return tracer_provider
+
+def shutdown_observability(tracer_provider) -> None:
+    """Flush queued spans and stop the exporter."""
+    if tracer_provider is not None:
+        tracer_provider.shutdown()
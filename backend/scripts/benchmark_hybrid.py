@@ -0,0 +1,157 @@
+import argparse
+import asyncio
+import json
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from llama_index.core import VectorStoreIndex
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle
+
+from scripts.load_test import git_commit
+from scripts.stubs import HashEmbedding, StubRerank, build_index, create_nodes, load_bundled_legislation
+
+from app.api.tools import default_retrieval_filters
+from app.core.bm25 import BM25Index, get_lexical_index_path
+from app.core.config import get_settings
+from app.core.hybrid_retriever import HybridRetriever
+
+# Candidates the query engines pass to the reranker without hybrid retrieval
+VECTOR_TOP_K = 20
+# Nodes the reranker keeps
+RERANK_TOP_N = 10
+
+def heading_queries(count: int, rng: np.random.Generator) -> List[Tuple[str, List[str]]]:
+    """Known-item queries: a section heading, relevant to every Section with that heading."""
+    headings: Dict[str, List[str]] = {}
+    for _, fragments in load_bundled_legislation():
+        for fragment in fragments:
+            if fragment["fragment_type"] == "Section" and fragment.get("section_name"):
+                headings.setdefault(fragment["section_name"], []).append(fragment["chunk_id"])
+    names = sorted(headings)
+    picks = rng.choice(len(names), size=min(count, len(names)), replace=False)
+    return [(names[i], headings[names[i]]) for i in picks]
+
+def file_queries(path: str) -> List[Tuple[str, List[str]]]:
+    """Queries from a JSON lines file of {"query": ..., "relevant": [chunk_id, ...]}."""
+    with open(path) as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    return [(row["query"], row["relevant"]) for row in rows]
+
+def create_retrievers(index: VectorStoreIndex, lexical_index: BM25Index) -> Dict[str, BaseRetriever]:
+    """The legislation engine's retriever with and without hybrid retrieval."""
+    settings = get_settings()
+    filters = default_retrieval_filters()
+    return {
+        "vector": index.as_retriever(similarity_top_k=VECTOR_TOP_K, filters=filters),
+        "hybrid": HybridRetriever(
+            index=index,
+            vector_retriever=index.as_retriever(similarity_top_k=settings.HYBRID_VECTOR_TOP_K, filters=filters),
+            lexical_index=lexical_index,
+            filters=filters,
+            lexical_top_k=settings.HYBRID_LEXICAL_TOP_K,
+            top_k=settings.HYBRID_RERANK_CANDIDATES,
+            rrf_k=settings.HYBRID_RRF_K,
+        ),
+    }
+
+def create_stub_pipeline() -> Tuple[VectorStoreIndex, BM25Index, BaseNodePostprocessor]:
+    """The bundled legislation with hash embeddings, and a reranker that keeps the retriever's order."""
+    nodes = create_nodes(load_bundled_legislation())
+    index = build_index(nodes, HashEmbedding(), backend="numpy")
+    return index, BM25Index.from_nodes(nodes), StubRerank(top_n=RERANK_TOP_N)
+
+def create_live_pipeline() -> Tuple[VectorStoreIndex, BM25Index, BaseNodePostprocessor]:
+    """The configured embeddings, vector store, BM25 index and Voyage reranker."""
+    from app.core.embeddings import configure_embeddings
+    from app.core.rerank import create_reranker
+    from app.core.vector_store import get_vector_store
+
+    lexical_index = BM25Index.load(get_lexical_index_path())
+    if lexical_index is None:
+        sys.exit("No BM25 index found; run create-vector-index first")
+    index = VectorStoreIndex.from_vector_store(get_vector_store(), embed_model=configure_embeddings())
+    return index, lexical_index, create_reranker()
+
+def chunk_ids(nodes: List[NodeWithScore]) -> List[str]:
+    return [node.node.metadata.get("chunk_id") or node.node.node_id for node in nodes]
+
+def recall(found: List[List[str]], relevant: List[List[str]]) -> float:
+    """Mean share of each query's relevant fragments that was found, capped at the number found."""
+    shares = [
+        len(set(ids) & set(truth)) / min(len(truth), len(ids))
+        for ids, truth in zip(found, relevant)
+        if truth and ids
+    ]
+    return round(float(np.mean(shares)), 4) if shares else 0.0
+
+async def measure(
+    retriever: BaseRetriever,
+    reranker: BaseNodePostprocessor,
+    queries: List[Tuple[str, List[str]]],
+) -> Tuple[Dict[str, Any], List[List[str]]]:
+    """Recall of the candidates handed to the reranker and of the nodes it keeps, with the kept chunk_ids."""
+    candidates, reranked = [], []
+    for query, _ in queries:
+        bundle = QueryBundle(query)
+        nodes = await retriever.aretrieve(bundle)
+        candidates.append(chunk_ids(nodes))
+        reranked.append(chunk_ids(await reranker.apostprocess_nodes(nodes, query_bundle=bundle)))
+    relevant = [truth for _, truth in queries]
+    return {
+        "candidates": round(float(np.mean([len(ids) for ids in candidates])), 2),
+        "candidate_recall": recall(candidates, relevant),
+        f"recall@{RERANK_TOP_N}": recall(reranked, relevant),
+        "recall@1": recall([ids[:1] for ids in reranked], relevant),
+    }, reranked
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    rng = np.random.default_rng(args.seed)
+    queries = file_queries(args.queries_file) if args.queries_file else heading_queries(args.queries, rng)
+    index, lexical_index, reranker = create_live_pipeline() if args.providers == "live" else create_stub_pipeline()
+    print(f"Running {len(queries)} queries against {args.providers} providers", file=sys.stderr)
+
+    results, kept = {}, {}
+    for name, retriever in create_retrievers(index, lexical_index).items():
+        results[name], kept[name] = await measure(retriever, reranker, queries)
+
+    # How much of the final top k hybrid retrieval changes
+    vector, hybrid = kept["vector"], kept["hybrid"]
+    overlaps = [len(set(a) & set(b)) / max(len(a), len(b)) for a, b in zip(vector, hybrid) if a or b]
+    results["top_k_overlap"] = round(float(np.mean(overlaps)), 4) if overlaps else 1.0
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare vector-only retrieval with hybrid BM25 and vector retrieval on recall.")
+    parser.add_argument("--providers", choices=("stub", "live"), default="stub", help="live uses the configured Voyage models, vector store and BM25 index")
+    parser.add_argument("--queries", type=int, default=200, help="Section heading queries drawn from the bundled legislation")
+    parser.add_argument("--queries-file", help="JSON lines of {\"query\": ..., \"relevant\": [chunk_id, ...]} to use instead")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report to this file as well as stdout")
+    args = parser.parse_args()
+
+    settings = get_settings()
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            **{key: value for key, value in vars(args).items() if key != "output"},
+            "vector_top_k": VECTOR_TOP_K,
+            "hybrid_vector_top_k": settings.HYBRID_VECTOR_TOP_K,
+            "hybrid_lexical_top_k": settings.HYBRID_LEXICAL_TOP_K,
+            "hybrid_candidates": settings.HYBRID_RERANK_CANDIDATES,
+            "rrf_k": settings.HYBRID_RRF_K,
+        },
+        "retrieval": asyncio.run(run(args)),
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+if __name__ == "__main__":
+    main()
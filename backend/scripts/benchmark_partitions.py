@@ -0,0 +1,142 @@
+import argparse
+import asyncio
+import json
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from llama_index.core.schema import TextNode
+from llama_index.core.vector_stores.types import BasePydanticVectorStore, FilterOperator, MetadataFilter, MetadataFilters, VectorStoreQuery
+
+from scripts.load_test import git_commit, percentiles
+from scripts.stubs import load_bundled_legislation
+
+from app.core.numpy_vector_store import NumpyVectorStore
+from app.core.partitioned_vector_store import PARTITIONS, PartitionedVectorStore, partition_collection_name
+from app.core.vector_store import open_vector_store
+
+BENCHMARK_COLLECTION = "benchmark_partitions"
+
+# The filters and top k of the query engines
+FILTERS = {
+    "documents": (MetadataFilter(key="fragment_type", value="Act", operator=FilterOperator.EQ), 20),
+    "legislation": (MetadataFilter(key="fragment_type", value="Subsection", operator=FilterOperator.NE), 20),
+}
+
+def build_nodes(rows: int, noise: float, rng: np.random.Generator) -> List[TextNode]:
+    """The bundled fragments, padded to rows with noisy copies that keep the fragment type mix."""
+    fragments = [fragment for _, fragments in load_bundled_legislation() for fragment in fragments]
+    nodes = []
+    for i in range(max(rows, len(fragments))):
+        fragment = fragments[i % len(fragments)]
+        embedding = np.asarray(fragment["embedding"], dtype=np.float32)
+        if i >= len(fragments):
+            embedding = embedding + rng.normal(0.0, noise, embedding.shape[0]).astype(np.float32)
+        nodes.append(TextNode(
+            id_=f"{fragment['chunk_id']}#{i // len(fragments)}",
+            text=fragment["text"][:200],
+            embedding=embedding.tolist(),
+            metadata={"fragment_type": fragment["fragment_type"], "act_name": fragment["act_name"]},
+        ))
+    return nodes
+
+def create_stores(backend: str) -> Tuple[BasePydanticVectorStore, PartitionedVectorStore]:
+    """A single filtered store and a partitioned one on the same backend, both empty."""
+    if backend == "numpy":
+        # Built in memory; nothing is written under VECTOR_STORE_PATH
+        single = NumpyVectorStore()
+        partitions = {partition: NumpyVectorStore() for partition in PARTITIONS}
+    else:
+        single = open_vector_store(BENCHMARK_COLLECTION, backend)
+        partitions = {
+            partition: open_vector_store(partition_collection_name(BENCHMARK_COLLECTION, partition), backend)
+            for partition in PARTITIONS
+        }
+    partitioned = PartitionedVectorStore(partitions=partitions)
+    for store in (single, partitioned):
+        try:
+            store.clear()
+        except Exception:
+            # Ignore error if store is already empty
+            pass
+    return single, partitioned
+
+def add_nodes(store: BasePydanticVectorStore, nodes: List[TextNode], batch_size: int = 1024) -> None:
+    for start in range(0, len(nodes), batch_size):
+        store.add(nodes[start:start + batch_size])
+
+async def measure(store: BasePydanticVectorStore, queries: List[VectorStoreQuery]) -> Tuple[List[float], List[List[str]]]:
+    """Latency in milliseconds and result ids of each query, run one at a time."""
+    latencies, ids = [], []
+    for query in queries:
+        start = time.perf_counter()
+        result = await store.aquery(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+        ids.append(result.ids or [])
+    return latencies, ids
+
+def recall(ids: List[List[str]], exact: List[List[str]]) -> float:
+    """Mean share of the exact top k that was returned."""
+    shares = [len(set(found) & set(truth)) / len(truth) for found, truth in zip(ids, exact) if truth]
+    return float(np.mean(shares)) if shares else 1.0
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    rng = np.random.default_rng(args.seed)
+    nodes = build_nodes(args.rows, args.noise, rng)
+    print(f"Indexing {len(nodes)} vectors on {args.backend}", file=sys.stderr)
+
+    # Exact search is the ground truth for recall
+    exact_store = NumpyVectorStore()
+    add_nodes(exact_store, nodes)
+    single, partitioned = create_stores(args.backend)
+    add_nodes(single, nodes)
+    add_nodes(partitioned, nodes)
+
+    picks = rng.choice(len(nodes), size=args.queries)
+    vectors = [
+        (np.asarray(nodes[i].embedding) + rng.normal(0.0, args.noise, len(nodes[i].embedding))).tolist()
+        for i in picks
+    ]
+
+    results = {}
+    for name, (type_filter, top_k) in FILTERS.items():
+        queries = [
+            VectorStoreQuery(query_embedding=vector, similarity_top_k=top_k, filters=MetadataFilters(filters=[type_filter]))
+            for vector in vectors
+        ]
+        _, exact = await measure(exact_store, queries)
+        results[name] = {"filter": f"fragment_type {type_filter.operator.value} {type_filter.value}", "top_k": top_k}
+        for label, store in (("single", single), ("partitioned", partitioned)):
+            # Warm up, then measure
+            await measure(store, queries[: args.warmup])
+            latencies, ids = await measure(store, queries)
+            results[name][label] = {"latency_ms": percentiles(latencies), "recall": round(recall(ids, exact), 4)}
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare a single filtered vector index with one partitioned by fragment type.")
+    parser.add_argument("--backend", choices=("numpy", "chroma"), default="numpy", help="chroma needs a server at CHROMA_HOST:CHROMA_PORT")
+    parser.add_argument("--rows", type=int, default=50_000, help="Vectors to index, padding the bundled fragments with noisy copies")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--noise", type=float, default=0.02, help="Standard deviation of the noise added to copies and queries")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report to this file as well as stdout")
+    args = parser.parse_args()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "filters": asyncio.run(run(args)),
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import argparse
+import asyncio
+import glob
+import gzip
+import json
+import os
+import random
+import time
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app.api.responses import typed_response
+from app.api.tools import RetrievalResponse, RetrievedFragment
+from app.db.projections import FragmentView, HEAVY_FRAGMENT_FIELDS
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "legislation")
+
+def load_fragments(fields: List[str]) -> List[FragmentView]:
+    """Load the bundled legislation fragments as FragmentViews."""
+    fragments = []
+    for path in glob.glob(os.path.join(DATA_DIR, "**", "*.json"), recursive=True):
+        with open(path) as f:
+            data = json.load(f)
+        for fragment_type, items in data.items():
+            for item in items:
+                raw = {
+                    "_id": item.get("_id", "0" * 24),
+                    "chunk_id": item["chunk_id"],
+                    "order": int(item["order"]),
+                    "fragment_type": fragment_type,
+                    "token_count": len(item.get("text", "").split()),
+                    **{k: v for k, v in item.get("context", {}).items() if k in FragmentView.model_fields},
+                }
+                for name in fields:
+                    if name in item:
+                        raw[name] = item[name]
+                fragments.append(FragmentView.model_validate(raw))
+    return fragments
+
+def build_responses(fragments: List[FragmentView], count: int, top_k: int) -> List[RetrievalResponse]:
+    """Build retrieval responses the way /retrieve does."""
+    rng = random.Random(0)
+    responses = []
+    for i in range(count):
+        results = [
+            RetrievedFragment(fragment=fragment, score=rng.random())
+            for fragment in rng.sample(fragments, min(top_k, len(fragments)))
+        ]
+        responses.append(RetrievalResponse(
+            results=results,
+            metadata={"filters": {"fragment_type": "not Subsection"}, "query": f"query {i}", "top_k": top_k},
+        ))
+    return responses
+
+async def encode_before(field, response: RetrievalResponse) -> bytes:
+    """response_model validation, jsonable_encoder and the stdlib JSONResponse."""
+    content = await serialize_response(field=field, response_content=response, exclude_unset=True, is_coroutine=True)
+    return JSONResponse(content).body
+
+def encode_after(response: RetrievalResponse) -> bytes:
+    """Direct serialisation of the already-validated model."""
+    return typed_response(response).body
+
+def report(label: str, bodies: List[bytes], seconds: float) -> None:
+    n = len(bodies)
+    raw = sum(len(b) for b in bodies) / n
+    print(f"{label:<8} {seconds / n * 1e6:10.1f} us/response {raw:12.0f} bytes/response")
+
+def report_compression(bodies: List[bytes]) -> None:
+    n = len(bodies)
+    start = time.perf_counter()
+    gzipped = [gzip.compress(b, compresslevel=6) for b in bodies]
+    gzip_time = time.perf_counter() - start
+    print(f"{'gzip':<8} {gzip_time / n * 1e6:10.1f} us/response {sum(map(len, gzipped)) / n:12.0f} bytes/response")
+    if brotli is not None:
+        start = time.perf_counter()
+        compressed = [brotli.compress(b, quality=5) for b in bodies]
+        brotli_time = time.perf_counter() - start
+        print(f"{'br':<8} {brotli_time / n * 1e6:10.1f} us/response {sum(map(len, compressed)) / n:12.0f} bytes/response")
+    else:
+        print("br       (brotli not installed)")
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark encoding of /api/tools/retrieve responses")
+    parser.add_argument("--responses", type=int, default=500, help="Number of responses to encode")
+    parser.add_argument("--top-k", type=int, default=20, help="Fragments per response")
+    parser.add_argument("--fields", default="text", help="Heavy fields to include, comma separated")
+    args = parser.parse_args()
+
+    fields = [name for name in args.fields.split(",") if name in HEAVY_FRAGMENT_FIELDS]
+    fragments = load_fragments(fields)
+    responses = build_responses(fragments, args.responses, args.top_k)
+    print(f"{len(fragments)} fragments, {len(responses)} responses of {args.top_k}, fields={fields}")
+
+    field = create_model_field(name="Response_retrieve", type_=RetrievalResponse, mode="serialization")
+
+    start = time.perf_counter()
+    before = [await encode_before(field, response) for response in responses]
+    report("before", before, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    after = [encode_after(response) for response in responses]
+    report("after", after, time.perf_counter() - start)
+
+    assert all(json.loads(a) == json.loads(b) for a, b in zip(before, after)), "Encodings differ"
+    report_compression(after)
+
+if __name__ == "__main__":
+    asyncio.run(main())
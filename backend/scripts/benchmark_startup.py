@@ -0,0 +1,111 @@
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+IMPORT_SNIPPET = "import time; start = time.perf_counter(); import app.main; print(time.perf_counter() - start)"
+
+def measure_import(runs: int) -> list[float]:
+    """Time `import app.main` in fresh interpreters."""
+    times = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET],
+            cwd=BACKEND_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        times.append(float(output.stdout.strip().splitlines()[-1]))
+    return times
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def get(url: str) -> int:
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+def measure_first_request(timeout: float, path: str) -> dict:
+    """Start a uvicorn worker and time how long it takes to become ready and serve a request."""
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        ready = None
+        while time.perf_counter() - start < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"Server exited with code {server.returncode} during startup")
+            try:
+                if get(f"{base}/ready") == 200:
+                    ready = time.perf_counter() - start
+                    break
+            except (urllib.error.URLError, ConnectionError, OSError):
+                pass
+            time.sleep(0.05)
+        if ready is None:
+            raise RuntimeError(f"Server was not ready after {timeout}s")
+
+        status = get(f"{base}{path}")
+        first_request = time.perf_counter() - start
+        return {"ready_seconds": ready, "first_request_seconds": first_request, "first_request_status": status}
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark worker import time and time to first served request")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to time the import in")
+    parser.add_argument("--skip-server", action="store_true", help="Only measure import time")
+    parser.add_argument("--path", default="/health", help="Path of the first request")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds to wait for the worker to become ready")
+    parser.add_argument("--max-import-seconds", type=float, help="Fail if the median import time is above this")
+    parser.add_argument("--max-ready-seconds", type=float, help="Fail if the worker takes longer than this to serve")
+    args = parser.parse_args()
+
+    imports = measure_import(args.runs)
+    report = {
+        "import_seconds": {
+            "median": statistics.median(imports),
+            "min": min(imports),
+            "max": max(imports),
+            "runs": imports,
+        }
+    }
+    if not args.skip_server:
+        report["server"] = measure_first_request(args.timeout, args.path)
+    print(json.dumps(report, indent=2))
+
+    failures = []
+    if args.max_import_seconds is not None and report["import_seconds"]["median"] > args.max_import_seconds:
+        failures.append(f"median import time {report['import_seconds']['median']:.2f}s > {args.max_import_seconds}s")
+    if args.max_ready_seconds is not None and "server" in report and report["server"]["first_request_seconds"] > args.max_ready_seconds:
+        failures.append(f"first request after {report['server']['first_request_seconds']:.2f}s > {args.max_ready_seconds}s")
+    if failures:
+        print("Startup regression: " + "; ".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
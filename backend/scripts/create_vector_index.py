@@ -3,7 +3,6 @@ import logging
 from app.db.mongodb import init_mongodb
 from app.db.models import LegislationFragment
 from app.core.index import create_nodes_from_fragments, create_legislation_index
-from app.core.vector_store import get_chroma_client
 
 # Set up logging
 logging.basicConfig(
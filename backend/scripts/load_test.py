@@ -0,0 +1,394 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# The stand-ins replace every external service, so placeholder keys are enough
+for name in ("ANTHROPIC_API_KEY", "VOYAGE_API_KEY"):
+    os.environ.setdefault(name, "load-test")
+os.environ.setdefault("TRACING_EXPORTER", "none")
+
+import httpx
+import uvicorn
+from beanie import init_beanie
+from llama_index.core import Settings
+from motor.motor_asyncio import AsyncIOMotorClient
+
+import app.main as app_main
+from app.core.bm25 import BM25Index
+from app.core.citations import CitationIndex
+from app.core.config import get_settings
+from app.core.query_engines import DocumentQueryEngine, LegislationQueryEngine
+from app.core.react_agent import REACT, LegislationReActAgent
+from app.core.registry import EngineRegistry, create_response_cache, create_semantic_cache
+from app.core.memory import create_session_store
+from app.db.models import ChatSession, LegislationDocument, LegislationFragment
+from scripts.stubs import build_index, create_nodes, create_stub_models, load_bundled_legislation, seed_mongodb
+
+SCENARIOS = ("retrieve", "query", "chat", "legislation")
+
+LOAD_TEST_DB = "load_test"
+
+def parse_server_timing(header: Optional[str]) -> Dict[str, float]:
+    """Parse a Server-Timing header into stage durations in milliseconds."""
+    stages = {}
+    for metric in (header or "").split(","):
+        name, *params = [part.strip() for part in metric.split(";")]
+        for param in params:
+            if param.startswith("dur="):
+                stages[name] = float(param[4:])
+    return stages
+
+def parse_chat_timing(body: str) -> Dict[str, float]:
+    """Read the serverTiming data part sent at the end of a chat stream."""
+    for line in reversed(body.splitlines()):
+        if line.startswith("2:") and "serverTiming" in line:
+            return json.loads(line[2:])[0]["serverTiming"]
+    return {}
+
+def without_projected_token_count(projection_fn):
+    """Wrap a projection builder so it leaves out token_count.
+
+    mongomock has no $regexFindAll, which token_count is computed with.
+    """
+    def projection(*args, **kwargs):
+        projection = projection_fn(*args, **kwargs)
+        projection.pop("token_count", None)
+        return projection
+    return projection
+
+class StubbedApp:
+    """Runs app.main:app under uvicorn in a thread, against local stand-ins for every external service."""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.documents = load_bundled_legislation()
+        self.fragment_ids: List[str] = []
+        self.port = free_port()
+        self.server: Optional[uvicorn.Server] = None
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def init_mongodb(self):
+        """Replaces init_mongodb: connect to a scratch database and seed it."""
+        if self.args.mongo_url:
+            client = AsyncIOMotorClient(self.args.mongo_url)
+            await client.drop_database(LOAD_TEST_DB)
+        else:
+            try:
+                from mongomock_motor import AsyncMongoMockClient
+            except ImportError:
+                raise SystemExit("The in-memory MongoDB needs mongomock-motor; install it or pass --mongo-url")
+            import app.db.hierarchy as hierarchy
+            import app.db.projections as projections
+            projections.fragment_projection = without_projected_token_count(projections.fragment_projection)
+            hierarchy._node_projection = without_projected_token_count(hierarchy._node_projection)
+            client = AsyncMongoMockClient()
+
+        await init_beanie(
+            database=client[LOAD_TEST_DB],
+            document_models=[LegislationDocument, LegislationFragment, ChatSession],
+        )
+        await seed_mongodb(self.documents)
+        cursor = LegislationFragment.get_motor_collection().find(
+            {"fragment_type": {"$in": ["Section", "Part"]}}, {"_id": 1}
+        ).limit(50)
+        self.fragment_ids = [str(document["_id"]) async for document in cursor]
+        return client
+
+    async def close_mongodb_connection(self, client) -> None:
+        if self.args.mongo_url:
+            await client.drop_database(LOAD_TEST_DB)
+        client.close()
+
+    def create_registry(self) -> EngineRegistry:
+        """Replaces EngineRegistry.create: the same engines, built on the stand-ins."""
+        settings = get_settings()
+        embed_model, reranker, llm = create_stub_models(
+            embed_latency=self.args.embed_latency_ms / 1000,
+            rerank_latency=self.args.rerank_latency_ms / 1000,
+            llm_latency=self.args.llm_latency_ms / 1000,
+            token_delay=self.args.token_delay_ms / 1000,
+        )
+        Settings.embed_model = embed_model
+        Settings.llm = llm
+        nodes = create_nodes(self.documents)
+        index = build_index(
+            nodes,
+            embed_model,
+            vector_latency=self.args.vector_latency_ms / 1000,
+            backend=self.args.vector_store,
+            partitioned=self.args.partitioned,
+        )
+        lexical_index = BM25Index.from_nodes(nodes) if self.args.hybrid else None
+        citation_index = CitationIndex.from_nodes(nodes) if self.args.citations else None
+        legislation_engine = LegislationQueryEngine(index, reranker, create_semantic_cache(), lexical_index, citation_index)
+        document_engine = DocumentQueryEngine(index, reranker, create_semantic_cache(), lexical_index, citation_index)
+        return EngineRegistry(
+            embed_model=embed_model,
+            llm=llm,
+            index=index,
+            legislation_engine=legislation_engine,
+            document_engine=document_engine,
+            agent=LegislationReActAgent(
+                llm=llm,
+                legislation_engine=legislation_engine,
+                document_engine=document_engine,
+                mode=REACT,
+                prefetch=settings.CHAT_PREFETCH_ENABLED,
+                prefetch_threshold=settings.CHAT_PREFETCH_SIMILARITY,
+            ),
+            response_cache=create_response_cache(),
+            sessions=create_session_store(llm),
+            citation_index=citation_index,
+        )
+
+    def start(self) -> None:
+        app_main.init_mongodb = self.init_mongodb
+        app_main.close_mongodb_connection = self.close_mongodb_connection
+        app_main.EngineRegistry.create = self.create_registry
+
+        config = uvicorn.Config(app_main.app, host="127.0.0.1", port=self.port, log_level="warning", access_log=False)
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+        self.thread.start()
+
+    def wait_until_ready(self, timeout: float) -> None:
+        start = time.perf_counter()
+        while time.perf_counter() - start < timeout:
+            if not self.thread.is_alive():
+                raise RuntimeError("Server exited during startup")
+            try:
+                if httpx.get(f"{self.base_url}/ready").status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            time.sleep(0.05)
+        raise RuntimeError(f"Server was not ready after {timeout}s")
+
+    def stop(self) -> None:
+        if self.server is not None:
+            self.server.should_exit = True
+            self.thread.join(timeout=30)
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def query_pool(app: StubbedApp, size: int, seed: int) -> List[str]:
+    """Questions built from section headings in the bundled legislation."""
+    names = sorted({
+        fragment["section_name"]
+        for _, fragments in app.documents
+        for fragment in fragments
+        if fragment["fragment_type"] == "Section" and fragment["section_name"]
+    })
+    rng = random.Random(seed)
+    return [f"What does the law say about {name.lower()}?" for name in rng.sample(names, min(size, len(names)))]
+
+def make_request(scenario: str, i: int, queries: List[str], app: StubbedApp, unique: bool) -> Tuple[str, str, Optional[Dict[str, Any]]]:
+    """Method, path and JSON body of the i-th request of a scenario."""
+    query = queries[i % len(queries)]
+    if unique:
+        # A new query every time defeats the response, embedding and rerank caches
+        query = f"{query} ({i})"
+    if scenario == "retrieve":
+        return "POST", "/api/tools/retrieve", {"query": query, "top_k": 5}
+    if scenario == "query":
+        return "POST", "/api/tools/query", {"query": query}
+    if scenario == "chat":
+        return "POST", "/api/chat", {"conversation_id": uuid.uuid4().hex, "message": query}
+
+    document_id = app.documents[i % len(app.documents)][0]["id"]
+    paths = [
+        "/api/legislation?limit=20",
+        f"/api/legislation/{document_id}?limit=50",
+        f"/api/legislation/{document_id}/toc",
+    ]
+    if app.fragment_ids:
+        paths.append(f"/api/legislation/fragment/{app.fragment_ids[i % len(app.fragment_ids)]}")
+    return "GET", paths[i % len(paths)], None
+
+async def run_scenario(
+    scenario: str,
+    app: StubbedApp,
+    queries: List[str],
+    requests: int,
+    concurrency: int,
+    warmup: int,
+    unique: bool,
+) -> Dict[str, Any]:
+    """Drive a scenario with a fixed number of concurrent clients and summarise the results."""
+    latencies: List[float] = []
+    stages: Dict[str, List[float]] = {}
+    statuses: Dict[str, int] = {}
+    counter = iter(range(warmup + requests))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=app.base_url, timeout=120, limits=limits) as client:
+        async def send(i: int) -> Tuple[float, int, Dict[str, float]]:
+            method, path, body = make_request(scenario, i, queries, app, unique)
+            start = time.perf_counter()
+            response = await client.request(method, path, json=body)
+            elapsed = (time.perf_counter() - start) * 1000
+            timing = parse_chat_timing(response.text) if scenario == "chat" else parse_server_timing(response.headers.get("server-timing"))
+            return elapsed, response.status_code, timing
+
+        # Warm the connections and the caches the scenario depends on
+        for i in range(warmup):
+            await send(next(counter))
+
+        async def worker() -> None:
+            for i in counter:
+                try:
+                    elapsed, status, timing = await send(i)
+                except httpx.HTTPError as e:
+                    statuses[type(e).__name__] = statuses.get(type(e).__name__, 0) + 1
+                    continue
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+                if status >= 400:
+                    continue
+                latencies.append(elapsed)
+                for stage, duration in timing.items():
+                    stages.setdefault(stage, []).append(duration)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        duration = time.perf_counter() - start
+
+    return summarize(latencies, stages, statuses, requests, duration)
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    array = np.asarray(values)
+    return {
+        "mean": round(float(array.mean()), 2),
+        "p50": round(float(np.percentile(array, 50)), 2),
+        "p95": round(float(np.percentile(array, 95)), 2),
+        "p99": round(float(np.percentile(array, 99)), 2),
+        "max": round(float(array.max()), 2),
+    }
+
+def summarize(latencies: List[float], stages: Dict[str, List[float]], statuses: Dict[str, int], requests: int, duration: float) -> Dict[str, Any]:
+    return {
+        "requests": requests,
+        "succeeded": len(latencies),
+        "errors": requests - len(latencies),
+        "status_codes": statuses,
+        "duration_seconds": round(duration, 3),
+        "requests_per_second": round(len(latencies) / duration, 2) if duration else 0.0,
+        "latency_ms": percentiles(latencies),
+        "stages_ms": {stage: percentiles(values) for stage, values in sorted(stages.items())},
+    }
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """Lines comparing throughput and tail latency with an earlier report."""
+    lines = [f"Compared with {baseline.get('commit') or 'baseline'}:"]
+    for scenario, result in report["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(scenario)
+        if not before:
+            continue
+        metrics = [("rps", before["requests_per_second"], result["requests_per_second"])]
+        metrics += [
+            (name, before["latency_ms"].get(name), result["latency_ms"].get(name))
+            for name in ("p50", "p95", "p99")
+        ]
+        changes = []
+        for name, old, new in metrics:
+            if old and new is not None:
+                changes.append(f"{name} {old:.1f} -> {new:.1f} ({(new - old) / old:+.1%})")
+        lines.append(f"  {scenario:<12} " + ", ".join(changes))
+    return lines
+
+async def run(args: argparse.Namespace, app: StubbedApp) -> Dict[str, Any]:
+    queries = query_pool(app, args.queries, args.seed)
+    results = {}
+    for scenario in args.scenarios:
+        print(f"Running {scenario}...", file=sys.stderr)
+        results[scenario] = await run_scenario(
+            scenario, app, queries, args.requests, args.concurrency, args.warmup, args.unique_queries
+        )
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the API against local stand-ins for Voyage, Anthropic, Chroma and MongoDB")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=10, help="Concurrent clients")
+    parser.add_argument("--warmup", type=int, default=10, help="Unmeasured requests sent before each scenario")
+    parser.add_argument("--queries", type=int, default=50, help="Distinct questions to cycle through")
+    parser.add_argument("--unique-queries", action="store_true", help="Make every query distinct so no cache is hit")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0, help="Simulated Voyage embedding latency")
+    parser.add_argument("--vector-store", choices=("chroma", "numpy"), default="chroma", help="Chroma stand-in or the in-process numpy store")
+    parser.add_argument("--partitioned", action="store_true", help="Split the vector store by fragment type")
+    parser.add_argument("--citations", action="store_true", help="Answer queries that only cite a provision from the citation index")
+    parser.add_argument("--hybrid", action="store_true", help="Fuse BM25 with vector retrieval in the query engines")
+    parser.add_argument("--vector-latency-ms", type=float, default=0.0, help="Simulated Chroma latency")
+    parser.add_argument("--rerank-latency-ms", type=float, default=0.0, help="Simulated Voyage rerank latency")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Simulated Anthropic latency per call")
+    parser.add_argument("--token-delay-ms", type=float, default=0.0, help="Simulated delay between streamed words")
+    parser.add_argument("--mongo-url", help="Seed a scratch database on this MongoDB instead of using the in-memory mongomock")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds to wait for the server to become ready")
+    parser.add_argument("--output", help="Write the JSON report to this file as well as stdout")
+    parser.add_argument("--baseline", help="Earlier JSON report to compare with")
+    args = parser.parse_args()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            key: value for key, value in vars(args).items()
+            if key not in ("output", "baseline", "mongo_url", "timeout")
+        } | {"mongo": "external" if args.mongo_url else "memory"},
+    }
+
+    # Per-request log lines from the client and the access log would drown the progress output
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("app.access").setLevel(logging.WARNING)
+
+    app = StubbedApp(args)
+    # The agent prints its reasoning; keep stdout for the report
+    with contextlib.redirect_stdout(sys.stderr):
+        app.start()
+        try:
+            app.wait_until_ready(args.timeout)
+            report["scenarios"] = asyncio.run(run(args, app))
+        finally:
+            app.stop()
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    if args.baseline:
+        with open(args.baseline) as f:
+            print("\n".join(compare(report, json.load(f))), file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
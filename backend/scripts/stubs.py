@@ -0,0 +1,262 @@
+import asyncio
+import glob
+import hashlib
+import json
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from llama_index.core import VectorStoreIndex
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.llms import CompletionResponse, CustomLLM, LLMMetadata
+from llama_index.core.llms.callbacks import llm_completion_callback
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import NodeWithScore, QueryBundle, TextNode
+from llama_index.core.storage import StorageContext
+from llama_index.core.vector_stores import SimpleVectorStore
+from llama_index.core.vector_stores.types import VectorStoreQuery, VectorStoreQueryResult
+
+from app.core.cache import EmbeddingCache, ResponseCache
+from app.core.embeddings import CachedEmbedding
+from app.core.metrics import VECTOR_QUERY, track_stage
+from app.core.numpy_vector_store import NumpyVectorStore
+from app.core.partitioned_vector_store import PARTITIONS, PartitionedVectorStore
+from app.core.rerank import CachedRerank
+from app.db.models import LegislationDocument, LegislationFragment
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "legislation")
+
+EMBED_DIM = 256
+
+# Fragment types the bundled data holds but the indexer does not store
+SKIPPED_FRAGMENT_TYPES = ("Notes", "LabelPara")
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+def hash_embedding(text: str, dim: int = EMBED_DIM) -> List[float]:
+    """Deterministic bag-of-words embedding: texts sharing words point in similar directions."""
+    vector = np.zeros(dim, dtype=np.float32)
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+        bucket = int.from_bytes(digest[:4], "little") % dim
+        vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+    norm = float(np.linalg.norm(vector))
+    if norm:
+        vector /= norm
+    return vector.tolist()
+
+async def simulate_latency(seconds: float) -> None:
+    if seconds > 0:
+        await asyncio.sleep(seconds)
+
+class HashEmbedding(BaseEmbedding):
+    """Stand-in for the Voyage embedding model."""
+    latency: float = 0.0
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "HashEmbedding"
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return hash_embedding(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        await simulate_latency(self.latency)
+        return hash_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return hash_embedding(text)
+
+class StubRerank(BaseNodePostprocessor):
+    """Stand-in for the Voyage reranker that keeps the top_n nodes by vector score."""
+    top_n: int = 10
+    latency: float = 0.0
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "StubRerank"
+
+    def _postprocess_nodes(self, nodes: List[NodeWithScore], query_bundle: Optional[QueryBundle] = None) -> List[NodeWithScore]:
+        return sorted(nodes, key=lambda node: node.score or 0.0, reverse=True)[: self.top_n]
+
+    async def _apostprocess_nodes(self, nodes: List[NodeWithScore], query_bundle: Optional[QueryBundle] = None) -> List[NodeWithScore]:
+        await simulate_latency(self.latency)
+        return self._postprocess_nodes(nodes, query_bundle)
+
+class TimedVectorStore(SimpleVectorStore):
+    """In-process stand-in for Chroma that reports its queries as the vector_query stage."""
+    latency: float = 0.0
+
+    async def aquery(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        with track_stage(VECTOR_QUERY):
+            await simulate_latency(self.latency)
+            return self.query(query, **kwargs)
+
+SYNTHESIS_ANSWER = "The most relevant fragments are listed below.\n\n1. [Section]\n   Matches the query."
+
+class ScriptedLLM(CustomLLM):
+    """Stand-in for Anthropic that replays a fixed ReAct exchange.
+
+    The first agent step searches legislation for the user's message, the
+    second answers, and query engine synthesis returns a short summary.
+    """
+    latency: float = 0.0
+    # Delay between streamed words, as if tokens were arriving from the API
+    token_delay: float = 0.0
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(is_chat_model=False, model_name="scripted")
+
+    def reply(self, prompt: str) -> str:
+        if "Legislative Navigator" in prompt or "Document Navigator" in prompt:
+            return SYNTHESIS_ANSWER
+        if SYNTHESIS_ANSWER in prompt:
+            # The tool has answered
+            return "Thought: I can answer without using any more tools.\nAnswer: The retrieved sections answer the question."
+        # The message is the last user turn in the prompt
+        question = prompt.rsplit("user: ", 1)[-1].split("\n", 1)[0].strip() or "legislation"
+        return f"Thought: I need to search.\nAction: query_legislation_fragments\nAction Input: {json.dumps({'query': question})}"
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        time.sleep(self.latency)
+        return CompletionResponse(text=self.reply(prompt))
+
+    @llm_completion_callback()
+    async def acomplete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        await simulate_latency(self.latency)
+        return CompletionResponse(text=self.reply(prompt))
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any):
+        time.sleep(self.latency)
+        text = ""
+        for word in self.reply(prompt).split(" "):
+            time.sleep(self.token_delay)
+            text += word + " "
+            yield CompletionResponse(text=text, delta=word + " ")
+
+    @llm_completion_callback()
+    async def astream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any):
+        await simulate_latency(self.latency)
+        words = self.reply(prompt).split(" ")
+
+        async def gen():
+            text = ""
+            for word in words:
+                await simulate_latency(self.token_delay)
+                text += word + " "
+                yield CompletionResponse(text=text, delta=word + " ")
+
+        return gen()
+
+def parse_document_header(text: str) -> Dict[str, Optional[str]]:
+    """Read the "Key: value" header of an Act fragment."""
+    header = {}
+    for line in text.splitlines():
+        key, sep, value = line.partition(": ")
+        if not sep:
+            break
+        header[key.strip()] = None if value.strip() == "None" else value.strip()
+    return header
+
+def load_bundled_legislation() -> List[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+    """Read the bundled legislation JSON as (document fields, fragment fields) pairs."""
+    documents = []
+    for path in sorted(glob.glob(os.path.join(DATA_DIR, "**", "*.json"), recursive=True)):
+        with open(path) as f:
+            data = json.load(f)
+        header = parse_document_header(data["Act"][0]["text"])
+        document = {
+            "id": header["Id"],
+            "title": header["Title"],
+            "year": header["Year"],
+            "type": header["Type"],
+            "no": header["No"],
+            "date_assent": header.get("Date Assent") or "",
+            "date_as_at": header.get("Date As At") or "",
+            "administered_by": header.get("Administered By"),
+        }
+        fragments = [
+            {
+                "chunk_id": item["chunk_id"],
+                "order": int(item["order"]),
+                "fragment_type": fragment_type,
+                "text": item["text"],
+                "embedding": hash_embedding(item["text"]),
+                **item["context"],
+            }
+            for fragment_type, items in data.items()
+            if fragment_type not in SKIPPED_FRAGMENT_TYPES
+            for item in items
+        ]
+        documents.append((document, fragments))
+    return documents
+
+async def seed_mongodb(documents: List[Tuple[Dict[str, Any], List[Dict[str, Any]]]]) -> None:
+    """Insert the documents and fragments through the initialised Beanie models."""
+    for fields, fragments in documents:
+        document = LegislationDocument(**fields)
+        await document.insert()
+        await LegislationFragment.insert_many([
+            LegislationFragment(document=document, **fragment) for fragment in fragments
+        ])
+
+def create_nodes(documents: List[Tuple[Dict[str, Any], List[Dict[str, Any]]]]) -> List[TextNode]:
+    """Nodes for the fragments, with the metadata the retrievers, filters and citation index use."""
+    return [
+        TextNode(
+            id_=fragment["chunk_id"],
+            text=fragment["text"],
+            embedding=fragment["embedding"],
+            metadata={
+                "chunk_id": fragment["chunk_id"],
+                "fragment_type": fragment["fragment_type"],
+                "act_name": fragment["act_name"],
+                "act_year": fragment["act_year"],
+                "part_label": fragment["part_label"],
+                "subpart_label": fragment["subpart_label"],
+                "section_label": fragment["section_label"],
+                "schedule_label": fragment["schedule_label"],
+                "paragraph_label": " ".join(fragment["paragraph_label"]),
+            },
+        )
+        for _, fragments in documents
+        for fragment in fragments
+    ]
+
+def build_index(
+    nodes: List[TextNode],
+    embed_model: BaseEmbedding,
+    vector_latency: float = 0.0,
+    backend: str = "chroma",
+    partitioned: bool = False,
+) -> VectorStoreIndex:
+    """Index the nodes in process, as create_vector_index does.
+
+    The "chroma" backend is stood in for by TimedVectorStore; "numpy" uses
+    the app's own NumpyVectorStore. partitioned splits either into one store
+    per fragment type partition, as VECTOR_STORE_PARTITIONED does.
+    """
+    def create_store():
+        return NumpyVectorStore() if backend == "numpy" else TimedVectorStore(latency=vector_latency)
+
+    if partitioned:
+        vector_store = PartitionedVectorStore(partitions={partition: create_store() for partition in PARTITIONS})
+    else:
+        vector_store = create_store()
+    return VectorStoreIndex(
+        nodes=nodes,
+        storage_context=StorageContext.from_defaults(vector_store=vector_store),
+        embed_model=embed_model,
+    )
+
+def create_stub_models(embed_latency: float = 0.0, rerank_latency: float = 0.0, llm_latency: float = 0.0, token_delay: float = 0.0):
+    """Embedding model, reranker and LLM stand-ins, wrapped in the same caches the app uses."""
+    embed_model = CachedEmbedding(HashEmbedding(latency=embed_latency), EmbeddingCache(max_entries=10_000))
+    reranker = CachedRerank(StubRerank(latency=rerank_latency), ResponseCache(max_entries=10_000))
+    llm = ScriptedLLM(latency=llm_latency, token_delay=token_delay)
+    return embed_model, reranker, llm
@@ -0,0 +1,100 @@
+import asyncio
+import time
+from typing import Any, List, Optional
+
+import pytest
+from llama_index.core import Settings, VectorStoreIndex
+from llama_index.core.base.response.schema import Response
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.llms import MockLLM
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle, TextNode
+
+from app.core import query_engines
+from app.core.query_engines import LegislationQueryEngine
+
+# Simulated latency of each stage
+LATENCY = 0.2
+CONCURRENT_QUERIES = 5
+
+
+class SleepingRetriever(BaseRetriever):
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        time.sleep(LATENCY)
+        return self._nodes(query_bundle)
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        await asyncio.sleep(LATENCY)
+        return self._nodes(query_bundle)
+
+    def _nodes(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        node = TextNode(
+            text=query_bundle.query_str, metadata={"chunk_id": query_bundle.query_str}
+        )
+        return [NodeWithScore(node=node, score=1.0)]
+
+
+class SleepingReranker(BaseNodePostprocessor):
+    @classmethod
+    def class_name(cls) -> str:
+        return "SleepingReranker"
+
+    def _postprocess_nodes(
+        self, nodes: List[NodeWithScore], query_bundle: Optional[QueryBundle] = None
+    ) -> List[NodeWithScore]:
+        time.sleep(LATENCY)
+        return nodes
+
+    async def _apostprocess_nodes(
+        self, nodes: List[NodeWithScore], query_bundle: Optional[QueryBundle] = None
+    ) -> List[NodeWithScore]:
+        await asyncio.sleep(LATENCY)
+        return nodes
+
+
+class SleepingSynthesizer:
+    def synthesize(
+        self, query_bundle: QueryBundle, nodes: List[NodeWithScore]
+    ) -> Response:
+        time.sleep(LATENCY)
+        return Response(response=query_bundle.query_str, source_nodes=nodes)
+
+    async def asynthesize(
+        self, query_bundle: QueryBundle, nodes: List[NodeWithScore]
+    ) -> Response:
+        await asyncio.sleep(LATENCY)
+        return Response(response=query_bundle.query_str, source_nodes=nodes)
+
+
+async def no_fragments(chunk_ids: List[str], *args: Any) -> dict:
+    return {}
+
+
+@pytest.fixture
+def engine(monkeypatch) -> LegislationQueryEngine:
+    monkeypatch.setattr(Settings, "_llm", MockLLM())
+    monkeypatch.setattr(query_engines, "find_fragment_views_by_chunk_id", no_fragments)
+    index = VectorStoreIndex(nodes=[], embed_model=MockEmbedding(embed_dim=8))
+    engine = LegislationQueryEngine(index=index, reranker=SleepingReranker())
+    engine.retriever = SleepingRetriever()
+    engine.query_engine = SleepingSynthesizer()
+    return engine
+
+
+def test_concurrent_queries_overlap(engine: LegislationQueryEngine):
+    async def run() -> float:
+        start = time.perf_counter()
+        responses = await asyncio.gather(
+            *(engine.query(f"query {i}") for i in range(CONCURRENT_QUERIES))
+        )
+        elapsed = time.perf_counter() - start
+        assert [response.answer for response in responses] == [
+            f"query {i}" for i in range(CONCURRENT_QUERIES)
+        ]
+        return elapsed
+
+    elapsed = asyncio.run(run())
+    # Retrieve, rerank and synthesize take three latencies per query; run
+    # one after another the queries would take CONCURRENT_QUERIES times that
+    assert elapsed < 3 * LATENCY * 2
@@ -26,7 +26,7 @@ export default function LegislationDocumentPage({
 
   // Fetch document and root fragments on mount
   React.useEffect(() => {
-    fetch(`/api/legislation/${id}`)
+    fetch(`/api/legislation/${id}?fields=text,summary_long`)
       .then((res) => res.json())
       .then((data) => {
         setDocument(data.document)
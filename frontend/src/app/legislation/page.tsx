@@ -21,18 +21,32 @@ interface LegislationDocument {
   no: string
 }
 
+interface LegislationPage {
+  documents: LegislationDocument[]
+  next_cursor: string | null
+}
+
 export default function LegislationPage() {
   const router = useRouter()
   const [documents, setDocuments] = React.useState<LegislationDocument[]>([])
+  const [nextCursor, setNextCursor] = React.useState<string | null>(null)
 
-  // Fetch documents on mount
-  React.useEffect(() => {
-    fetch("/api/legislation")
+  const loadPage = React.useCallback((cursor?: string) => {
+    const params = cursor ? `?cursor=${encodeURIComponent(cursor)}` : ""
+    fetch(`/api/legislation${params}`)
       .then((res) => res.json())
-      .then(setDocuments)
+      .then((page: LegislationPage) => {
+        setDocuments((previous) => (cursor ? [...previous, ...page.documents] : page.documents))
+        setNextCursor(page.next_cursor)
+      })
       .catch(console.error)
   }, [])
 
+  // Fetch the first page of documents on mount
+  React.useEffect(() => {
+    loadPage()
+  }, [loadPage])
+
   return (
     <div className="container mx-auto py-8">
       <div className="mb-6">
@@ -90,6 +104,14 @@ export default function LegislationPage() {
           </TableBody>
         </Table>
       </div>
+
+      {nextCursor && (
+        <div className="flex justify-center mt-4">
+          <Button variant="outline" onClick={() => loadPage(nextCursor)}>
+            Load more
+          </Button>
+        </div>
+      )}
     </div>
   )
 }
\ No newline at end of file
@@ -29,7 +29,7 @@ export default function DocumentQueryPage() {
 
     setIsLoading(true);
     try {
-      const res = await fetch('/api/tools/query-documents', {
+      const res = await fetch('/api/tools/query-documents?fields=text,summary_long', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -29,7 +29,7 @@ export default function QueryEnginePage() {
 
     setIsLoading(true);
     try {
-      const res = await fetch('/api/tools/query', {
+      const res = await fetch('/api/tools/query?fields=text,summary_long', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -12,6 +12,11 @@ export default function Chat({ inputPlaceholder }: { inputPlaceholder?: string }
     headers: {
       "Content-Type": "application/json",
     },
+    // The server keeps the conversation history, so only send the new message
+    experimental_prepareRequestBody: ({ id, messages }) => ({
+      conversation_id: id,
+      message: messages[messages.length - 1].content,
+    }),
     onError: (error) => {
       console.error("Chat error:", error);
     },
@@ -21,7 +21,7 @@ export function NaiveVectorRetriever() {
 
     setIsLoading(true);
     try {
-      const response = await fetch('/api/tools/retrieve', {
+      const response = await fetch('/api/tools/retrieve?fields=text,summary_long', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
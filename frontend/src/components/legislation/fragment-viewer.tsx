@@ -21,7 +21,7 @@ export function FragmentViewer({ fragment, level = 0, initialExpanded = false }:
   React.useEffect(() => {
     if (initialExpanded && children.length === 0) {
       setIsLoading(true)
-      fetch(`/api/legislation/fragment/${fragment._id}`)
+      fetch(`/api/legislation/fragment/${fragment._id}?fields=text,summary_long`)
         .then((res) => res.json())
         .then((data) => {
           const serializedChildren = data.child_fragments.map((child: FragmentViewerProps["fragment"]) => ({
@@ -50,7 +50,7 @@ export function FragmentViewer({ fragment, level = 0, initialExpanded = false }:
     if (!isExpanded && children.length === 0) {
       setIsLoading(true)
       try {
-        const res = await fetch(`/api/legislation/fragment/${fragment._id}`)
+        const res = await fetch(`/api/legislation/fragment/${fragment._id}?fields=text,summary_long`)
         const data = await res.json()
         const serializedChildren = data.child_fragments.map((child: FragmentViewerProps["fragment"]) => ({
           ...child,